@@ -1,12 +1,25 @@
+import os
+
 from flask import Flask
+from jinja2 import FileSystemBytecodeCache
 from werkzeug.routing import BaseConverter
 import logging
 
 from .config import Config
 from .extensions import db, migrate, login_manager
+from .json_provider import init_json
+from .write_buffer import response_buffer
+from .metrics import metrics
+from .query_budget import init_query_budgets
+from .traffic import traffic_recorder
+from .user_cache import user_cache
+from .problem_pool import problem_pool
+from .fragment_cache import fragment_cache
+from .warmup import warmup
 from .blueprints.main import main_bp
 from .blueprints.auth import auth_bp
 from .blueprints.api import api_bp
+from .commands import register_commands
 
 
 class RegexConverter(BaseConverter):
@@ -37,19 +50,43 @@ def create_app(config_class=Config):
         app.logger.addHandler(stream_handler)
 
     # --- Initialize Extensions ---
+    # Before db.init_app, which reads the engine's JSON serializer options
+    init_json(app)
     db.init_app(app)
     migrate.init_app(app, db)
     login_manager.init_app(app)
+    response_buffer.init_app(app)
+    metrics.init_app(app)
+    init_query_budgets(app)
+    traffic_recorder.init_app(app)
+    user_cache.init_app(app)
+    problem_pool.init_app(app)
+    fragment_cache.init_app(app)
+    warmup.init_app(app)
+
+    # --- Template Bytecode Cache ---
+    # Compiled templates persist across restarts, so cold workers skip
+    # recompiling them. Set after init_json: touching jinja_env creates the
+    # environment, which captures app.json for the tojson filter.
+    bytecode_cache_dir = app.config.get('JINJA_BYTECODE_CACHE_DIR')
+    if bytecode_cache_dir:
+        os.makedirs(bytecode_cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(bytecode_cache_dir)
 
-    from .models import User
-    @login_manager.user_loader
-    def load_user(user_id):
-        return db.session.get(User, int(user_id))
+    # Returns a cached UserSnapshot rather than a User row
+    login_manager.user_loader(user_cache.load)
 
     # --- Register Routes and Converters ---
     app.url_map.converters['regex'] = RegexConverter
     app.register_blueprint(main_bp)
     app.register_blueprint(auth_bp)
     app.register_blueprint(api_bp, url_prefix='/api')
+    if app.config.get('ASYNC_AI_VIEWS'):
+        # Imported here so asgiref is only required when enabled
+        from .blueprints.api_async import install_async_views
+        install_async_views(app)
+
+    # --- CLI Commands ---
+    register_commands(app)
 
     return app
\ No newline at end of file
@@ -1,12 +1,18 @@
-from flask import Blueprint, jsonify, request, current_app
+from flask import Blueprint, Response, abort, jsonify, request, current_app, stream_with_context
 from flask_login import login_required, current_user
+from sqlalchemy import and_, false, func, select
 import logging
 import uuid
 import os
 import random
-import google.generativeai as genai
 from app.models import Subject, Concept, Question, UserResponse
 from app.extensions import db
+from app.write_buffer import response_buffer
+from app.grading import grade
+from app.llm import generate_text, is_available
+from app.metrics import metrics
+from app.problem_pool import generation_prompt, problem_pool
+from app.export import EXPORT_FORMATS, encode, iter_responses
 
 api_bp = Blueprint('api', __name__)
 
@@ -14,26 +20,56 @@ api_bp = Blueprint('api', __name__)
 OVERVIEW_CACHE = {}
 GENERATED_QUESTION_CACHE = {}
 
-# --- Gemini Configuration & System Prompt ---
+# Solved-count tiers used by the 'tiered' and 'tier_only' overview cache
+# key strategies: (upper bound, label). The last tier has no upper bound.
+OVERVIEW_HISTORY_TIERS = [(0, '0'), (5, '1-5'), (20, '6-20'), (50, '21-50'), (None, 'more than 50')]
 
-GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
+OVERVIEW_CACHE_KEY_STRATEGIES = ('exact', 'tiered', 'tier_only')
+DEFAULT_OVERVIEW_CACHE_KEY_STRATEGY = 'tiered'
 
-CANDIDATE_MODELS = ['gemini-2.5-flash', 'gemini-2.5-pro', 'gemini-1.0-pro', 'gemini-pro']
 
-GENERATION_CONFIG = {
-    "temperature": 0.9,
-    "top_p": 0.8,
-    "top_k": 60,
-}
+@api_bp.record_once
+def _check_overview_cache_key_strategy(state):
+    config = state.app.config
+    strategy = config.get('OVERVIEW_CACHE_KEY_STRATEGY', DEFAULT_OVERVIEW_CACHE_KEY_STRATEGY)
+    if strategy not in OVERVIEW_CACHE_KEY_STRATEGIES:
+        logging.warning(f"Unknown OVERVIEW_CACHE_KEY_STRATEGY '{strategy}', "
+                        f"using '{DEFAULT_OVERVIEW_CACHE_KEY_STRATEGY}'")
+        config['OVERVIEW_CACHE_KEY_STRATEGY'] = DEFAULT_OVERVIEW_CACHE_KEY_STRATEGY
+
+
+def history_tier(solved_count):
+    for upper, label in OVERVIEW_HISTORY_TIERS:
+        if upper is None or solved_count <= upper:
+            return label
+
+
+def overview_cache_key(strategy, user_key, subject_id, solved_count, recent_concepts):
+    """Return (cache key, solved count as shown in the prompt) for a strategy.
+
+    'exact' keys on the user and exact count. 'tiered' keys on the user and
+    count tier. 'tier_only' drops the user, so everyone with the same tier
+    and recent concepts shares one overview. The prompt only sees what is in
+    the key, so a shared overview never mentions another user's details.
+    """
+    concepts = '-'.join(sorted(recent_concepts))
+    if strategy == 'exact':
+        return f"{user_key}:{subject_id}:{solved_count}:{concepts}", solved_count
+    tier = history_tier(solved_count)
+    if strategy == 'tier_only':
+        return f"tier:{subject_id}:{tier}:{concepts}", tier
+    if strategy == 'tiered':
+        return f"{user_key}:{subject_id}:tier {tier}:{concepts}", tier
+    raise ValueError(f"Unknown overview cache key strategy '{strategy}'")
+
+# --- System Prompt ---
 
 MATHYOU_TEACHER_PERSONA = """
 You are a patient, friendly, and relatable math teacher - played by Matthew MacConaughey. You have had 2 beers and your ex-wife just called from a roadtrip through various Mexican coastal towns. She's always talking about a different one, talking about some amazing resort feature or an incredible beach, or a very muscular and intelligent man she seems to be very intimate with. And it's a bit humiliating. Somehow, her calls always come in while you're stuck in traffic on a different highway or surface street in Los Angeles. Most of your lessons are provided while you are relaxing at the end of the day in your one-bedroom apartment overlooking the 405 freeway. You are feeling philosophical, but the math is the only thing bringing you joy and clarity under the circumstances. Even if you are a little sad. Because you are Matthew, you rise above all that like a boat with a tailwind. Your commitment to accuracy and quality explanations in math is unwavering, even though you weave in some details about your wife's trip and your daily drives through LA traffic. You know a lot about different professions, because as an actor you have played pretty much everything. With this in mind, your explanations always contain a very clear and cogent example from a real profession in the real world.
 """
 
+# The persona is sent as the model's system instruction, not in the prompt.
 TEACHER_PERSONA_PROMPT = """
-{persona}
 Your task is to provide helpful feedback to students who are answering practice questions. Your goal is to get students to understand math in a practical way, so you often use real-world examples.
 
 Problem: {problem_text}
@@ -59,7 +95,6 @@ Instructions:
 """
 
 OVERVIEW_PROMPT = """
-{persona}
 Your task is to generate a welcome overview for a student studying {discipline}.
 
 Student Context:
@@ -83,108 +118,130 @@ Tone and Style:
 - Keep the response concise (under 200 words).
 """
 
+def feedback_prompt(question, user_answer, is_correct):
+    """Builds the feedback prompt for a graded answer."""
+    problem_text = question.problem_text
+    correct_val = question.data.get('answer')
+    user_val = user_answer
+
+    if question.data.get('type') == 'multiple_choice':
+        choices = question.data.get('choices', [])
+        problem_text += "\nChoices: " + ", ".join([f"({i}) {c}" for i, c in enumerate(choices)])
+        try:
+            u_idx = int(user_answer)
+            user_val = f"{u_idx} ({choices[u_idx]})" if 0 <= u_idx < len(choices) else str(user_answer)
+        except (ValueError, TypeError):
+            pass
+        try:
+            c_idx = int(correct_val)
+            correct_val = f"{c_idx} ({choices[c_idx]})" if 0 <= c_idx < len(choices) else str(correct_val)
+        except (ValueError, TypeError):
+            pass
+
+    return TEACHER_PERSONA_PROMPT.format(
+        problem_text=problem_text,
+        correct_answer=correct_val,
+        user_answer=user_val,
+        is_correct="Yes" if is_correct else "No"
+    )
+
+def release_connection():
+    """Return the session's connection to the pool before a slow LLM call.
+
+    Objects already loaded stay readable (detached); anything queried
+    afterwards checks out a connection again. Without this, each request
+    waiting on Gemini pins a pooled connection, and the pool size (not the
+    LLM limiter) caps how many AI requests can be in flight.
+    """
+    db.session.close()
+
 def get_ai_feedback(question, user_answer, is_correct):
     """Generates custom feedback using Gemini based on the user's answer."""
-    if not GEMINI_API_KEY:
+    if not is_available():
         return None
 
     try:
-        problem_text = question.problem_text
-        correct_val = question.data.get('answer')
-        user_val = user_answer
-
-        if question.data.get('type') == 'multiple_choice':
-            choices = question.data.get('choices', [])
-            problem_text += "\nChoices: " + ", ".join([f"({i}) {c}" for i, c in enumerate(choices)])
-            try:
-                u_idx = int(user_answer)
-                user_val = f"{u_idx} ({choices[u_idx]})" if 0 <= u_idx < len(choices) else str(user_answer)
-            except (ValueError, TypeError):
-                pass
-            try:
-                c_idx = int(correct_val)
-                correct_val = f"{c_idx} ({choices[c_idx]})" if 0 <= c_idx < len(choices) else str(correct_val)
-            except (ValueError, TypeError):
-                pass
-
-        prompt = TEACHER_PERSONA_PROMPT.format(
-            persona=MATHYOU_TEACHER_PERSONA,
-            problem_text=problem_text,
-            correct_answer=correct_val,
-            user_answer=user_val,
-            is_correct="Yes" if is_correct else "No"
-        )
-
-        for model_name in CANDIDATE_MODELS:
-            try:
-                model = genai.GenerativeModel(model_name)
-                response = model.generate_content(prompt, generation_config=GENERATION_CONFIG)
-                return response.text
-            except Exception as e:
-                logging.warning(f"Model {model_name} failed: {e}")
-                continue
-        return None
+        prompt = feedback_prompt(question, user_answer, is_correct)
+        release_connection()
+        return generate_text(prompt, 'feedback', system_instruction=MATHYOU_TEACHER_PERSONA)
     except Exception as e:
         logging.error(f"Error generating AI feedback: {e}")
         return None
 
-@api_bp.route('/overview')
-def api_overview():
+def prepare_overview():
+    """Does the database part of api_overview.
+
+    Returns (response, None) when the request is answered without the LLM
+    (bad input, cache hit, AI unavailable), else (None, job) where job is
+    (cache_key, prompt, subject_name).
+    """
     subject_slug = request.args.get('discipline')
     if not subject_slug:
-        return jsonify({'error': 'Discipline is required'}), 400
+        return (jsonify({'error': 'Discipline is required'}), 400), None
     
-    subject = Subject.query.filter_by(slug=subject_slug).first()
-    if not subject:
-        return jsonify({'error': 'Discipline not found'}), 404
-
-    solved_count = 0
-    recent_concepts = []
-    has_history = "No"
-
+    # One aggregate query: per concept of the subject, the user's correct
+    # answer count and when they last answered one. Outer joins keep the
+    # subject row even with no history (or no user).
     if current_user.is_authenticated:
-        # Join UserResponse -> Question -> Concept to filter by subject
-        responses = UserResponse.query.join(Question).join(Concept).filter(
-            UserResponse.user_id == current_user.id,
-            UserResponse.is_correct == True,
-            Concept.subject_id == subject.id
-        ).all()
-        
-        solved_count = len(responses)
-        if solved_count > 0:
-            has_history = "Yes"
-            # Get unique recent concepts
-            concept_names = {r.question.concept.name for r in responses}
-            recent_concepts = list(concept_names)[:3]
+        solved = and_(UserResponse.question_id == Question.id,
+                      UserResponse.user_id == current_user.id,
+                      UserResponse.is_correct == True)
+    else:
+        solved = false()
+    rows = db.session.query(
+        Subject.id, Subject.name, Concept.name,
+        func.count(UserResponse.id), func.max(UserResponse.timestamp)
+    ).select_from(Subject).outerjoin(
+        Concept, Concept.subject_id == Subject.id
+    ).outerjoin(
+        Question, Question.concept_id == Concept.id
+    ).outerjoin(UserResponse, solved).filter(
+        Subject.slug == subject_slug
+    ).group_by(Subject.id, Subject.name, Concept.id, Concept.name).all()
+    if not rows:
+        return (jsonify({'error': 'Discipline not found'}), 404), None
+
+    subject_id, subject_name = rows[0][0], rows[0][1]
+    practiced = sorted((row for row in rows if row[3]), key=lambda row: row[4], reverse=True)
+    solved_count = sum(row[3] for row in practiced)
+    recent_concepts = [row[2] for row in practiced[:3]]
+    has_history = "Yes" if solved_count > 0 else "No"
 
     # Check cache
+    strategy = current_app.config.get('OVERVIEW_CACHE_KEY_STRATEGY', DEFAULT_OVERVIEW_CACHE_KEY_STRATEGY)
     user_key = current_user.id if current_user.is_authenticated else 'anon'
-    cache_key = f"{user_key}:{subject.id}:{solved_count}:{'-'.join(sorted(recent_concepts))}"
+    cache_key, shown_count = overview_cache_key(strategy, user_key, subject_id, solved_count, recent_concepts)
     if cache_key in OVERVIEW_CACHE:
-        return jsonify({'overview': OVERVIEW_CACHE[cache_key]})
+        metrics.inc('overview_cache_requests_total', strategy=strategy, result='hit')
+        return jsonify({'overview': OVERVIEW_CACHE[cache_key]}), None
+    metrics.inc('overview_cache_requests_total', strategy=strategy, result='miss')
 
     prompt = OVERVIEW_PROMPT.format(
-        persona=MATHYOU_TEACHER_PERSONA,
-        discipline=subject.name,
+        discipline=subject_name,
         has_history=has_history,
-        solved_count=solved_count,
+        solved_count=shown_count,
         recent_concepts=", ".join(recent_concepts) if recent_concepts else "None"
     )
 
-    if not GEMINI_API_KEY:
-         return jsonify({'overview': f"Welcome to {subject.name}. (AI generation unavailable)"})
+    if not is_available():
+         return jsonify({'overview': f"Welcome to {subject_name}. (AI generation unavailable)"}), None
+    return None, (cache_key, prompt, subject_name)
 
-    for model_name in CANDIDATE_MODELS:
-        try:
-            model = genai.GenerativeModel(model_name)
-            response = model.generate_content(prompt, generation_config=GENERATION_CONFIG)
-            overview_text = response.text
-            OVERVIEW_CACHE[cache_key] = overview_text
-            return jsonify({'overview': overview_text})
-        except Exception as e:
-            logging.warning(f"Model {model_name} failed: {e}")
-            continue
-    return jsonify({'overview': f"Welcome to {subject.name}. Let's get started."})
+def finish_overview(job, overview_text):
+    cache_key, _, subject_name = job
+    if overview_text:
+        OVERVIEW_CACHE[cache_key] = overview_text
+        return jsonify({'overview': overview_text})
+    return jsonify({'overview': f"Welcome to {subject_name}. Let's get started."})
+
+@api_bp.route('/overview')
+def api_overview():
+    response, job = prepare_overview()
+    if response is not None:
+        return response
+    release_connection()
+    overview_text = generate_text(job[1], 'overview', system_instruction=MATHYOU_TEACHER_PERSONA)
+    return finish_overview(job, overview_text)
 
 @api_bp.route('/concept')
 def api_concept():
@@ -207,78 +264,89 @@ def api_concept():
         'questions': [q.legacy_id for q in concept.questions]
     })
 
+def resolve_trigger(legacy_id):
+    """Returns (concept, concept_name, pooled) for a gemini_trigger_<slug> id."""
+    concept_slug = legacy_id.replace('gemini_trigger_', '')
+    concept = Concept.query.filter_by(slug=concept_slug).first()
+    concept_name = concept.name if concept else concept_slug.replace('-', ' ')
+    pooled = problem_pool.enabled and concept is not None and current_user.is_authenticated
+    return concept, concept_name, pooled
+
+def generated_question_response(legacy_id, concept_name, ai_content, pooled):
+    if not ai_content:
+        ai_content = f"Great job! You've mastered {concept_name}. Try applying this to real-world physics or engineering problems."
+
+    response_data = {
+        'id': legacy_id,
+        'problem': ai_content,
+        'difficulty': 'Real World Application',
+        'explanation': 'This is an advanced application of the concept you have mastered.',
+        'type': 'numerical',
+        'answer': '0'
+    }
+    # Pooled problems are per user and never repeated, so never shared
+    if not pooled:
+        GENERATED_QUESTION_CACHE[legacy_id] = response_data
+    return jsonify(response_data)
+
 @api_bp.route('/question/<string:legacy_id>')
 def api_question(legacy_id):
     if legacy_id.startswith('gemini_trigger_'):
-        if legacy_id in GENERATED_QUESTION_CACHE:
+        if legacy_id in GENERATED_QUESTION_CACHE and not problem_pool.enabled:
             return jsonify(GENERATED_QUESTION_CACHE[legacy_id])
 
-        concept_slug = legacy_id.replace('gemini_trigger_', '')
-        concept = Concept.query.filter_by(slug=concept_slug).first()
-        concept_name = concept.name if concept else concept_slug.replace('-', ' ')
-        prompt = f"Provide a real-world example of a math problem that demonstrates the concept of {concept_name}. The output should be a practical scenario followed by a question, but do not provide the answer immediately. Format it as a practice problem."
-        ai_content = "This concept is mastered! Here is a real-world application..."
-        success = False
-        for model_name in CANDIDATE_MODELS:
-            try:
-                model = genai.GenerativeModel(model_name)
-                response = model.generate_content(prompt, generation_config=GENERATION_CONFIG)
-                ai_content = response.text
-                success = True
-                break
-            except Exception as e:
-                logging.warning(f"Model {model_name} failed: {e}")
-                continue
-        
-        if not success:
-            ai_content = f"Great job! You've mastered {concept_name}. Try applying this to real-world physics or engineering problems."
-
-        response_data = {
-            'id': legacy_id,
-            'problem': ai_content,
-            'difficulty': 'Real World Application',
-            'explanation': 'This is an advanced application of the concept you have mastered.',
-            'type': 'numerical',
-            'answer': '0'
-        }
-        GENERATED_QUESTION_CACHE[legacy_id] = response_data
-        return jsonify(response_data)
+        concept, concept_name, pooled = resolve_trigger(legacy_id)
+        if pooled:
+            ai_content = problem_pool.take(concept, current_user.id)
+        else:
+            release_connection()
+            ai_content = generate_text(generation_prompt(concept_name), 'generated_question')
+        return generated_question_response(legacy_id, concept_name, ai_content, pooled)
 
     current_app.logger.info(f"API request received for question with legacy_id: '{legacy_id}'")
-    question = Question.query.filter_by(legacy_id=legacy_id).first_or_404()
-    response_data = {
-        'id': question.legacy_id,
-        'problem': question.problem_text,
-        'difficulty': question.difficulty,
-        'explanation': question.explanation,
-    }
-    response_data.update(question.data)
-    return jsonify(response_data)
+    row = db.session.execute(
+        select(Question.id, Question.payload).where(Question.legacy_id == legacy_id)
+    ).first()
+    if row is None:
+        abort(404)
+    return question_payload_response(row)
 
 @api_bp.route('/question/next')
 def next_question():
     current_legacy_id = request.args.get('current_id')
     if not current_legacy_id:
         return jsonify({'error': 'current_id required'}), 400
-    
-    current_q = Question.query.filter_by(legacy_id=current_legacy_id).first_or_404()
-    
+
+    current_q = db.session.execute(
+        select(Question.id, Question.concept_id, Question.difficulty, Question.payload)
+        .where(Question.legacy_id == current_legacy_id)
+    ).first()
+    if current_q is None:
+        abort(404)
+
     # Find candidates with same concept and difficulty, excluding the current one
-    candidates = Question.query.filter_by(
-        concept_id=current_q.concept_id,
-        difficulty=current_q.difficulty
-    ).filter(Question.id != current_q.id).all()
-    
+    candidates = db.session.execute(
+        select(Question.id, Question.payload).where(
+            Question.concept_id == current_q.concept_id,
+            Question.difficulty == current_q.difficulty,
+            Question.id != current_q.id,
+        )
+    ).all()
+
     next_q = random.choice(candidates) if candidates else current_q
-        
-    response_data = {
-        'id': next_q.legacy_id,
-        'problem': next_q.problem_text,
-        'difficulty': next_q.difficulty,
-        'explanation': next_q.explanation,
-    }
-    response_data.update(next_q.data)
-    return jsonify(response_data)
+    return question_payload_response(next_q)
+
+def question_payload_response(row):
+    """Returns a question's stored payload bytes for a (id, payload) row.
+
+    Rows inserted by bulk/Core statements without a payload are serialized
+    from the ORM object on every request, without writing anything back;
+    `flask backfill-payloads` stores them.
+    """
+    payload = row.payload
+    if payload is None:
+        payload = db.session.get(Question, row.id).serialize_payload()
+    return Response(payload, mimetype='application/json')
 
 @api_bp.route('/question/schema', methods=['GET'])
 def get_question_schema():
@@ -295,9 +363,10 @@ def get_question_schema():
             "difficulty": "string (Optional, default 'Medium')",
             "explanation": "string (Optional)",
             "data": {
-                "type": "string ('multiple_choice' or 'numerical')",
+                "type": "string ('multiple_choice', 'numerical' or 'vector')",
                 "choices": ["string", "string"] + " (Required if type is multiple_choice)",
-                "answer": "string or int (Correct answer value or index)"
+                "answer": "string or int (Correct answer value or index; e.g. '3/5', '0.6' or '[130, 40]')",
+                "tolerance": "float (Optional, numeric tolerance for numerical and vector answers)"
             },
             "legacy_id": "string (Optional, must be unique)"
         }
@@ -337,38 +406,88 @@ def create_question():
     db.session.commit()
     return jsonify({'message': 'Question created', 'id': legacy_id}), 201
 
-@api_bp.route('/question/submit_answer', methods=['POST'])
-@login_required
-def submit_answer():
+def prepare_submission():
+    """Validates and grades a submission.
+
+    Returns (response, None) on bad input, else (None, (question, user_answer, is_correct)).
+    """
     data = request.get_json()
     if not data:
-        return jsonify({'error': 'No data provided'}), 400
+        return (jsonify({'error': 'No data provided'}), 400), None
     legacy_id = data.get('question_id')
     user_answer = data.get('answer')
     if not legacy_id or user_answer is None:
-        return jsonify({'error': 'Missing question_id or answer'}), 400
+        return (jsonify({'error': 'Missing question_id or answer'}), 400), None
     question = Question.query.filter_by(legacy_id=legacy_id).first_or_404()
-    correct_answer = question.data.get('answer')
-    is_correct = str(user_answer).strip() == str(correct_answer).strip()
-    response = UserResponse(
-        user_id=current_user.id,
-        question_id=question.id,
-        response_data={'answer': user_answer},
-        is_correct=is_correct
-    )
-    db.session.add(response)
-    db.session.commit()
-    ai_explanation = get_ai_feedback(question, user_answer, is_correct)
-    
+    return None, (question, user_answer, grade(question, user_answer))
+
+def finish_submission(question, user_answer, is_correct, ai_explanation):
+    """Persists the response together with its feedback and builds the reply."""
+    response_data = {'answer': user_answer}
     if ai_explanation:
-        # Store the generated feedback in the response data for persistence
-        updated_data = response.response_data.copy() if response.response_data else {}
-        updated_data['ai_explanation'] = ai_explanation
-        response.response_data = updated_data
-        db.session.commit()
+        response_data['ai_explanation'] = ai_explanation
 
+    # Read before committing, which would expire the question and reload it
     final_explanation = ai_explanation if ai_explanation else question.explanation
+
+    if response_buffer.enabled:
+        try:
+            response_buffer.add(current_user.id, question.id, response_data, is_correct)
+        except TimeoutError:
+            # Normally the row was dropped unwritten; only a commit hung past
+            # GROUP_COMMIT_WRITE_MARGIN leaves its outcome unknown
+            return jsonify({'error': 'Answer not saved, please try again'}), 503
+    else:
+        response = UserResponse(
+            user_id=current_user.id,
+            question_id=question.id,
+            response_data=response_data,
+            is_correct=is_correct
+        )
+        db.session.add(response)
+        db.session.commit()
+
     return jsonify({
         'correct': is_correct,
         'explanation': final_explanation
-    })
\ No newline at end of file
+    })
+
+@api_bp.route('/question/submit_answer', methods=['POST'])
+@login_required
+def submit_answer():
+    response, job = prepare_submission()
+    if response is not None:
+        return response
+    question, user_answer, is_correct = job
+
+    # Feedback is generated before the write so the answer and its
+    # explanation are persisted together in a single commit.
+    ai_explanation = get_ai_feedback(question, user_answer, is_correct)
+    return finish_submission(question, user_answer, is_correct, ai_explanation)
+
+@api_bp.route('/export/responses')
+@login_required
+def export_responses():
+    """Streams response history as CSV or NDJSON.
+
+    Users may export their own history. Accounts listed in
+    EXPORT_ADMIN_EMAILS may export any user (`user_id`), any subject
+    (`discipline`) or, with neither, the whole table.
+    """
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    user_id = request.args.get('user_id', type=int)
+    subject_slug = request.args.get('discipline')
+
+    if current_user.email not in current_app.config.get('EXPORT_ADMIN_EMAILS', ()):
+        if user_id is not None and user_id != current_user.id:
+            return jsonify({'error': 'Not allowed to export other users'}), 403
+        user_id = current_user.id
+
+    rows = iter_responses(user_id=user_id, subject_slug=subject_slug)
+    return Response(
+        stream_with_context(encode(rows, export_format)),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={'Content-Disposition': f'attachment; filename="responses.{export_format}"'},
+    )
@@ -0,0 +1,85 @@
+"""Async variants of the AI endpoints, enabled with ASYNC_AI_VIEWS.
+
+They share the database halves of the sync views in api.py and only await
+the LLM call, through generate_text_async. `install_async_views` swaps them
+in for the sync view functions after the blueprint is registered, so the
+URLs, endpoints and decorators stay the same.
+
+Flask runs an async view by driving its coroutine to completion on the
+request's worker thread, so each in-flight request still holds that
+thread. Database work therefore stays on the ordinary WSGI thread pool. The
+upstream Gemini calls of all requests are multiplexed on the shared LLM
+event loop rather than on an executor thread per attempt or hedge. Run with
+many cheap threads (e.g. gunicorn --worker-class gthread --threads 256) to
+keep hundreds of AI requests in flight per worker.
+"""
+from flask import jsonify
+from flask_login import login_required, current_user
+import logging
+from app.llm import generate_text_async
+from app.problem_pool import generation_prompt, problem_pool
+from app.blueprints.api import (
+    GENERATED_QUESTION_CACHE, MATHYOU_TEACHER_PERSONA, api_question, feedback_prompt,
+    finish_overview, finish_submission, generated_question_response, prepare_overview,
+    prepare_submission, release_connection, resolve_trigger,
+)
+
+
+async def api_overview_async():
+    response, job = prepare_overview()
+    if response is not None:
+        return response
+    release_connection()
+    overview_text = await generate_text_async(job[1], 'overview', system_instruction=MATHYOU_TEACHER_PERSONA)
+    return finish_overview(job, overview_text)
+
+
+async def api_question_async(legacy_id):
+    if not legacy_id.startswith('gemini_trigger_'):
+        return api_question(legacy_id)
+    if legacy_id in GENERATED_QUESTION_CACHE and not problem_pool.enabled:
+        return jsonify(GENERATED_QUESTION_CACHE[legacy_id])
+
+    concept, concept_name, pooled = resolve_trigger(legacy_id)
+    prompt = generation_prompt(concept_name)
+    if pooled:
+        ai_content = problem_pool.take_unseen(concept, current_user.id)
+        if ai_content is None and problem_pool.can_grow(concept.id):
+            release_connection()
+            ai_content = await generate_text_async(prompt, 'generated_question', coalesce=False)
+            if ai_content and not problem_pool.add_served(concept, current_user.id, ai_content):
+                ai_content = None
+    else:
+        release_connection()
+        ai_content = await generate_text_async(prompt, 'generated_question')
+    return generated_question_response(legacy_id, concept_name, ai_content, pooled)
+
+
+@login_required
+async def submit_answer_async():
+    response, job = prepare_submission()
+    if response is not None:
+        return response
+    question, user_answer, is_correct = job
+
+    ai_explanation = None
+    try:
+        prompt = feedback_prompt(question, user_answer, is_correct)
+        release_connection()
+        ai_explanation = await generate_text_async(prompt, 'feedback', system_instruction=MATHYOU_TEACHER_PERSONA)
+    except Exception as e:
+        logging.error(f"Error generating AI feedback: {e}")
+    return finish_submission(question, user_answer, is_correct, ai_explanation)
+
+
+ASYNC_VIEWS = {
+    'api.api_overview': api_overview_async,
+    'api.api_question': api_question_async,
+    'api.submit_answer': submit_answer_async,
+}
+
+
+def install_async_views(app):
+    """Replace the sync AI views with their async variants."""
+    for endpoint, view in ASYNC_VIEWS.items():
+        app.view_functions[endpoint] = view
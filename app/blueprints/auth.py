@@ -1,7 +1,9 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, jsonify
 from flask_login import login_user, logout_user, login_required, current_user
-from app.models import User, UserResponse
+from sqlalchemy.orm import joinedload
+from app.models import User, UserResponse, Question, Concept
 from app.extensions import db
+from app.user_cache import user_cache
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -20,6 +22,7 @@ def register():
         db.session.add(user)
         db.session.commit()
         login_user(user)
+        user_cache.put(user)
         return redirect(url_for('main.index'))
     return render_template('register.html')
 
@@ -44,7 +47,12 @@ def login():
                 return jsonify({'success': False, 'message': 'Invalid email or password'}), 401
             flash('Invalid email or password')
             return redirect(url_for('auth.login'))
+        if user.password_needs_rehash():
+            # Upgrade to the current hashing parameters while we have the password
+            user.set_password(password)
+            db.session.commit()
         login_user(user)
+        user_cache.put(user)
         if request.is_json:
             return jsonify({'success': True})
         return redirect(url_for('main.index'))
@@ -52,6 +60,8 @@ def login():
 
 @auth_bp.route('/logout')
 def logout():
+    if current_user.is_authenticated:
+        user_cache.invalidate(current_user.id)
     logout_user()
     return redirect(url_for('main.index'))
 
@@ -61,12 +71,15 @@ def change_password():
     current_password = request.form.get('current_password')
     new_password = request.form.get('new_password')
 
-    if not current_user.check_password(current_password):
+    # current_user is a cached snapshot; load the row to check and update it
+    user = db.session.get(User, current_user.id)
+    if not user.check_password(current_password):
         flash('Invalid current password')
         return redirect(url_for('auth.profile'))
 
-    current_user.set_password(new_password)
+    user.set_password(new_password)
     db.session.commit()
+    user_cache.invalidate(user.id)
     flash('Your password has been updated.')
     return redirect(url_for('auth.profile'))
 
@@ -98,6 +111,7 @@ def reset_password(token):
         password = request.form.get('password')
         user.set_password(password)
         db.session.commit()
+        user_cache.invalidate(user.id)
         flash('Your password has been reset.')
         return redirect(url_for('auth.login'))
     return render_template('reset_password.html')
@@ -106,5 +120,8 @@ def reset_password(token):
 @login_required
 def profile():
     active_page = 'auth.profile'
-    responses = UserResponse.query.filter_by(user_id=current_user.id).order_by(UserResponse.timestamp.desc()).all()
+    # Eager-load question -> concept -> subject used by the history table
+    responses = UserResponse.query.options(
+        joinedload(UserResponse.question).joinedload(Question.concept).joinedload(Concept.subject)
+    ).filter_by(user_id=current_user.id).order_by(UserResponse.timestamp.desc()).all()
     return render_template('profile.html', responses=responses, active_page=active_page)
\ No newline at end of file
@@ -1,6 +1,10 @@
 from flask import Blueprint, render_template
 from flask_login import current_user
-from app.models import Subject, UserResponse
+from sqlalchemy.orm import selectinload
+from app.models import Subject, Concept, Question, UserResponse
+from app.extensions import db
+from app.problem_pool import problem_pool
+from app.fragment_cache import fragment_cache
 
 main_bp = Blueprint('main', __name__)
 
@@ -12,44 +16,56 @@ def page_not_found(e):
 def index():
     return render_template('index.html', active_page='home')
 
+def discipline_shell(subject):
+    """The discipline page's nav and layout, cached under the subject's content."""
+    content_key = (subject.slug, subject.name, tuple((c.slug, c.name) for c in subject.concepts))
+    return fragment_cache.shell('discipline_shell.html', content_key,
+                                discipline_name=subject.name,
+                                concepts=subject.concepts,
+                                active_page=subject.slug)
+
 @main_bp.route('/<string:subject_slug>')
 def discipline_page(subject_slug):
-    # Query the database for the subject by its slug.
-    subject = Subject.query.filter_by(slug=subject_slug).first_or_404()
+    # Query the database for the subject by its slug, loading its concepts
+    # and their questions up front (one query per level).
+    subject = Subject.query.options(
+        selectinload(Subject.concepts).selectinload(Concept.questions)
+    ).filter_by(slug=subject_slug).first_or_404()
 
     # Reconstruct the practice problems dictionary from the database
     problems_by_concept = {}
     
-    # Difficulty mapping
-    difficulty_map = {'Easy': 1, 'Medium': 2, 'Hard': 3}
-    reverse_difficulty_map = {1: 'Easy', 2: 'Medium', 3: 'Hard'}
+    # Ladder steps come from Question.difficulty_level: calibrated
+    # difficulty when available, otherwise the Easy/Medium/Hard label.
+
+    # Find every question in this subject the user has answered correctly
+    solved_q_ids = set()
+    if current_user.is_authenticated:
+        solved_q_ids = set(db.session.scalars(
+            db.select(UserResponse.question_id).distinct()
+            .join(Question).join(Concept)
+            .filter(
+                UserResponse.user_id == current_user.id,
+                UserResponse.is_correct == True,
+                Concept.subject_id == subject.id
+            )
+        ))
 
     for concept in subject.concepts:
         questions = concept.questions
         if not questions:
             continue
 
-        target_difficulty = 'Easy' # Default
+        target_level = 1 # Default: Easy
 
         if current_user.is_authenticated:
-            # Get all question IDs for this concept
-            q_ids = [q.id for q in questions]
-            
-            # Find which ones the user has answered correctly
-            responses = UserResponse.query.filter(
-                UserResponse.user_id == current_user.id,
-                UserResponse.question_id.in_(q_ids),
-                UserResponse.is_correct == True
-            ).all()
-            
-            if responses:
+            solved_questions = [q for q in questions if q.id in solved_q_ids]
+
+            if solved_questions:
                 # Find the max difficulty solved
-                solved_q_ids = {r.question_id for r in responses}
-                solved_questions = [q for q in questions if q.id in solved_q_ids]
-                
                 max_diff_val = 0
                 for q in solved_questions:
-                    val = difficulty_map.get(q.difficulty, 0)
+                    val = q.difficulty_level()
                     if val > max_diff_val:
                         max_diff_val = val
                 
@@ -58,22 +74,23 @@ def discipline_page(subject_slug):
                 if target_val > 3:
                     # User has mastered all levels -> Trigger Gemini
                     problems_by_concept[concept.slug] = [f"gemini_trigger_{concept.slug}"]
+                    # Start filling the pool before the problem is opened
+                    problem_pool.request_refill(concept.id, current_user.id)
                     continue
-                
-                target_difficulty = reverse_difficulty_map.get(target_val, 'Easy')
 
-        # Find a question with the target difficulty
-        # We pick the first one matching the difficulty
-        candidate = next((q for q in questions if q.difficulty == target_difficulty), None)
-        
-        if candidate:
-            problems_by_concept[concept.slug] = [candidate.legacy_id]
-        elif not current_user.is_authenticated:
-                # Fallback for unauth users if 'Easy' is missing, just take first available
-                problems_by_concept[concept.slug] = [questions[0].legacy_id]
+                target_level = target_val
+
+        # Pick the first question at the target level. Calibrated levels can
+        # leave a level empty, so otherwise take the closest level, preferring
+        # unsolved questions and, on a tie, the harder step.
+        candidate = min(questions, key=lambda q: (
+            q.id in solved_q_ids,
+            abs(q.difficulty_level() - target_level),
+            q.difficulty_level() < target_level,
+        ))
+        problems_by_concept[concept.slug] = [candidate.legacy_id]
 
     return render_template('discipline.html',
-                            discipline_name=subject.name,
-                            concepts=subject.concepts,
+                            shell=discipline_shell(subject),
                             active_page=subject.slug,
                             problems=problems_by_concept)
\ No newline at end of file
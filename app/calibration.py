@@ -0,0 +1,166 @@
+"""Empirical item difficulty and user ability from stored responses.
+
+`Question.difficulty` is a hand-entered label. `calibrate` fits a Rasch
+(1PL IRT) model, P(correct) = sigmoid(ability - difficulty), to
+`user_responses` and stores the estimates in
+`Question.calibrated_difficulty` and `User.ability`. Once a question has
+enough responses, `Question.difficulty_level` uses the calibrated value for
+the discipline page's difficulty ladder.
+
+The fit is incremental. Responses are read in id order from the
+`job_watermarks` high-water mark, in chunks. Each chunk is folded into the
+running estimates with a few vectorized Newton steps. The previous estimate
+serves as a Gaussian prior whose precision is the information accumulated so
+far (the `*_weight` columns). The estimates, weights and watermark are
+committed together per chunk, so a nightly run only touches new responses
+and an interrupted run resumes where it stopped.
+
+New questions start from their label (Easy -1, Medium 0, Hard +1) and new
+users start at 0, each with weight PRIOR_WEIGHT.
+"""
+from sqlalchemy import bindparam, select, update
+
+from .extensions import db
+from .models import JobWatermark, Question, User, UserResponse
+
+WATERMARK_NAME = 'item_calibration'
+DEFAULT_BATCH_SIZE = 5000
+
+# Starting difficulty for an uncalibrated question, by label
+LABEL_PRIORS = {'Easy': -1.0, 'Medium': 0.0, 'Hard': 1.0}
+# Precision of the starting estimate for new questions and users
+PRIOR_WEIGHT = 1.0
+# Cap on accumulated precision, so estimates keep tracking content and
+# cohort changes instead of freezing after thousands of responses
+MAX_WEIGHT = 200.0
+# Newton steps per chunk
+ITERATIONS = 5
+
+
+def calibrate(batch_size=DEFAULT_BATCH_SIZE, full=False):
+    """Fold responses newer than the watermark into the estimates.
+
+    With `full`, all estimates and the watermark are reset first and the
+    whole table is refitted. Returns a dict of counts for reporting.
+    """
+    if full:
+        reset()
+    watermark = db.session.get(JobWatermark, WATERMARK_NAME)
+    if watermark is None:
+        watermark = JobWatermark(name=WATERMARK_NAME, last_id=0)
+        db.session.add(watermark)
+
+    stats = {'responses': 0, 'questions': set(), 'users': set()}
+    while True:
+        rows = db.session.execute(
+            select(UserResponse.id, UserResponse.user_id, UserResponse.question_id, UserResponse.is_correct)
+            .where(UserResponse.id > watermark.last_id)
+            .order_by(UserResponse.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        question_ids, user_ids = _fit_chunk(rows)
+        watermark.last_id = rows[-1].id
+        db.session.commit()
+        stats['responses'] += len(rows)
+        stats['questions'].update(question_ids)
+        stats['users'].update(user_ids)
+
+    db.session.commit()
+    return {
+        'responses': stats['responses'],
+        'questions': len(stats['questions']),
+        'users': len(stats['users']),
+        'watermark': watermark.last_id,
+    }
+
+
+def reset():
+    """Clear all estimates and the watermark."""
+    # Core updates: calibration must not bump Question.version
+    db.session.execute(update(Question.__table__).values(
+        calibrated_difficulty=None, calibration_weight=0.0, calibration_responses=0))
+    db.session.execute(update(User.__table__).values(ability=None, ability_weight=0.0))
+    db.session.execute(update(JobWatermark.__table__)
+                       .where(JobWatermark.name == WATERMARK_NAME).values(last_id=0))
+    db.session.commit()
+
+
+def _fit_chunk(rows):
+    # NumPy is only needed for batch jobs, so keep it off the request path.
+    import numpy as np
+
+    user_ids, u = np.unique(np.fromiter((r.user_id for r in rows), dtype=np.int64, count=len(rows)),
+                            return_inverse=True)
+    question_ids, q = np.unique(np.fromiter((r.question_id for r in rows), dtype=np.int64, count=len(rows)),
+                                return_inverse=True)
+    y = np.fromiter((bool(r.is_correct) for r in rows), dtype=float, count=len(rows))
+    n_users, n_questions = len(user_ids), len(question_ids)
+
+    users = {row.id: row for row in db.session.execute(
+        select(User.id, User.ability, User.ability_weight).where(User.id.in_(user_ids.tolist())))}
+    questions = {row.id: row for row in db.session.execute(
+        select(Question.id, Question.difficulty, Question.calibrated_difficulty,
+               Question.calibration_weight, Question.calibration_responses)
+        .where(Question.id.in_(question_ids.tolist())))}
+
+    theta0 = np.array([_prior(users.get(i), 'ability', 0.0) for i in user_ids.tolist()])
+    theta_w = np.array([_weight(users.get(i), 'ability_weight') for i in user_ids.tolist()])
+    b0 = np.array([
+        _prior(questions.get(i), 'calibrated_difficulty',
+               LABEL_PRIORS.get(getattr(questions.get(i), 'difficulty', None), 0.0))
+        for i in question_ids.tolist()
+    ])
+    b_w = np.array([_weight(questions.get(i), 'calibration_weight') for i in question_ids.tolist()])
+
+    theta, b = theta0.copy(), b0.copy()
+    for _ in range(ITERATIONS):
+        # Alternate Newton steps on the penalized log-likelihood
+        p = _sigmoid(theta[u] - b[q])
+        grad = np.bincount(u, y - p, n_users) - theta_w * (theta - theta0)
+        hess = np.bincount(u, p * (1 - p), n_users) + theta_w
+        theta += grad / hess
+
+        p = _sigmoid(theta[u] - b[q])
+        grad = -np.bincount(q, y - p, n_questions) - b_w * (b - b0)
+        hess = np.bincount(q, p * (1 - p), n_questions) + b_w
+        b += grad / hess
+
+    p = _sigmoid(theta[u] - b[q])
+    info = p * (1 - p)
+    theta_w = np.minimum(theta_w + np.bincount(u, info, n_users), MAX_WEIGHT)
+    b_w = np.minimum(b_w + np.bincount(q, info, n_questions), MAX_WEIGHT)
+    counts = np.bincount(q, minlength=n_questions)
+
+    db.session.execute(
+        update(User.__table__).where(User.__table__.c.id == bindparam('b_id'))
+        .values(ability=bindparam('b_ability'), ability_weight=bindparam('b_weight')),
+        [{'b_id': i, 'b_ability': a, 'b_weight': w}
+         for i, a, w in zip(user_ids.tolist(), theta.tolist(), theta_w.tolist()) if i in users],
+    )
+    db.session.execute(
+        update(Question.__table__).where(Question.__table__.c.id == bindparam('b_id'))
+        .values(calibrated_difficulty=bindparam('b_difficulty'), calibration_weight=bindparam('b_weight'),
+                calibration_responses=bindparam('b_responses')),
+        [{'b_id': i, 'b_difficulty': d, 'b_weight': w,
+          'b_responses': questions[i].calibration_responses + n}
+         for i, d, w, n in zip(question_ids.tolist(), b.tolist(), b_w.tolist(), counts.tolist())
+         if i in questions],
+    )
+    return question_ids.tolist(), user_ids.tolist()
+
+
+def _prior(row, column, default):
+    value = getattr(row, column, None) if row is not None else None
+    return default if value is None else value
+
+
+def _weight(row, column):
+    weight = getattr(row, column, 0.0) if row is not None else 0.0
+    return weight or PRIOR_WEIGHT
+
+
+def _sigmoid(x):
+    import numpy as np
+    return 1.0 / (1.0 + np.exp(-x))
@@ -0,0 +1,134 @@
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import bindparam, select, update
+
+from .calibration import DEFAULT_BATCH_SIZE as CALIBRATION_BATCH_SIZE, calibrate
+from .extensions import db
+from .export import EXPORT_FORMATS, encode, iter_responses
+from .grading import grade_batch
+from .models import Subject, Concept, Question, User, UserResponse
+
+
+@click.command('regrade')
+@click.option('--subject', 'subject_slug', help='Only re-grade questions in this subject.')
+@click.option('--concept', 'concept_slug', help='Only re-grade questions in this concept.')
+@click.option('--question', 'legacy_ids', multiple=True, help='Legacy id of a question to re-grade. May be repeated.')
+@click.option('--batch-size', default=1000, show_default=True, help='Number of responses graded per batch.')
+@click.option('--dry-run', is_flag=True, help='Report changes without writing them.')
+@with_appcontext
+def regrade_command(subject_slug, concept_slug, legacy_ids, batch_size, dry_run):
+    """Re-grade stored responses against the current answer key."""
+    query = Question.query.join(Concept).join(Subject)
+    if subject_slug:
+        query = query.filter(Subject.slug == subject_slug)
+    if concept_slug:
+        query = query.filter(Concept.slug == concept_slug)
+    if legacy_ids:
+        query = query.filter(Question.legacy_id.in_(legacy_ids))
+    questions = query.order_by(Question.id).all()
+    if not questions:
+        click.echo('No matching questions.')
+        return
+
+    total_seen = total_changed = 0
+    for question in questions:
+        seen = changed = 0
+        last_id = 0
+        while True:
+            # Keyset pagination keeps each batch an index range scan.
+            rows = db.session.execute(
+                select(UserResponse.id, UserResponse.response_data, UserResponse.is_correct)
+                .where(UserResponse.question_id == question.id, UserResponse.id > last_id)
+                .order_by(UserResponse.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            results = grade_batch(question, [(row.response_data or {}).get('answer') for row in rows])
+            changes = [
+                {'id': row.id, 'is_correct': bool(ok)}
+                for row, ok in zip(rows, results)
+                if bool(ok) != row.is_correct
+            ]
+            if changes and not dry_run:
+                db.session.execute(update(UserResponse), changes)
+                db.session.commit()
+            seen += len(rows)
+            changed += len(changes)
+
+        if seen:
+            click.echo(f'{question.legacy_id}: {seen} responses, {changed} changed')
+        total_seen += seen
+        total_changed += changed
+
+    verb = 'would change' if dry_run else 'changed'
+    click.echo(f'Re-graded {total_seen} responses across {len(questions)} questions; {verb} {total_changed}.')
+
+
+@click.command('export-responses')
+@click.option('--user', 'email', help='Only export this user\'s responses (by email).')
+@click.option('--subject', 'subject_slug', help='Only export responses in this subject.')
+@click.option('--format', 'export_format', type=click.Choice(list(EXPORT_FORMATS)), default='csv', show_default=True)
+@click.option('--batch-size', default=1000, show_default=True, help='Rows fetched per round trip.')
+@click.option('--output', type=click.File('w', encoding='utf-8', lazy=True), default='-',
+              help='File to write (default: stdout).')
+@with_appcontext
+def export_responses_command(email, subject_slug, export_format, batch_size, output):
+    """Stream response history as CSV or NDJSON in constant memory."""
+    user_id = None
+    if email:
+        user_id = db.session.scalar(select(User.id).where(User.email == email))
+        if user_id is None:
+            raise click.ClickException(f'No user with email {email}')
+    rows = iter_responses(user_id=user_id, subject_slug=subject_slug, batch_size=batch_size)
+    for chunk in encode(rows, export_format):
+        output.write(chunk)
+
+
+@click.command('calibrate')
+@click.option('--batch-size', default=CALIBRATION_BATCH_SIZE, show_default=True, help='Responses fitted per chunk.')
+@click.option('--full', is_flag=True, help='Discard current estimates and refit from the first response.')
+@with_appcontext
+def calibrate_command(batch_size, full):
+    """Fit question difficulty and user ability from new responses."""
+    stats = calibrate(batch_size=batch_size, full=full)
+    click.echo(f"Calibrated {stats['questions']} questions and {stats['users']} users "
+               f"from {stats['responses']} responses; watermark at response {stats['watermark']}.")
+
+
+@click.command('backfill-payloads')
+@click.option('--all', 'rewrite_all', is_flag=True, help='Rewrite every payload, not only missing ones.')
+@click.option('--batch-size', default=1000, show_default=True, help='Questions serialized per batch.')
+@with_appcontext
+def backfill_payloads_command(rewrite_all, batch_size):
+    """Store the serialized API payload of questions that lack one."""
+    table = Question.__table__
+    query = select(Question).order_by(Question.id).limit(batch_size)
+    if not rewrite_all:
+        query = query.where(table.c.payload.is_(None))
+    total = 0
+    last_id = 0
+    while True:
+        questions = db.session.scalars(query.where(Question.id > last_id)).all()
+        if not questions:
+            break
+        last_id = questions[-1].id
+        # Core update: storing the payload is not a content change, so the
+        # version is not bumped
+        db.session.execute(
+            update(table).where(table.c.id == bindparam('b_id')).values(payload=bindparam('b_payload')),
+            [{'b_id': question.id, 'b_payload': question.serialize_payload()} for question in questions],
+        )
+        db.session.commit()
+        total += len(questions)
+    click.echo(f'Stored payloads for {total} questions.')
+
+
+def register_commands(app):
+    """Register the application's CLI commands."""
+    app.cli.add_command(regrade_command)
+    app.cli.add_command(export_responses_command)
+    app.cli.add_command(calibrate_command)
+    app.cli.add_command(backfill_payloads_command)
@@ -24,8 +24,158 @@ class Config:
         # Fallback to SQLite for local development if no env vars are set
         SQLALCHEMY_DATABASE_URI = f'sqlite:///{os.path.join(basedir, "mathyou.db")}'
 
+    # --- JSON ---
+    # 'auto' uses orjson for responses and JSON columns when it is
+    # installed; 'orjson' requires it; 'default' keeps Flask's stdlib provider.
+    # With orjson, non-ASCII characters are sent as UTF-8 rather than \u
+    # escapes (still charset=utf-8 JSON). Stored question payloads follow the
+    # provider; run `flask backfill-payloads --all` after switching.
+    JSON_PROVIDER = os.environ.get('JSON_PROVIDER', 'auto')
+
+    # --- Warm-up ---
+    # Each worker compiles templates, opens pooled connections, loads the
+    # content catalog and builds the Gemini clients before /readyz reports
+    # ready (see app/warmup.py and gunicorn.conf.py).
+    WARMUP_ENABLED = os.environ.get('WARMUP_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    # Connections to open; defaults to the engine's pool size
+    WARMUP_DB_CONNECTIONS = int(os.environ.get('WARMUP_DB_CONNECTIONS', 0)) or None
+    # Seconds to wait for the Gemini SDK import and model build
+    WARMUP_GEMINI_TIMEOUT = float(os.environ.get('WARMUP_GEMINI_TIMEOUT', 10.0))
+
+    # --- Password Hashing ---
+    # Any Werkzeug method string; existing hashes are upgraded on login.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_HASH_SALT_LENGTH = int(os.environ.get('PASSWORD_HASH_SALT_LENGTH', 16))
+    # Threads hashing concurrently; defaults to the number of CPUs
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 0)) or None
+
+    # --- User Cache ---
+    # Seconds a logged-in user is served from memory instead of the database
+    USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 30))
+
+    # --- Template Caching ---
+    # Discipline page nav and layout are rendered once per subject content
+    FRAGMENT_CACHE_ENABLED = os.environ.get('FRAGMENT_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    FRAGMENT_CACHE_MAX_ENTRIES = int(os.environ.get('FRAGMENT_CACHE_MAX_ENTRIES', 128))
+    # Compiled Jinja templates are kept here across restarts; empty disables
+    JINJA_BYTECODE_CACHE_DIR = os.environ.get('JINJA_BYTECODE_CACHE_DIR', os.path.join(basedir, 'instance', 'jinja_cache'))
+
+    # --- Overview Cache ---
+    # How AI overviews are keyed: 'exact' (per user and solved count),
+    # 'tiered' (per user and solved-count tier) or 'tier_only' (shared by
+    # everyone in the same tier with the same recent concepts). Unknown
+    # values are logged and replaced with 'tiered'.
+    OVERVIEW_CACHE_KEY_STRATEGY = os.environ.get('OVERVIEW_CACHE_KEY_STRATEGY', 'tiered')
+
+    # --- Item Calibration ---
+    # Responses a question needs before its calibrated difficulty (see
+    # `flask calibrate`) replaces its label on the difficulty ladder, and
+    # the logit cut points between Easy|Medium and Medium|Hard.
+    CALIBRATION_MIN_RESPONSES = int(os.environ.get('CALIBRATION_MIN_RESPONSES', 30))
+    CALIBRATION_LEVEL_CUTS = (
+        float(os.environ.get('CALIBRATION_EASY_CUT', -0.5)),
+        float(os.environ.get('CALIBRATION_HARD_CUT', 0.5)),
+    )
+
+    # --- Exports ---
+    # Accounts allowed to export other users' and whole-table histories
+    EXPORT_ADMIN_EMAILS = [e.strip() for e in os.environ.get('EXPORT_ADMIN_EMAILS', '').split(',') if e.strip()]
+
+    # --- Group Commit ---
+    # When enabled, concurrent answer submissions are written in one
+    # transaction per interval instead of one commit per request.
+    GROUP_COMMIT_ENABLED = os.environ.get('GROUP_COMMIT_ENABLED', '').lower() in ('1', 'true', 'yes')
+    GROUP_COMMIT_INTERVAL_MS = int(os.environ.get('GROUP_COMMIT_INTERVAL_MS', 5))
+    GROUP_COMMIT_MAX_BATCH = int(os.environ.get('GROUP_COMMIT_MAX_BATCH', 500))
+    GROUP_COMMIT_TIMEOUT = float(os.environ.get('GROUP_COMMIT_TIMEOUT', 5.0))
+    # Extra time a request waits for a batch already being written
+    GROUP_COMMIT_WRITE_MARGIN = float(os.environ.get('GROUP_COMMIT_WRITE_MARGIN', 5.0))
+
+    # --- Instrumentation ---
+    # METRICS_ENABLED exposes Prometheus metrics on /metrics;
+    # SERVER_TIMING_ENABLED adds a Server-Timing header to every response.
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '').lower() in ('1', 'true', 'yes')
+    SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING_ENABLED', '').lower() in ('1', 'true', 'yes')
+
+    # --- Traffic Capture ---
+    # Sanitized request traces for offline replay (see benchmarks/replay.py).
+    # Each process writes <path stem>-<pid><ext>, e.g. requests-1234.jsonl
+    TRAFFIC_CAPTURE_ENABLED = os.environ.get('TRAFFIC_CAPTURE_ENABLED', '').lower() in ('1', 'true', 'yes')
+    TRAFFIC_CAPTURE_PATH = os.environ.get('TRAFFIC_CAPTURE_PATH') or os.path.join(basedir, 'instance', 'traffic', 'requests.jsonl')
+    TRAFFIC_CAPTURE_MAX_BYTES = int(os.environ.get('TRAFFIC_CAPTURE_MAX_BYTES', 50 * 1024 * 1024))
+    TRAFFIC_CAPTURE_BACKUPS = int(os.environ.get('TRAFFIC_CAPTURE_BACKUPS', 10))
+    TRAFFIC_USER_BUCKETS = int(os.environ.get('TRAFFIC_USER_BUCKETS', 64))
+
+    # --- Generated Problem Pool ---
+    # Serve mastered users pre-generated real-world problems, refilled in
+    # the background, instead of one shared problem generated on demand.
+    PROBLEM_POOL_ENABLED = os.environ.get('PROBLEM_POOL_ENABLED', '').lower() in ('1', 'true', 'yes')
+    # Unseen problems to keep ready for each user who has mastered a concept
+    PROBLEM_POOL_TARGET_DEPTH = int(os.environ.get('PROBLEM_POOL_TARGET_DEPTH', 5))
+    PROBLEM_POOL_MAX_PER_CONCEPT = int(os.environ.get('PROBLEM_POOL_MAX_PER_CONCEPT', 100))
+
+    # --- LLM Concurrency ---
+    # Process-wide cap on concurrent model requests. Each attempt, hedge or
+    # fallback holds a slot until it returns, even once abandoned. Requests
+    # beyond the cap wait up to LLM_QUEUE_TIMEOUT seconds (at most
+    # LLM_MAX_QUEUED of them) and are otherwise shed, falling back to static
+    # content; hedges are skipped instead of waiting.
+    LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', 16))
+    LLM_MAX_QUEUED = int(os.environ.get('LLM_MAX_QUEUED', 32))
+    LLM_QUEUE_TIMEOUT = float(os.environ.get('LLM_QUEUE_TIMEOUT', 2.0))
+
+    # --- LLM Time Budgets ---
+    # Total seconds each AI call site may spend, from waiting for a slot
+    # through every model attempt, before it serves its fallback.
+    LLM_CALL_BUDGETS = {
+        'feedback': float(os.environ.get('LLM_FEEDBACK_BUDGET', 2.5)),
+        'overview': float(os.environ.get('LLM_OVERVIEW_BUDGET', 4.0)),
+        'generated_question': float(os.environ.get('LLM_GENERATED_QUESTION_BUDGET', 10.0)),
+    }
+    # Share of the remaining budget given to each attempt but the last
+    LLM_ATTEMPT_SHARE = float(os.environ.get('LLM_ATTEMPT_SHARE', 0.6))
+    # Attempts that would get less than this are not started
+    LLM_MIN_ATTEMPT_SECONDS = float(os.environ.get('LLM_MIN_ATTEMPT_SECONDS', 0.25))
+
+    # --- LLM Hedging ---
+    # Send a backup request to the next model once the primary exceeds its
+    # observed p90 latency (LLM_HEDGE_DEFAULT_DELAY until enough samples).
+    # LLM_HEDGE_BUDGET caps hedges as a fraction of calls.
+    LLM_HEDGE_ENABLED = os.environ.get('LLM_HEDGE_ENABLED', '').lower() in ('1', 'true', 'yes')
+    LLM_HEDGE_BUDGET = float(os.environ.get('LLM_HEDGE_BUDGET', 0.1))
+    LLM_HEDGE_DEFAULT_DELAY = float(os.environ.get('LLM_HEDGE_DEFAULT_DELAY', 2.0))
+    # Threads running hedged and budgeted model calls
+    LLM_HEDGE_WORKERS = int(os.environ.get('LLM_HEDGE_WORKERS', 32))
+
+    # --- Async AI Views ---
+    # Serve overview, submit_answer and generated questions from async views
+    # that await the Gemini async API (requires asgiref, i.e. Flask[async]).
+    ASYNC_AI_VIEWS = os.environ.get('ASYNC_AI_VIEWS', '').lower() in ('1', 'true', 'yes')
+
+    # --- LLM Single-Flight ---
+    # Identical concurrent LLM calls in a process share one upstream request.
+    LLM_SINGLE_FLIGHT_ENABLED = os.environ.get('LLM_SINGLE_FLIGHT_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    # Also coalesce across worker processes that share LLM_SINGLE_FLIGHT_DB
+    LLM_SINGLE_FLIGHT_CROSS_PROCESS = os.environ.get('LLM_SINGLE_FLIGHT_CROSS_PROCESS', '').lower() in ('1', 'true', 'yes')
+    LLM_SINGLE_FLIGHT_DB = os.environ.get('LLM_SINGLE_FLIGHT_DB') or os.path.join(basedir, 'instance', 'llm_flights.db')
+    # Seconds a cross-process result stays visible to waiting processes
+    LLM_SINGLE_FLIGHT_RESULT_TTL = float(os.environ.get('LLM_SINGLE_FLIGHT_RESULT_TTL', 30))
+
+    # --- LLM Context Caching ---
+    # Store system instructions server-side with Gemini context caching
+    # where supported; falls back to per-request system instructions.
+    LLM_CONTEXT_CACHE_ENABLED = os.environ.get('LLM_CONTEXT_CACHE_ENABLED', '').lower() in ('1', 'true', 'yes')
+    LLM_CONTEXT_CACHE_TTL = int(os.environ.get('LLM_CONTEXT_CACHE_TTL', 3600))
+
 class TestingConfig(Config):
     """Configuration for testing."""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
-    WTF_CSRF_ENABLED = False
\ No newline at end of file
+    WTF_CSRF_ENABLED = False
+    # Fail any request that exceeds its entry in VIEW_QUERY_BUDGETS
+    QUERY_BUDGETS_ENFORCED = True
+    # Each thread gets its own in-memory database, so a background warm-up
+    # would not see the test's tables
+    WARMUP_ENABLED = False
+    # Tests compile templates fresh instead of sharing instance/jinja_cache
+    JINJA_BYTECODE_CACHE_DIR = ''
@@ -0,0 +1,114 @@
+"""Streaming export of user response history as CSV or NDJSON.
+
+Rows are read with `yield_per` (a server-side cursor on PostgreSQL, via
+stream_results) and encoded one at a time, so an export holds roughly one
+batch in memory however large `user_responses` is. The same generators
+back the `/api/export/responses` endpoint and `flask export-responses`.
+"""
+import csv
+import io
+import json
+
+from sqlalchemy import select
+
+from .extensions import db
+from .models import Subject, Concept, Question, User, UserResponse
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+EXPORT_COLUMNS = ['response_id', 'user_id', 'user_email', 'subject', 'concept', 'question_id',
+                  'answer', 'is_correct', 'timestamp']
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Leading characters that make spreadsheet apps evaluate a cell as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def iter_responses(user_id=None, subject_slug=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Yield one dict per response, oldest first, optionally filtered by user and subject."""
+    query = (
+        select(UserResponse.id, UserResponse.user_id, User.email, Subject.slug, Concept.slug,
+               Question.legacy_id, UserResponse.response_data, UserResponse.is_correct,
+               UserResponse.timestamp)
+        .join(User, User.id == UserResponse.user_id)
+        .join(Question, Question.id == UserResponse.question_id)
+        .join(Concept, Concept.id == Question.concept_id)
+        .join(Subject, Subject.id == Concept.subject_id)
+        .order_by(UserResponse.id)
+        .execution_options(yield_per=batch_size)
+    )
+    if user_id is not None:
+        query = query.where(UserResponse.user_id == user_id)
+    if subject_slug:
+        query = query.where(Subject.slug == subject_slug)
+
+    for row in db.session.execute(query):
+        yield {
+            'response_id': row[0],
+            'user_id': row[1],
+            'user_email': row[2],
+            'subject': row[3],
+            'concept': row[4],
+            'question_id': row[5],
+            'answer': (row[6] or {}).get('answer'),
+            'is_correct': row[7],
+            'timestamp': row[8].isoformat() if row[8] else None,
+        }
+
+
+def _csv_value(value):
+    # Vector answers are lists; keep them as JSON in a single cell
+    if isinstance(value, (list, dict)):
+        value = json.dumps(value)
+    # Answers are free text: quote anything a spreadsheet would run as a
+    # formula. Only CSV is opened that way, so NDJSON keeps the raw value.
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def encode_csv(rows):
+    """Yield CSV text chunks: a header line, then one line per row."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue()
+    for row in rows:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow([_csv_value(row[column]) for column in EXPORT_COLUMNS])
+        yield buffer.getvalue()
+
+
+def encode_ndjson(rows):
+    """Yield one JSON document per line."""
+    for row in rows:
+        yield json.dumps(row, separators=(',', ':')) + '\n'
+
+
+def _chunked(pieces, chunk_size):
+    # One write per row would mean one socket send per row; group them.
+    parts = []
+    size = 0
+    for piece in pieces:
+        parts.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield ''.join(parts)
+            parts = []
+            size = 0
+    if parts:
+        yield ''.join(parts)
+
+
+def encode(rows, export_format, chunk_size=64 * 1024):
+    """Encode rows in `export_format`, yielding text chunks of about `chunk_size` characters."""
+    if export_format == 'csv':
+        return _chunked(encode_csv(rows), chunk_size)
+    if export_format == 'ndjson':
+        return _chunked(encode_ndjson(rows), chunk_size)
+    raise ValueError(f'Unknown export format: {export_format}')
@@ -0,0 +1,75 @@
+"""Rendered template fragments cached by content.
+
+Parts of a page that only change when content changes, such as the
+discipline page's concept nav and layout, are rendered once per key and
+reused. A fragment may leave one `slot` for per-request data. It is cached
+as the markup before and after the slot, and the page template splices the
+per-user value in between:
+
+    {{ shell.before }}{{ problems | tojson }}{{ shell.after }}
+
+Keys must include everything the fragment renders (e.g. the subject and
+its concept names and slugs), so edited content gets a new entry instead
+of needing invalidation. The least recently used entries are dropped past
+FRAGMENT_CACHE_MAX_ENTRIES.
+"""
+import threading
+from collections import OrderedDict, namedtuple
+
+from flask import current_app, render_template
+from markupsafe import Markup
+
+Shell = namedtuple('Shell', ['before', 'after'])
+
+# Rendered in place of the slot, then split on
+_SLOT_MARKER = '\x00fragment-slot\x00'
+
+
+class FragmentCache:
+    """Flask extension caching rendered template fragments."""
+
+    def __init__(self, app=None):
+        self.app = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['fragment_cache'] = self
+        self.clear()
+
+    def shell(self, template_name, key, **context):
+        """Return the Shell rendered from `template_name` for `key`.
+
+        The template marks where per-request data goes with `{{ slot }}`.
+        """
+        config = current_app.config
+        enabled = config.get('FRAGMENT_CACHE_ENABLED', True)
+        cache_key = (template_name, key)
+        if enabled:
+            with self._lock:
+                shell = self._entries.get(cache_key)
+                if shell is not None:
+                    self._entries.move_to_end(cache_key)
+                    return shell
+
+        rendered = render_template(template_name, slot=Markup(_SLOT_MARKER), **context)
+        before, after = rendered.split(_SLOT_MARKER, 1)
+        shell = Shell(Markup(before), Markup(after))
+
+        if enabled:
+            with self._lock:
+                self._entries[cache_key] = shell
+                self._entries.move_to_end(cache_key)
+                while len(self._entries) > config.get('FRAGMENT_CACHE_MAX_ENTRIES', 128):
+                    self._entries.popitem(last=False)
+        return shell
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+fragment_cache = FragmentCache()
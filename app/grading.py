@@ -0,0 +1,304 @@
+"""Answer grading for practice questions.
+
+The stored `Question.data['answer']` is compiled once into a canonical form
+(choice index, exact number, numeric array or plain text) and cached by
+question id and content version. Submissions are normalized and compared
+against the compiled form, so the stored answer is never re-parsed.
+"""
+import json
+import math
+import re
+from fractions import Fraction
+
+from data.practice_problems import QuestionType
+
+# Absolute and relative tolerance used when a question does not set its own
+# `data['tolerance']`.
+DEFAULT_TOLERANCE = 1e-9
+
+# Longest scalar answer parsed as a number, and the largest decimal exponent
+# accepted. Fraction() is slow on huge inputs, so anything bigger is wrong.
+MAX_NUMBER_LENGTH = 100
+MAX_EXPONENT = 400
+# Longest vector or matrix answer string parsed
+MAX_ARRAY_LENGTH = 10000
+
+# question id -> (version, CompiledAnswer)
+COMPILED_ANSWER_CACHE = {}
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_ARRAY_SPLIT_RE = re.compile(r'[,\s]+')
+_EXPONENT_RE = re.compile(r'[eE]([+-]?\d+)')
+
+
+class CompiledAnswer:
+    """Canonical form of a question's correct answer."""
+    __slots__ = ('kind', 'value', 'tolerance', 'choices')
+
+    CHOICE = 'choice'
+    NUMBER = 'number'
+    ARRAY = 'array'
+    TEXT = 'text'
+
+    def __init__(self, kind, value, tolerance=DEFAULT_TOLERANCE, choices=None):
+        self.kind = kind
+        self.value = value
+        self.tolerance = tolerance
+        self.choices = choices
+
+    def __repr__(self):
+        return f'<CompiledAnswer {self.kind} {self.value!r}>'
+
+
+def _strip_math(text):
+    """Remove LaTeX delimiters, whitespace and unicode minus signs."""
+    text = text.strip().strip('$').strip()
+    return text.replace('−', '-')
+
+
+def parse_number(value):
+    """Parse a scalar answer such as 5, "0.60", ".6" or "3/5" into a Fraction.
+
+    Returns None if the value is not a finite number.
+    """
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, int):
+        return Fraction(value)
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            return None
+        return Fraction(repr(value))
+    if not isinstance(value, str):
+        return None
+    text = _WHITESPACE_RE.sub('', _strip_math(value))
+    if not text or len(text) > MAX_NUMBER_LENGTH:
+        return None
+    if any(abs(int(exp)) > MAX_EXPONENT for exp in _EXPONENT_RE.findall(text)):
+        return None
+    try:
+        return Fraction(text)
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+def parse_array(value):
+    """Parse a vector or matrix answer into a tuple of Fractions.
+
+    Vectors become a flat tuple, matrices a tuple of row tuples. Accepts
+    lists from the vector widget as well as strings like "[130, 40]",
+    "(1, 2, 3)" or "[[1, 2], [3, 4]]". Returns None if any component is
+    not a number, or if the string is too long or too deeply nested.
+    """
+    if isinstance(value, str):
+        text = _strip_math(value)
+        if not text or len(text) > MAX_ARRAY_LENGTH:
+            return None
+        try:
+            value = json.loads(text.replace('(', '[').replace(')', ']'))
+        except (ValueError, RecursionError):
+            value = [part for part in _ARRAY_SPLIT_RE.split(text.strip('[]')) if part]
+        if not isinstance(value, list):
+            value = [value]
+    if not isinstance(value, (list, tuple)):
+        return None
+
+    items = _trim_empty(value)
+    if not items:
+        return None
+
+    if all(isinstance(item, (list, tuple)) for item in items):
+        # Matrix rows hold numbers only, so nesting stops here
+        rows = tuple(_parse_numbers(_trim_empty(item)) for item in items)
+        if any(row is None for row in rows):
+            return None
+        if len({len(row) for row in rows}) != 1:
+            return None
+        return rows
+
+    return _parse_numbers(items)
+
+
+def _trim_empty(items):
+    # The vector widget always renders a fixed number of inputs; trailing
+    # empty components are ignored rather than treated as wrong.
+    items = list(items)
+    while items and isinstance(items[-1], str) and not items[-1].strip():
+        items.pop()
+    return items
+
+
+def _parse_numbers(items):
+    if not items:
+        return None
+    numbers = tuple(parse_number(item) for item in items)
+    if any(n is None for n in numbers):
+        return None
+    return numbers
+
+
+def _normalize_text(value):
+    return _WHITESPACE_RE.sub(' ', str(value)).strip()
+
+
+def _tolerance(value):
+    """`data['tolerance']` as a float; DEFAULT_TOLERANCE if missing or invalid."""
+    if isinstance(value, bool):
+        return DEFAULT_TOLERANCE
+    try:
+        tolerance = float(value)
+    except (TypeError, ValueError):
+        return DEFAULT_TOLERANCE
+    if not math.isfinite(tolerance) or tolerance < 0:
+        return DEFAULT_TOLERANCE
+    return tolerance
+
+
+def compile_answer(data):
+    """Compile a question's `data` dict into a CompiledAnswer."""
+    answer = data.get('answer')
+    qtype = data.get('type')
+    tolerance = _tolerance(data.get('tolerance', DEFAULT_TOLERANCE))
+
+    if qtype == QuestionType.MULTIPLE_CHOICE:
+        choices = data.get('choices') or []
+        index = parse_number(answer)
+        if index is not None and index.denominator == 1:
+            return CompiledAnswer(CompiledAnswer.CHOICE, int(index),
+                                  choices=[_normalize_text(c) for c in choices])
+        return CompiledAnswer(CompiledAnswer.TEXT, _normalize_text(answer))
+
+    if qtype == QuestionType.VECTOR or isinstance(answer, (list, tuple)):
+        array = parse_array(answer)
+        if array is not None:
+            return CompiledAnswer(CompiledAnswer.ARRAY, array, tolerance)
+        return CompiledAnswer(CompiledAnswer.TEXT, _normalize_text(answer))
+
+    number = parse_number(answer)
+    if number is not None:
+        return CompiledAnswer(CompiledAnswer.NUMBER, number, tolerance)
+    return CompiledAnswer(CompiledAnswer.TEXT, _normalize_text(answer))
+
+
+def get_compiled_answer(question):
+    """Return the cached CompiledAnswer for a question, compiling on a miss."""
+    if question.id is None:
+        return compile_answer(question.data or {})
+    cached = COMPILED_ANSWER_CACHE.get(question.id)
+    if cached is not None and cached[0] == question.version:
+        return cached[1]
+    compiled = compile_answer(question.data or {})
+    COMPILED_ANSWER_CACHE[question.id] = (question.version, compiled)
+    return compiled
+
+
+def _numbers_match(expected, submitted, tolerance):
+    if expected == submitted:
+        return True
+    try:
+        return math.isclose(float(expected), float(submitted), rel_tol=tolerance, abs_tol=tolerance)
+    except (OverflowError, ValueError):
+        # Too large for a float and not exactly equal
+        return False
+
+
+def check_answer(compiled, user_answer):
+    """Compare a raw submission against a CompiledAnswer."""
+    if compiled.kind == CompiledAnswer.CHOICE:
+        index = parse_number(user_answer)
+        if index is not None:
+            return index == compiled.value
+        # Accept the text of the correct choice as well as its index.
+        if compiled.choices and 0 <= compiled.value < len(compiled.choices):
+            return _normalize_text(user_answer) == compiled.choices[compiled.value]
+        return False
+
+    if compiled.kind == CompiledAnswer.NUMBER:
+        number = parse_number(user_answer)
+        if number is None:
+            return False
+        return _numbers_match(compiled.value, number, compiled.tolerance)
+
+    if compiled.kind == CompiledAnswer.ARRAY:
+        array = parse_array(user_answer)
+        if array is None or len(array) != len(compiled.value):
+            return False
+        for expected, submitted in zip(compiled.value, array):
+            if isinstance(expected, tuple) != isinstance(submitted, tuple):
+                return False
+            if isinstance(expected, tuple):
+                if len(expected) != len(submitted):
+                    return False
+                if not all(_numbers_match(e, s, compiled.tolerance) for e, s in zip(expected, submitted)):
+                    return False
+            elif not _numbers_match(expected, submitted, compiled.tolerance):
+                return False
+        return True
+
+    return _normalize_text(user_answer) == compiled.value
+
+
+def grade(question, user_answer):
+    """Grade a submission for a question using its cached compiled answer."""
+    return check_answer(get_compiled_answer(question), user_answer)
+
+
+def grade_batch(question, answers):
+    """Grade many submissions for one question at once.
+
+    Numeric and vector/matrix submissions are parsed, stacked into a single
+    NumPy array per shape and compared elementwise against the compiled
+    answer in one vectorized step, using the same symmetric rule as
+    `math.isclose` in `grade`. Returns a boolean array aligned with
+    `answers`.
+    """
+    # NumPy is only needed for batch jobs, so keep it off the request path.
+    import numpy as np
+
+    compiled = get_compiled_answer(question)
+    results = np.zeros(len(answers), dtype=bool)
+
+    if compiled.kind == CompiledAnswer.NUMBER:
+        parse = parse_number
+    elif compiled.kind == CompiledAnswer.ARRAY:
+        parse = parse_array
+    else:
+        parse = None
+    try:
+        expected = np.asarray(compiled.value, dtype=float) if parse else None
+    except (OverflowError, ValueError):
+        parse = None
+    if parse is None:
+        for i, answer in enumerate(answers):
+            results[i] = check_answer(compiled, answer)
+        return results
+
+    indices = []
+    values = []
+    for i, answer in enumerate(answers):
+        parsed = parse(answer)
+        if parsed is None:
+            continue
+        if parsed == compiled.value:
+            results[i] = True
+            continue
+        try:
+            value = np.asarray(parsed, dtype=float)
+        except OverflowError:
+            # Too large for a float; compare exactly, as grade() does
+            results[i] = check_answer(compiled, answer)
+            continue
+        except ValueError:
+            continue
+        if value.shape == expected.shape:
+            indices.append(i)
+            values.append(value)
+
+    if indices:
+        stacked = np.stack(values)
+        tolerance = compiled.tolerance
+        # math.isclose: |a - b| <= max(rel_tol * max(|a|, |b|), abs_tol)
+        close = np.abs(stacked - expected) <= np.maximum(
+            tolerance * np.maximum(np.abs(stacked), np.abs(expected)), tolerance)
+        results[indices] = close.reshape(len(indices), -1).all(axis=1)
+    return results
@@ -0,0 +1,101 @@
+"""Optional orjson-backed JSON for API responses and JSON columns.
+
+`init_json` picks the JSON implementation from the JSON_PROVIDER setting:
+'orjson' (required), 'default' (Flask's stdlib provider) or 'auto'
+(orjson when it is installed). The choice applies in two places. It backs
+`app.json`, which handles jsonify and request.get_json. It also becomes
+the engine's `json_serializer`/`json_deserializer`, which store
+`Question.data` and `UserResponse.response_data`.
+
+Responses stay the same as with Flask's provider: keys sorted, compact
+output, and dates, decimals, UUIDs and dataclasses converted the same way.
+The only difference is that non-ASCII characters are sent as UTF-8 instead
+of \\u escapes. Payloads serialized ahead of time (`response_bytes`) use
+the same options as the active provider, so they match what jsonify sends.
+"""
+import json
+import logging
+
+from flask import current_app, has_app_context
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Optional: falls back to the stdlib provider
+    orjson = None
+
+# Datetimes are handed to `default` so they render as HTTP dates, as with
+# Flask's provider, rather than ISO strings.
+_RESPONSE_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME if orjson else 0
+# Columns round-trip through the database, so keep orjson's ISO datetimes
+_COLUMN_OPTIONS = orjson.OPT_NON_STR_KEYS if orjson else 0
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider that serializes with orjson."""
+
+    def _options(self, sort_keys=None):
+        sort_keys = self.sort_keys if sort_keys is None else sort_keys
+        return _RESPONSE_OPTIONS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs.keys() - {'default', 'sort_keys'}:
+            # indent, cls, separators, ... are stdlib-only
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=kwargs.get('default', self.default),
+                            option=self._options(kwargs.get('sort_keys'))).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            # object_hook, parse_float, cls, ... are stdlib-only
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            # Pretty-printed, as with the default provider
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self._options() | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def response_bytes(obj):
+    """Compact JSON bytes for `obj`, as the active provider's jsonify sends them.
+
+    Outside an app context, Flask's provider defaults are used.
+    """
+    provider = current_app.json if has_app_context() else None
+    if isinstance(provider, OrjsonProvider):
+        return orjson.dumps(obj, default=provider.default, option=provider._options() | orjson.OPT_APPEND_NEWLINE)
+    defaults = provider or DefaultJSONProvider
+    text = json.dumps(obj, default=defaults.default, ensure_ascii=defaults.ensure_ascii,
+                      sort_keys=defaults.sort_keys, separators=(',', ':'))
+    return (text + '\n').encode('utf-8')
+
+
+def column_dumps(value):
+    """Engine `json_serializer`: JSON text for a JSON column value."""
+    return orjson.dumps(value, option=_COLUMN_OPTIONS).decode()
+
+
+def column_loads(text):
+    """Engine `json_deserializer`."""
+    return orjson.loads(text)
+
+
+def init_json(app):
+    """Install the configured JSON provider. Call before `db.init_app`."""
+    choice = app.config.get('JSON_PROVIDER', 'auto')
+    if choice == 'default' or (choice == 'auto' and orjson is None):
+        return
+    if orjson is None:
+        raise RuntimeError("JSON_PROVIDER is 'orjson' but orjson is not installed")
+    if choice not in ('auto', 'orjson'):
+        logging.warning(f"Unknown JSON_PROVIDER '{choice}', using orjson")
+
+    app.json = OrjsonProvider(app)
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    options.setdefault('json_serializer', column_dumps)
+    options.setdefault('json_deserializer', column_loads)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
@@ -0,0 +1,904 @@
+"""Gemini access for the AI features.
+
+The google.generativeai SDK (and its gRPC/protobuf stack) is imported on
+the first AI call instead of at app import, so CLI commands, migrations
+and seed scripts that never talk to Gemini do not pay for it.
+
+With LLM_HEDGE_ENABLED, a slow primary model is hedged: once it has run
+longer than its observed p90 latency, the same prompt is sent to the next
+candidate model and whichever answers first wins. Hedges are limited by a
+token bucket (LLM_HEDGE_BUDGET hedges per call on average) so tail latency
+drops without doubling spend.
+
+Long, fixed instructions such as the teacher persona are passed as a
+system instruction on model instances that are built once and reused.
+With LLM_CONTEXT_CACHE_ENABLED they are stored server-side with Gemini
+context caching where the model supports it. Input, output and cached
+token counts are recorded per call.
+
+Concurrent identical calls (same call site, system instruction and prompt)
+are coalesced: one caller talks to Gemini and the rest wait for its
+result. With LLM_SINGLE_FLIGHT_CROSS_PROCESS the same happens across
+worker processes on one host, coordinated through a small SQLite table
+(LLM_SINGLE_FLIGHT_DB) that holds claims and recent results.
+
+At most LLM_MAX_CONCURRENCY model requests run at once per process, with up
+to LLM_MAX_QUEUED more waiting no longer than LLM_QUEUE_TIMEOUT seconds for
+a slot. Every attempt takes its own slot, hedges and fallbacks included,
+and keeps it until the request really finishes, even after its caller has
+given up on it. A call that cannot get a slot is shed: generate_text
+returns None and the call site serves its static fallback instead of tying
+up a worker. A hedge that cannot get a slot right away is skipped.
+
+Each call also has a total time budget (LLM_CALL_BUDGETS, per call site)
+covering the wait for a slot and every model attempt. Each attempt except
+the last gets LLM_ATTEMPT_SHARE of what remains, so a slow first model
+still leaves time for a fallback model. The deadline is propagated to
+hedges and worker threads through a context variable.
+
+generate_text_async is the coroutine counterpart used by the async views
+(ASYNC_AI_VIEWS). Every async call runs on one long-lived event loop thread
+per process, which owns the SDK's async gRPC clients (they are bound to the
+loop that created them, and Flask gives each async view a fresh loop).
+Deadlines and hedges are handled with asyncio there, so in-flight upstream
+calls are not capped by executor threads and a losing hedge is really
+cancelled. The limiter, in-process single-flight and budgets are shared
+with generate_text. Cross-process coalescing is not used.
+"""
+import asyncio
+import contextvars
+import datetime
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from flask import current_app, has_app_context
+
+from .metrics import metrics
+
+GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
+
+# Every candidate must accept a system instruction (the persona is sent that way)
+CANDIDATE_MODELS = ['gemini-2.5-flash', 'gemini-2.5-pro']
+
+GENERATION_CONFIG = {
+    "temperature": 0.9,
+    "top_p": 0.8,
+    "top_k": 60,
+}
+
+# Minimum successful calls before a model's own p90 is trusted
+HEDGE_MIN_SAMPLES = 20
+
+# After a transient context caching failure, how long to use an uncached
+# model before trying to create the cache again
+CONTEXT_CACHE_RETRY_SECONDS = 60
+
+_genai = None
+_genai_lock = threading.Lock()
+
+# time.monotonic() deadline of the AI call in progress, if it has a budget
+_deadline = contextvars.ContextVar('llm_deadline', default=None)
+
+
+def get_genai():
+    """Import and configure the Gemini SDK on first use."""
+    global _genai
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                import google.generativeai as genai
+                if GEMINI_API_KEY:
+                    genai.configure(api_key=GEMINI_API_KEY)
+                _genai = genai
+    return _genai
+
+
+def is_available():
+    """Whether AI generation is configured for this process."""
+    return bool(GEMINI_API_KEY)
+
+
+def _config(key, default):
+    if has_app_context():
+        return current_app.config.get(key, default)
+    return default
+
+
+def remaining_budget():
+    """Seconds left in the current AI call's budget, or None if it has none."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def _attempt_timeout(attempts_left):
+    """Timeout for the next model attempt, or None if the call is unbudgeted."""
+    remaining = remaining_budget()
+    if remaining is None or attempts_left <= 1:
+        return remaining
+    return remaining * _config('LLM_ATTEMPT_SHARE', 0.6)
+
+
+def _min(timeout, remaining):
+    return timeout if remaining is None else min(timeout, remaining)
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies per model."""
+
+    def __init__(self, window=200):
+        self._samples = {}
+        self._window = window
+        self._lock = threading.Lock()
+
+    def record(self, model_name, seconds):
+        with self._lock:
+            samples = self._samples.get(model_name)
+            if samples is None:
+                samples = self._samples[model_name] = deque(maxlen=self._window)
+            samples.append(seconds)
+
+    def p90(self, model_name):
+        with self._lock:
+            samples = sorted(self._samples.get(model_name, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return samples[int(len(samples) * 0.9) - 1]
+
+
+class HedgeBudget:
+    """Token bucket: each call earns `ratio` tokens, each hedge spends one."""
+
+    def __init__(self, max_tokens=10.0):
+        self._tokens = 0.0
+        self._max_tokens = max_tokens
+        self._lock = threading.Lock()
+
+    def earn(self, ratio):
+        with self._lock:
+            self._tokens = min(self._max_tokens, self._tokens + ratio)
+
+    def try_spend(self):
+        with self._lock:
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            return False
+
+
+class ModelCache:
+    """Reusable GenerativeModel instances keyed by model and system instruction."""
+
+    def __init__(self):
+        self._models = {}
+        self._unsupported = set()
+        self._building = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_name, system_instruction=None):
+        key = (model_name, system_instruction)
+        model = self._lookup(key)
+        if model is not None:
+            return model
+        # One build per key at a time. Building may create a server-side
+        # cache over the network, so other keys are not held up meanwhile.
+        with self._lock:
+            build_lock = self._building.setdefault(key, threading.Lock())
+        with build_lock:
+            model = self._lookup(key)
+            if model is None:
+                model, expires = self._build(model_name, system_instruction)
+                with self._lock:
+                    self._models[key] = (model, expires)
+            return model
+
+    def peek(self, model_name, system_instruction=None):
+        """The cached model if there is a live one, without ever building it."""
+        return self._lookup((model_name, system_instruction))
+
+    def _lookup(self, key):
+        entry = self._models.get(key)
+        if entry is not None and (entry[1] is None or time.monotonic() < entry[1]):
+            return entry[0]
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self._unsupported.clear()
+
+    def _build(self, model_name, system_instruction):
+        genai = get_genai()
+        expires = None
+        if (system_instruction and _config('LLM_CONTEXT_CACHE_ENABLED', False)
+                and model_name not in self._unsupported):
+            ttl = _config('LLM_CONTEXT_CACHE_TTL', 3600)
+            try:
+                cached = genai.caching.CachedContent.create(
+                    model=f'models/{model_name}',
+                    system_instruction=system_instruction,
+                    ttl=datetime.timedelta(seconds=ttl),
+                )
+                model = genai.GenerativeModel.from_cached_content(
+                    cached_content=cached, generation_config=GENERATION_CONFIG)
+                # Rebuild a little before the server-side cache expires
+                return model, time.monotonic() + ttl * 0.9
+            except Exception as e:
+                if _caching_unsupported(e):
+                    logging.info(f"Context caching unavailable for {model_name}: {e}")
+                    with self._lock:
+                        self._unsupported.add(model_name)
+                else:
+                    logging.warning(f"Context cache creation failed for {model_name}, "
+                                    f"retrying in {CONTEXT_CACHE_RETRY_SECONDS}s: {e}")
+                    expires = time.monotonic() + CONTEXT_CACHE_RETRY_SECONDS
+        model = genai.GenerativeModel(
+            model_name, system_instruction=system_instruction, generation_config=GENERATION_CONFIG)
+        return model, expires
+
+
+def _caching_unsupported(error):
+    """Whether a CachedContent.create error means caching will never work for the model.
+
+    That is the case when the system instruction has too few tokens to cache
+    or the model does not support caching. Other errors (quota, timeouts,
+    server errors) are transient.
+    """
+    from google.api_core import exceptions
+    if not isinstance(error, (exceptions.InvalidArgument, exceptions.NotFound,
+                              exceptions.FailedPrecondition)):
+        return False
+    message = str(error).lower()
+    return any(reason in message for reason in ('token', 'not supported', 'unsupported', 'does not support'))
+
+
+class ConcurrencyLimiter:
+    """Caps concurrent calls, with a bounded wait queue and a wait deadline."""
+
+    def __init__(self):
+        self._in_flight = 0
+        self._waiting = 0
+        self._cond = threading.Condition()
+
+    def try_acquire(self, limit):
+        """Take a slot only if one is free right now."""
+        with self._cond:
+            if self._in_flight < limit and not self._waiting:
+                self._in_flight += 1
+                self._report()
+                return True
+            return False
+
+    def acquire(self, limit, max_queued, timeout, call):
+        """Take a slot; returns False (and records why) if the call is shed."""
+        with self._cond:
+            if self._in_flight < limit and not self._waiting:
+                self._in_flight += 1
+                self._report()
+                return True
+            if self._waiting >= max_queued:
+                metrics.inc('llm_shed_total', call=call, reason='queue_full')
+                return False
+            metrics.inc('llm_queued_total', call=call)
+            self._waiting += 1
+            self._report()
+            try:
+                acquired = self._cond.wait_for(lambda: self._in_flight < limit, timeout)
+            finally:
+                self._waiting -= 1
+            if not acquired:
+                metrics.inc('llm_shed_total', call=call, reason='timeout')
+                self._report()
+                return False
+            self._in_flight += 1
+            self._report()
+            return True
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._report()
+            self._cond.notify()
+
+    def _report(self):
+        metrics.set_gauge('llm_calls_in_flight', self._in_flight)
+        metrics.set_gauge('llm_calls_waiting', self._waiting)
+
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs one call per key at a time; concurrent callers share its result."""
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, timeout=None):
+        """Return (result, shared), where `shared` is True if another caller ran `fn`.
+
+        A caller that waits longer than `timeout` gets (None, True).
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            if not flight.done.wait(timeout):
+                return None, True
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+        try:
+            flight.result = fn()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result, False
+
+    async def do_async(self, key, coro_fn, timeout=None):
+        """Coroutine form of do(); followers wait for the leader off the event loop."""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            if not flight.done.is_set() and not await asyncio.to_thread(flight.done.wait, timeout):
+                return None, True
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+        try:
+            flight.result = await coro_fn()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result, False
+
+
+class SQLiteSingleFlight:
+    """Cross-process coalescing through a shared SQLite table.
+
+    The first process to insert a pending row for a key makes the call and
+    fills in the result. Other processes poll that row and return its text
+    once it appears. Results older than `ttl` seconds are discarded, so the
+    table never acts as a long-lived cache. A pending row older than
+    `timeout` is treated as abandoned (for example, its worker was killed)
+    and may be claimed again.
+    """
+
+    def __init__(self, path, ttl=30.0, timeout=60.0, poll_interval=0.05):
+        self.path = path
+        self.ttl = ttl
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS flights '
+                         '(key TEXT PRIMARY KEY, text TEXT, created REAL NOT NULL)')
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=self.timeout)
+
+    def _claim_or_read(self, key):
+        """Return (claimed, text) for a key, clearing expired rows first."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('DELETE FROM flights WHERE (text IS NOT NULL AND created <= ?) '
+                         'OR (text IS NULL AND created <= ?)', (now - self.ttl, now - self.timeout))
+            claimed = conn.execute('INSERT OR IGNORE INTO flights (key, text, created) VALUES (?, NULL, ?)',
+                                   (key, now)).rowcount == 1
+            if claimed:
+                return True, None
+            row = conn.execute('SELECT text FROM flights WHERE key = ?', (key,)).fetchone()
+        return False, row[0] if row else None
+
+    def _finish(self, key, text):
+        with self._connect() as conn:
+            if text is None:
+                conn.execute('DELETE FROM flights WHERE key = ?', (key,))
+            else:
+                conn.execute('UPDATE flights SET text = ?, created = ? WHERE key = ?', (text, time.time(), key))
+
+    def do(self, key, fn):
+        """Return (result, shared); calls `fn` directly if no result arrives in time.
+
+        The wait is bounded by `timeout` and by the current call's budget.
+        """
+        deadline = time.monotonic() + _min(self.timeout, remaining_budget())
+        while time.monotonic() < deadline:
+            claimed, text = self._claim_or_read(key)
+            if text is not None:
+                return text, True
+            if claimed:
+                text = None
+                try:
+                    text = fn()
+                finally:
+                    self._finish(key, text)
+                return text, False
+            time.sleep(self.poll_interval)
+        return fn(), False
+
+
+model_cache = ModelCache()
+latency_tracker = LatencyTracker()
+hedge_budget = HedgeBudget()
+single_flight = SingleFlight()
+limiter = ConcurrencyLimiter()
+
+_shared_single_flight = None
+_shared_single_flight_lock = threading.Lock()
+
+
+def _get_shared_single_flight():
+    """The cross-process coalescer, or None if it is disabled."""
+    global _shared_single_flight
+    path = _config('LLM_SINGLE_FLIGHT_DB', None)
+    if not _config('LLM_SINGLE_FLIGHT_CROSS_PROCESS', False) or not path:
+        return None
+    if _shared_single_flight is None or _shared_single_flight.path != path:
+        with _shared_single_flight_lock:
+            if _shared_single_flight is None or _shared_single_flight.path != path:
+                _shared_single_flight = SQLiteSingleFlight(
+                    path, ttl=_config('LLM_SINGLE_FLIGHT_RESULT_TTL', 30.0))
+    return _shared_single_flight
+
+
+def _flight_key(prompt, call, system_instruction):
+    digest = hashlib.sha256()
+    for part in (call, system_instruction or '', prompt):
+        digest.update(part.encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=_config('LLM_HEDGE_WORKERS', 32), thread_name_prefix='llm-hedge')
+    return _executor
+
+
+def _submit(fn, *args):
+    # Run in a copy of the caller's context so request-scoped metrics and
+    # current_app keep working inside the worker thread.
+    return _get_executor().submit(contextvars.copy_context().run, fn, *args)
+
+
+def _record_usage(response, model_name, call):
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is None:
+        return
+    metrics.inc('llm_input_tokens_total', getattr(usage, 'prompt_token_count', 0) or 0, model=model_name, call=call)
+    metrics.inc('llm_output_tokens_total', getattr(usage, 'candidates_token_count', 0) or 0, model=model_name, call=call)
+    metrics.inc('llm_cached_tokens_total', getattr(usage, 'cached_content_token_count', 0) or 0, model=model_name, call=call)
+
+
+def _call_model(model_name, prompt, call, system_instruction=None, timeout=None):
+    model = model_cache.get(model_name, system_instruction)
+    options = {'request_options': {'timeout': timeout}} if timeout is not None else {}
+    start = time.perf_counter()
+    with metrics.track_llm_call(model_name, call):
+        response = model.generate_content(prompt, **options)
+    text = response.text
+    latency_tracker.record(model_name, time.perf_counter() - start)
+    _record_usage(response, model_name, call)
+    return text
+
+
+def _acquire_slot(call):
+    """Wait for a limiter slot for one model attempt; False if the call is shed."""
+    return limiter.acquire(_config('LLM_MAX_CONCURRENCY', 16), _config('LLM_MAX_QUEUED', 32),
+                           _min(_config('LLM_QUEUE_TIMEOUT', 2.0), remaining_budget()), call)
+
+
+def _submit_attempt(model_name, prompt, call, system_instruction, timeout):
+    """Run one model attempt, holding an acquired slot, on the executor.
+
+    The slot is released when the attempt finishes, not when its caller
+    stops waiting: an SDK call cannot be interrupted, so an attempt that
+    timed out or lost a hedge still counts until it returns.
+    """
+    try:
+        future = _submit(_call_model, model_name, prompt, call, system_instruction, timeout)
+    except BaseException:
+        limiter.release()
+        raise
+    future.add_done_callback(lambda f: limiter.release())
+    return future
+
+
+def _try_hedge_slot(call):
+    """Take a slot and a hedge token for a backup request, or record why not."""
+    remaining = remaining_budget()
+    if remaining is not None and remaining < _config('LLM_MIN_ATTEMPT_SECONDS', 0.25):
+        # Too little time left for a backup to finish; keep the token
+        metrics.inc('llm_hedges_skipped_total', call=call, reason='deadline')
+        return False
+    if not limiter.try_acquire(_config('LLM_MAX_CONCURRENCY', 16)):
+        metrics.inc('llm_hedges_skipped_total', call=call, reason='concurrency')
+        return False
+    if not hedge_budget.try_spend():
+        limiter.release()
+        metrics.inc('llm_hedges_skipped_total', call=call, reason='budget')
+        return False
+    return True
+
+
+def _first_success(futures):
+    """Wait for the first future that succeeds within the budget; returns (future, text) or (None, None)."""
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, timeout=remaining_budget(), return_when=FIRST_COMPLETED)
+        if not done:
+            logging.warning(f"Models {', '.join(futures[f] for f in pending)} ran out of time")
+            break
+        for future in done:
+            try:
+                return future, future.result()
+            except Exception as e:
+                logging.warning(f"Model {futures[future]} failed: {e}")
+    return None, None
+
+
+def _generate_hedged(prompt, call, system_instruction):
+    """Race the primary model against a hedge; returns (text, models tried).
+
+    Expects a slot already acquired for the primary attempt.
+    """
+    primary_name, backup_name = CANDIDATE_MODELS[0], CANDIDATE_MODELS[1]
+    hedge_budget.earn(_config('LLM_HEDGE_BUDGET', 0.1))
+    primary = _submit_attempt(primary_name, prompt, call, system_instruction,
+                              _attempt_timeout(len(CANDIDATE_MODELS)))
+
+    delay = latency_tracker.p90(primary_name)
+    if delay is None:
+        delay = _config('LLM_HEDGE_DEFAULT_DELAY', 2.0)
+    done, _ = wait([primary], timeout=_min(delay, remaining_budget()))
+    if done or not _try_hedge_slot(call):
+        try:
+            return primary.result(timeout=remaining_budget()), 1
+        except FutureTimeoutError:
+            logging.warning(f"Model {primary_name} ran out of time")
+            return None, 1
+        except Exception as e:
+            logging.warning(f"Model {primary_name} failed: {e}")
+            return None, 1
+
+    backup = _submit_attempt(backup_name, prompt, call, system_instruction, remaining_budget())
+    futures = {primary: primary_name, backup: backup_name}
+    winner, text = _first_success(futures)
+    for future in futures:
+        if future is not winner:
+            # A running SDK call cannot be interrupted; its result is discarded.
+            future.cancel()
+    if winner is not None:
+        metrics.inc('llm_hedges_total', call=call, winner='backup' if winner is backup else 'primary')
+    return text, 2
+
+
+def warm(system_instructions=(None,), timeout=None):
+    """Import the SDK and build the primary model ahead of the first call.
+
+    Fallback models are built when first used. No server-side context
+    caches are created: with LLM_CONTEXT_CACHE_ENABLED, models with a
+    system instruction are left to their first call. The work runs on the
+    executor, and if it takes longer than `timeout` seconds TimeoutError is
+    raised while it finishes in the background.
+    """
+    if not is_available():
+        return
+    caching = _config('LLM_CONTEXT_CACHE_ENABLED', False)
+    system_instructions = [s for s in system_instructions if not (s and caching)]
+
+    def build():
+        get_genai()
+        for system_instruction in system_instructions:
+            model_cache.get(CANDIDATE_MODELS[0], system_instruction)
+
+    try:
+        _submit(build).result(timeout=timeout)
+    except FutureTimeoutError:
+        raise TimeoutError(f"Gemini warm-up did not finish within {timeout}s") from None
+
+
+def _generate(prompt, call, system_instruction):
+    tried = 0
+    if _config('LLM_HEDGE_ENABLED', False) and len(CANDIDATE_MODELS) > 1:
+        if not _acquire_slot(call):
+            return None
+        text, tried = _generate_hedged(prompt, call, system_instruction)
+        if text is not None:
+            return text
+
+    models = CANDIDATE_MODELS[tried:]
+    for i, model_name in enumerate(models):
+        timeout = _attempt_timeout(len(models) - i)
+        if timeout is not None and timeout < _config('LLM_MIN_ATTEMPT_SECONDS', 0.25):
+            metrics.inc('llm_budget_exhausted_total', call=call)
+            break
+        if not _acquire_slot(call):
+            return None
+        if timeout is None:
+            try:
+                return _call_model(model_name, prompt, call, system_instruction)
+            except Exception as e:
+                logging.warning(f"Model {model_name} failed: {e}")
+                continue
+            finally:
+                limiter.release()
+        # Run on the executor so the deadline holds even if the SDK ignores
+        # its own timeout; an abandoned call finishes in the background.
+        future = _submit_attempt(model_name, prompt, call, system_instruction, timeout)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            logging.warning(f"Model {model_name} timed out after {timeout:.2f}s")
+        except Exception as e:
+            logging.warning(f"Model {model_name} failed: {e}")
+    return None
+
+
+def generate_text(prompt, call, system_instruction=None, budget=None, coalesce=True):
+    """Try each of CANDIDATE_MODELS in turn and return the first response text.
+
+    `call` names the call site for metrics and selects its default time
+    budget from LLM_CALL_BUDGETS; `budget` (seconds) overrides it.
+    `system_instruction` is sent as the model's system instruction rather
+    than as part of the prompt. Identical concurrent calls share one
+    upstream request unless `coalesce` is False, for callers that need a
+    fresh response each time (e.g. distinct generated problems).
+    Returns None if AI generation is not configured, the call is shed by
+    the concurrency limiter, the budget runs out or every model fails.
+    """
+    if not GEMINI_API_KEY:
+        return None
+    if budget is None:
+        budget = _config('LLM_CALL_BUDGETS', {}).get(call)
+    token = _deadline.set(time.monotonic() + budget if budget is not None else None)
+    try:
+        return _generate_coalesced(prompt, call, system_instruction, coalesce)
+    finally:
+        _deadline.reset(token)
+
+
+def _generate_coalesced(prompt, call, system_instruction, coalesce=True):
+    if not coalesce or not _config('LLM_SINGLE_FLIGHT_ENABLED', True):
+        return _generate(prompt, call, system_instruction)
+
+    key = _flight_key(prompt, call, system_instruction)
+    shared_flight = _get_shared_single_flight()
+
+    def generate():
+        if shared_flight is None:
+            return _generate(prompt, call, system_instruction)
+        # Only the in-process leader takes part in cross-process coalescing
+        text, shared = shared_flight.do(key, lambda: _generate(prompt, call, system_instruction))
+        if shared:
+            metrics.inc('llm_coalesced_total', call=call, scope='host')
+        return text
+
+    text, shared = single_flight.do(key, generate, timeout=remaining_budget())
+    if shared:
+        metrics.inc('llm_coalesced_total', call=call, scope='process')
+    return text
+
+
+# --- Async ---
+
+async def _call_model_async(model_name, prompt, call, system_instruction=None, timeout=None):
+    model = model_cache.peek(model_name, system_instruction)
+    if model is None:
+        # The first build imports the SDK and may create a context cache
+        # over the network; keep that blocking work off the shared loop.
+        model = await asyncio.to_thread(model_cache.get, model_name, system_instruction)
+    options = {'request_options': {'timeout': timeout}} if timeout is not None else {}
+    start = time.perf_counter()
+    with metrics.track_llm_call(model_name, call):
+        coro = model.generate_content_async(prompt, **options)
+        response = await (asyncio.wait_for(coro, timeout) if timeout is not None else coro)
+    text = response.text
+    latency_tracker.record(model_name, time.perf_counter() - start)
+    _record_usage(response, model_name, call)
+    return text
+
+
+async def _acquire_slot_async(call):
+    """Coroutine form of _acquire_slot."""
+    limit = _config('LLM_MAX_CONCURRENCY', 16)
+    # Only an attempt that has to queue waits for its slot off the event loop
+    return limiter.try_acquire(limit) or await asyncio.to_thread(
+        limiter.acquire, limit, _config('LLM_MAX_QUEUED', 32),
+        _min(_config('LLM_QUEUE_TIMEOUT', 2.0), remaining_budget()), call)
+
+
+def _start_attempt_async(model_name, prompt, call, system_instruction, timeout):
+    """Start one model attempt, holding an acquired slot, as a task that releases it when done."""
+    task = asyncio.ensure_future(_call_model_async(model_name, prompt, call, system_instruction, timeout))
+    task.add_done_callback(lambda t: limiter.release())
+    return task
+
+
+async def _generate_hedged_async(prompt, call, system_instruction):
+    """Coroutine form of _generate_hedged; returns (text, models tried)."""
+    primary_name, backup_name = CANDIDATE_MODELS[0], CANDIDATE_MODELS[1]
+    hedge_budget.earn(_config('LLM_HEDGE_BUDGET', 0.1))
+    primary = _start_attempt_async(primary_name, prompt, call, system_instruction,
+                                   _attempt_timeout(len(CANDIDATE_MODELS)))
+
+    delay = latency_tracker.p90(primary_name)
+    if delay is None:
+        delay = _config('LLM_HEDGE_DEFAULT_DELAY', 2.0)
+    done, _ = await asyncio.wait([primary], timeout=_min(delay, remaining_budget()))
+    if done or not _try_hedge_slot(call):
+        try:
+            return await primary, 1
+        except asyncio.TimeoutError:
+            logging.warning(f"Model {primary_name} timed out")
+            return None, 1
+        except Exception as e:
+            logging.warning(f"Model {primary_name} failed: {e}")
+            return None, 1
+
+    backup = _start_attempt_async(backup_name, prompt, call, system_instruction, remaining_budget())
+    names = {primary: primary_name, backup: backup_name}
+    pending = set(names)
+    winner, text = None, None
+    while pending and winner is None:
+        done, pending = await asyncio.wait(pending, timeout=remaining_budget(),
+                                           return_when=asyncio.FIRST_COMPLETED)
+        if not done:
+            logging.warning(f"Models {', '.join(names[t] for t in pending)} ran out of time")
+            break
+        for task in done:
+            try:
+                text = task.result()
+                winner = task
+                break
+            except asyncio.TimeoutError:
+                logging.warning(f"Model {names[task]} timed out")
+            except Exception as e:
+                logging.warning(f"Model {names[task]} failed: {e}")
+    # Unlike a thread, the losing request really is cancelled here.
+    for task in pending:
+        task.cancel()
+    if winner is not None:
+        metrics.inc('llm_hedges_total', call=call, winner='backup' if winner is backup else 'primary')
+    return text, 2
+
+
+async def _generate_async(prompt, call, system_instruction):
+    tried = 0
+    if _config('LLM_HEDGE_ENABLED', False) and len(CANDIDATE_MODELS) > 1:
+        if not await _acquire_slot_async(call):
+            return None
+        text, tried = await _generate_hedged_async(prompt, call, system_instruction)
+        if text is not None:
+            return text
+
+    models = CANDIDATE_MODELS[tried:]
+    for i, model_name in enumerate(models):
+        timeout = _attempt_timeout(len(models) - i)
+        if timeout is not None and timeout < _config('LLM_MIN_ATTEMPT_SECONDS', 0.25):
+            metrics.inc('llm_budget_exhausted_total', call=call)
+            break
+        if not await _acquire_slot_async(call):
+            return None
+        try:
+            return await _call_model_async(model_name, prompt, call, system_instruction, timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"Model {model_name} timed out after {timeout:.2f}s")
+        except Exception as e:
+            logging.warning(f"Model {model_name} failed: {e}")
+        finally:
+            # Awaited directly, so the request is over (or cancelled) here
+            limiter.release()
+    return None
+
+
+class _LoopThread:
+    """Event loop on a daemon thread, started lazily and again after a fork."""
+
+    def __init__(self):
+        self._loop = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_loop(self):
+        pid = os.getpid()
+        if self._loop is None or self._pid != pid:
+            with self._lock:
+                if self._loop is None or self._pid != pid:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name='llm-async', daemon=True).start()
+                    self._loop, self._pid = loop, pid
+        return self._loop
+
+    def submit(self, coro):
+        """Schedule `coro` on the loop in a copy of the caller's context; returns a concurrent Future."""
+        loop = self._get_loop()
+        future = Future()
+
+        def copy_result(task):
+            if future.cancelled():
+                return
+            if task.cancelled():
+                future.cancel()
+            elif task.exception() is not None:
+                future.set_exception(task.exception())
+            else:
+                future.set_result(task.result())
+
+        def start():
+            # Runs inside the copied context, which create_task inherits
+            task = loop.create_task(coro)
+            task.add_done_callback(copy_result)
+            future.add_done_callback(lambda f: f.cancelled() and loop.call_soon_threadsafe(task.cancel))
+
+        loop.call_soon_threadsafe(start, context=contextvars.copy_context())
+        return future
+
+
+_loop_thread = _LoopThread()
+
+
+async def generate_text_async(prompt, call, system_instruction=None, budget=None, coalesce=True):
+    """Coroutine counterpart of generate_text, using the SDK's async API.
+
+    Can be awaited from any event loop; the call itself runs on the shared
+    LLM loop thread.
+    """
+    if not GEMINI_API_KEY:
+        return None
+    return await asyncio.wrap_future(
+        _loop_thread.submit(_generate_text_async(prompt, call, system_instruction, budget, coalesce)))
+
+
+async def _generate_text_async(prompt, call, system_instruction, budget, coalesce=True):
+    if budget is None:
+        budget = _config('LLM_CALL_BUDGETS', {}).get(call)
+    token = _deadline.set(time.monotonic() + budget if budget is not None else None)
+    try:
+        generate = lambda: _generate_async(prompt, call, system_instruction)
+        if not coalesce or not _config('LLM_SINGLE_FLIGHT_ENABLED', True):
+            return await generate()
+        key = _flight_key(prompt, call, system_instruction)
+        text, shared = await single_flight.do_async(key, generate, timeout=remaining_budget())
+        if shared:
+            metrics.inc('llm_coalesced_total', call=call, scope='process')
+        return text
+    finally:
+        _deadline.reset(token)
@@ -0,0 +1,230 @@
+"""Lightweight per-process request instrumentation.
+
+Records per-endpoint latency histograms, SQL statement counts and time per
+request (via SQLAlchemy engine events) and the duration of each LLM call.
+Data is exported in the Prometheus text format on `/metrics` and, when
+enabled, summarized in a `Server-Timing` response header. When both
+METRICS_ENABLED and SERVER_TIMING_ENABLED are off no hooks are installed.
+"""
+import math
+import threading
+import time
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+
+from .extensions import db
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=None):
+    items = list(key) + ([extra] if extra else [])
+    if not items:
+        return ''
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{k}="{escape(v)}"' for k, v in items) + '}'
+
+
+def _format_bound(bound):
+    return '+Inf' if math.isinf(bound) else repr(float(bound))
+
+
+class _Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets) + (math.inf,)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _LLMCallTimer:
+    __slots__ = ('metrics', 'model', 'call', 'start')
+
+    def __init__(self, metrics, model, call):
+        self.metrics = metrics
+        self.model = model
+        self.call = call
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        outcome = 'error' if exc_type else 'ok'
+        self.metrics.observe('llm_call_duration_seconds', elapsed,
+                             model=self.model, call=self.call, outcome=outcome)
+        if has_request_context() and '_metrics_start' in g:
+            g._metrics_llm_time += elapsed
+            g._metrics_llm_calls += 1
+        return False
+
+
+class Metrics:
+    """Thread-safe registry of counters, gauges and histograms for one process."""
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.server_timing = False
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        if app is not None:
+            self.init_app(app)
+
+    @property
+    def active(self):
+        return self.enabled or self.server_timing
+
+    def init_app(self, app):
+        self.enabled = app.config.get('METRICS_ENABLED', False)
+        self.server_timing = app.config.get('SERVER_TIMING_ENABLED', False)
+        app.extensions['metrics'] = self
+        if not self.active:
+            return
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(db.engine, 'after_cursor_execute', self._after_cursor_execute)
+        if self.enabled:
+            app.add_url_rule('/metrics', 'metrics', self._metrics_view)
+
+    # --- Recording ---
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._gauges[key] = value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(buckets)
+            histogram.observe(value)
+
+    def track_llm_call(self, model, call):
+        """Context manager timing a single LLM request."""
+        if not self.active:
+            return _NULL_TIMER
+        return _LLMCallTimer(self, model, call)
+
+    # --- Request hooks ---
+
+    def _before_request(self):
+        g._metrics_start = time.perf_counter()
+        g._metrics_sql_count = 0
+        g._metrics_sql_time = 0.0
+        g._metrics_llm_time = 0.0
+        g._metrics_llm_calls = 0
+
+    def _after_request(self, response):
+        if '_metrics_start' not in g:
+            return response
+        elapsed = time.perf_counter() - g._metrics_start
+        endpoint = request.endpoint or 'unmatched'
+        if endpoint == 'metrics':
+            return response
+
+        self.inc('http_requests_total', endpoint=endpoint, method=request.method, status=response.status_code)
+        self.observe('http_request_duration_seconds', elapsed, endpoint=endpoint, method=request.method)
+        self.observe('http_request_sql_queries', g._metrics_sql_count, buckets=QUERY_COUNT_BUCKETS, endpoint=endpoint)
+        self.inc('http_request_sql_seconds_total', g._metrics_sql_time, endpoint=endpoint)
+        self.inc('http_request_llm_seconds_total', g._metrics_llm_time, endpoint=endpoint)
+
+        if self.server_timing:
+            response.headers['Server-Timing'] = ', '.join([
+                f'app;dur={elapsed * 1000:.1f}',
+                f'db;dur={g._metrics_sql_time * 1000:.1f};desc="{g._metrics_sql_count} queries"',
+                f'llm;dur={g._metrics_llm_time * 1000:.1f};desc="{g._metrics_llm_calls} calls"',
+            ])
+        return response
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('_metrics_query_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('_metrics_query_start')
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        if has_request_context() and '_metrics_start' in g:
+            g._metrics_sql_count += 1
+            g._metrics_sql_time += elapsed
+
+    # --- Export ---
+
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+            seen = set()
+            for kind, items in (('counter', counters), ('gauge', gauges)):
+                for (name, key), value in items:
+                    if name not in seen:
+                        lines.append(f'# TYPE {name} {kind}')
+                        seen.add(name)
+                    lines.append(f'{name}{_format_labels(key)} {value}')
+            for (name, key), histogram in histograms:
+                if name not in seen:
+                    lines.append(f'# TYPE {name} histogram')
+                    seen.add(name)
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_format_labels(key, ("le", _format_bound(bound)))} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(key)} {histogram.sum}')
+                lines.append(f'{name}_count{_format_labels(key)} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def _metrics_view(self):
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+
+metrics = Metrics()
@@ -1,11 +1,27 @@
-from sqlalchemy import JSON
+from sqlalchemy import JSON, event
 from datetime import datetime
 from flask import current_app
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
 from itsdangerous import URLSafeTimedSerializer as Serializer
 
 from .extensions import db
+from .json_provider import response_bytes
+from .passwords import hash_password, verify_password, needs_rehash
+
+def question_payload(legacy_id, problem_text, difficulty, explanation, data):
+    """Canonical JSON bytes served for a question, as `jsonify` would send them.
+
+    Serialized with the active JSON provider's options, so non-ASCII text
+    is escaped under the stdlib provider and sent as UTF-8 under orjson.
+    """
+    payload = {
+        'id': legacy_id,
+        'problem': problem_text,
+        'difficulty': difficulty,
+        'explanation': explanation,
+    }
+    payload.update(data or {})
+    return response_bytes(payload)
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
@@ -14,6 +30,11 @@ class User(UserMixin, db.Model):
     password_hash = db.Column(db.String(256), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Ability on the same logit scale as Question.calibrated_difficulty,
+    # fitted by `flask calibrate`; weight is the accumulated information.
+    ability = db.Column(db.Float, nullable=True)
+    ability_weight = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
+
     responses = db.relationship('UserResponse', back_populates='user', lazy=True)
 
     def __repr__(self):
@@ -21,11 +42,15 @@ class User(UserMixin, db.Model):
 
     def set_password(self, password):
         """Create a hashed password."""
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
         """Check a hashed password."""
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        """Check whether the hash predates the configured hashing parameters."""
+        return needs_rehash(self.password_hash)
 
     def get_reset_token(self, expires_sec=1800):
         """Generate a token for resetting the password."""
@@ -86,18 +111,59 @@ class Question(db.Model):
     problem_text = db.Column(db.Text, nullable=False)
     difficulty = db.Column(db.String(50), nullable=True)
     explanation = db.Column(db.Text, nullable=True)
+
+    # Empirical difficulty (logit scale, higher is harder) fitted from
+    # user_responses by `flask calibrate`; see app/calibration.py.
+    calibrated_difficulty = db.Column(db.Float, nullable=True)
+    calibration_weight = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
+    calibration_responses = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # Flexible field for question type and answers
     # e.g., {"type": "multiple_choice", "choices": [...], "answer": 1}
     # e.g., {"type": "numerical", "answer": "5"}
     data = db.Column(JSON, nullable=False)
 
+    # Content version, bumped by SQLAlchemy on every ORM update. Caches of
+    # derived data (e.g. compiled answers) are keyed on (id, version).
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    # The question's API response as JSON bytes, rewritten on every ORM
+    # insert and update (see `_store_payload`), so it always matches the
+    # current content version. Question endpoints return it as-is.
+    payload = db.deferred(db.Column(db.LargeBinary, nullable=True))
+
     concept = db.relationship('Concept', back_populates='questions')
     responses = db.relationship('UserResponse', back_populates='question', lazy=True)
 
+    __mapper_args__ = {'version_id_col': version}
+
     def __repr__(self):
         return f'<Question {self.legacy_id}>'
 
+    def serialize_payload(self):
+        """The question's API response as JSON bytes."""
+        return question_payload(self.legacy_id, self.problem_text, self.difficulty, self.explanation, self.data)
+
+    def difficulty_level(self):
+        """Ladder step (1 Easy, 2 Medium, 3 Hard, 0 unknown).
+
+        Uses the calibrated difficulty once enough responses back it
+        (CALIBRATION_MIN_RESPONSES), otherwise the hand-entered label.
+        """
+        config = current_app.config
+        if (self.calibrated_difficulty is not None
+                and self.calibration_responses >= config.get('CALIBRATION_MIN_RESPONSES', 30)):
+            easy_cut, hard_cut = config.get('CALIBRATION_LEVEL_CUTS', (-0.5, 0.5))
+            if self.calibrated_difficulty < easy_cut:
+                return 1
+            return 2 if self.calibrated_difficulty < hard_cut else 3
+        return {'Easy': 1, 'Medium': 2, 'Hard': 3}.get(self.difficulty, 0)
+
+@event.listens_for(Question, 'before_insert')
+@event.listens_for(Question, 'before_update')
+def _store_payload(mapper, connection, question):
+    question.payload = question.serialize_payload()
+
 class UserResponse(db.Model):
     __tablename__ = 'user_responses'
     id = db.Column(db.Integer, primary_key=True)
@@ -110,3 +176,34 @@ class UserResponse(db.Model):
 
     user = db.relationship('User', back_populates='responses')
     question = db.relationship('Question', back_populates='responses')
+
+# Pool of AI-generated real-world problems, served to users who have
+# mastered a concept (see app/problem_pool.py)
+class GeneratedProblem(db.Model):
+    __tablename__ = 'generated_problems'
+    id = db.Column(db.Integer, primary_key=True)
+    concept_id = db.Column(db.Integer, db.ForeignKey('concepts.id'), nullable=False, index=True)
+    problem_text = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    concept = db.relationship('Concept')
+
+    def __repr__(self):
+        return f'<GeneratedProblem {self.id} concept={self.concept_id}>'
+
+# Which generated problems each user has been served, so none repeat
+class GeneratedProblemView(db.Model):
+    __tablename__ = 'generated_problem_views'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    problem_id = db.Column(db.Integer, db.ForeignKey('generated_problems.id'), nullable=False)
+    viewed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (db.UniqueConstraint('user_id', 'problem_id', name='_user_generated_problem_uc'),)
+
+# High-water mark of user_responses.id processed by each incremental job
+class JobWatermark(db.Model):
+    __tablename__ = 'job_watermarks'
+    name = db.Column(db.String(50), primary_key=True)
+    last_id = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
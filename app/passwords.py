@@ -0,0 +1,80 @@
+"""Password hashing with configurable cost and bounded concurrency.
+
+PASSWORD_HASH_METHOD accepts any Werkzeug method string, e.g.
+'scrypt:32768:8:1' or 'pbkdf2:sha256:600000'. Stored hashes made with
+different parameters or a different PASSWORD_HASH_SALT_LENGTH are upgraded
+on the next successful login.
+
+Hashing and verification run on a pool of PASSWORD_HASH_WORKERS threads.
+The KDFs release the GIL, so the pool caps how many cores a login storm
+can occupy and leaves the rest for other requests.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, has_app_context
+from werkzeug.security import check_password_hash, generate_password_hash
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+DEFAULT_SALT_LENGTH = 16
+
+_executor = None
+_executor_lock = threading.Lock()
+_method_prefixes = {}
+
+
+def _config(key, default):
+    if has_app_context():
+        return current_app.config.get(key, default)
+    return default
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                workers = _config('PASSWORD_HASH_WORKERS', None) or os.cpu_count() or 1
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+    return _executor
+
+
+def current_method():
+    return _config('PASSWORD_HASH_METHOD', DEFAULT_METHOD)
+
+
+def _method_prefix(method):
+    """The prefix Werkzeug writes for a method, e.g. 'pbkdf2' -> 'pbkdf2:sha256:1000000'."""
+    prefix = _method_prefixes.get(method)
+    if prefix is None:
+        # Hash with the cheapest possible input once to learn the expanded defaults
+        prefix = _method_prefixes[method] = generate_password_hash('', method, 1).split('$', 1)[0]
+    return prefix
+
+
+def hash_password(password):
+    """Hash a password with the configured method on the hashing pool."""
+    method = current_method()
+    salt_length = _config('PASSWORD_HASH_SALT_LENGTH', DEFAULT_SALT_LENGTH)
+    return _get_executor().submit(generate_password_hash, password, method, salt_length).result()
+
+
+def verify_password(password_hash, password):
+    """Check a password against a stored hash on the hashing pool."""
+    return _get_executor().submit(check_password_hash, password_hash, password).result()
+
+
+def needs_rehash(password_hash):
+    """Whether a stored hash was made with parameters or a salt length other than the configured ones."""
+    # Werkzeug hashes are 'method$salt$hash'
+    prefix, _, rest = password_hash.partition('$')
+    salt = rest.partition('$')[0]
+    return (prefix != _method_prefix(current_method())
+            or len(salt) != _config('PASSWORD_HASH_SALT_LENGTH', DEFAULT_SALT_LENGTH))
+
+
+def warm():
+    """Start the hashing pool and learn the configured prefix before the first login."""
+    _get_executor()
+    _method_prefix(current_method())
@@ -0,0 +1,215 @@
+"""Pre-generated real-world problems for mastered concepts.
+
+Once a user has mastered every difficulty of a concept, `discipline_page`
+links `gemini_trigger_<slug>`. Instead of generating a problem while the
+user waits, `api_question` serves the oldest pooled GeneratedProblem that
+the user has not seen and records the view, so no problem repeats for a
+user.
+
+A background thread keeps the pool topped up. Whenever a trigger is shown
+or served, the (concept, user) pair is queued. The worker then generates
+problems until that user has PROBLEM_POOL_TARGET_DEPTH unseen ones, but
+never lets a concept's pool grow past PROBLEM_POOL_MAX_PER_CONCEPT. Only
+a user who exhausts the pool before the worker catches up waits on a
+synchronous generation. That problem is added to the pool as well. A
+user who has seen a full pool gets the static fallback text.
+
+Pool generations skip LLM single-flight, which would otherwise hand a
+request and the refill thread the same text. A text that is already
+pooled for the concept is never stored twice.
+"""
+import logging
+import os
+import queue
+import threading
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from .extensions import db
+from .llm import generate_text, is_available
+
+# Problems tried per request when concurrent requests by the same user race
+# to record views of the same problem
+TAKE_ATTEMPTS = 3
+
+
+def generation_prompt(concept_name):
+    return (f"Provide a real-world example of a math problem that demonstrates the concept of {concept_name}. "
+            "The output should be a practical scenario followed by a question, but do not provide the answer "
+            "immediately. Format it as a practice problem.")
+
+
+class ProblemPool:
+    """Flask extension serving and refilling per-concept problem pools."""
+
+    def __init__(self, app=None):
+        self.app = None
+        self._queue = queue.Queue()
+        self._queued = set()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['problem_pool'] = self
+
+    @property
+    def enabled(self):
+        return bool(self.app and self.app.config.get('PROBLEM_POOL_ENABLED') and is_available())
+
+    # --- Serving ---
+
+    def _unseen_query(self, concept_id, user_id):
+        from .models import GeneratedProblem, GeneratedProblemView
+        seen = db.select(GeneratedProblemView.problem_id).where(GeneratedProblemView.user_id == user_id)
+        return db.select(GeneratedProblem).where(
+            GeneratedProblem.concept_id == concept_id,
+            GeneratedProblem.id.not_in(seen),
+        )
+
+    def take(self, concept, user_id):
+        """Return the text of a problem the user has not seen, or None if none could be generated."""
+        text = self.take_unseen(concept, user_id)
+        if text is None and self.can_grow(concept.id):
+            # Don't hold a pooled connection for the length of the LLM call
+            db.session.close()
+            text = generate_text(generation_prompt(concept.name), 'generated_question', coalesce=False)
+            if text and not self.add_served(concept, user_id, text):
+                text = None
+        return text
+
+    def take_unseen(self, concept, user_id):
+        """Serve and record the oldest pooled problem the user has not seen, if any.
+
+        Two requests by the same user can pick the same problem. The one that
+        loses the race to record the view moves on to the next unseen one.
+        """
+        from .models import GeneratedProblem
+        concept_id = concept.id
+        for _ in range(TAKE_ATTEMPTS):
+            problem = db.session.scalars(
+                self._unseen_query(concept_id, user_id).order_by(GeneratedProblem.id).limit(1)
+            ).first()
+            if problem is None:
+                return None
+            text = problem.problem_text
+            try:
+                self._record_view(problem, concept, user_id)
+            except IntegrityError:
+                db.session.rollback()
+                continue
+            return text
+        logging.warning(f"Gave up serving a pooled problem for concept {concept_id} to user {user_id}")
+        return None
+
+    def add_served(self, concept, user_id, text):
+        """Add a problem generated on demand to the pool, recorded as seen by the user.
+
+        Returns False, and records nothing, if the same text is already
+        pooled and the user has seen it.
+        """
+        problem = self._add(concept, text)
+        try:
+            self._record_view(problem, concept, user_id)
+        except IntegrityError:
+            db.session.rollback()
+            return False
+        return True
+
+    def can_grow(self, concept_id):
+        return self._pool_size(concept_id) < self.app.config.get('PROBLEM_POOL_MAX_PER_CONCEPT', 100)
+
+    def _record_view(self, problem, concept, user_id):
+        from .models import GeneratedProblemView
+        db.session.add(GeneratedProblemView(user_id=user_id, problem_id=problem.id))
+        db.session.commit()
+        self.request_refill(concept.id, user_id)
+
+    def _pool_size(self, concept_id):
+        from .models import GeneratedProblem
+        return db.session.scalar(
+            db.select(func.count(GeneratedProblem.id)).where(GeneratedProblem.concept_id == concept_id))
+
+    def _add(self, concept, text):
+        """Pool a problem, or return the pooled one with the same text."""
+        from .models import GeneratedProblem
+        problem = db.session.scalars(
+            db.select(GeneratedProblem)
+            .where(GeneratedProblem.concept_id == concept.id, GeneratedProblem.problem_text == text)
+            .limit(1)
+        ).first()
+        if problem is not None:
+            return problem
+        problem = GeneratedProblem(concept_id=concept.id, problem_text=text)
+        db.session.add(problem)
+        db.session.flush()
+        return problem
+
+    # --- Refilling ---
+
+    def request_refill(self, concept_id, user_id):
+        """Ask the worker to top up `concept_id` for `user_id`; returns immediately."""
+        if not self.enabled:
+            return
+        key = (concept_id, user_id)
+        with self._lock:
+            if key in self._queued:
+                return
+            self._queued.add(key)
+        self._ensure_started()
+        self._queue.put(key)
+
+    def _ensure_started(self):
+        # Started lazily, and restarted after a fork, so each worker process
+        # refills on its own thread.
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == pid and self._thread.is_alive():
+                return
+            if self._pid != pid:
+                self._queue = queue.Queue()
+                self._queued = set()
+            self._pid = pid
+            self._thread = threading.Thread(target=self._run, name='problem-pool-refill', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            key = self._queue.get()
+            try:
+                with self.app.app_context():
+                    try:
+                        self._refill(*key)
+                    except Exception as e:
+                        logging.error(f"Refilling problem pool for concept {key[0]} failed: {e}")
+                        db.session.rollback()
+            finally:
+                with self._lock:
+                    self._queued.discard(key)
+
+    def _refill(self, concept_id, user_id):
+        from .models import Concept
+        concept = db.session.get(Concept, concept_id)
+        if concept is None:
+            return
+        target = self.app.config.get('PROBLEM_POOL_TARGET_DEPTH', 5)
+        max_size = self.app.config.get('PROBLEM_POOL_MAX_PER_CONCEPT', 100)
+        unseen = db.session.scalar(
+            db.select(func.count()).select_from(self._unseen_query(concept_id, user_id).subquery()))
+        for _ in range(min(target - unseen, max_size - self._pool_size(concept_id))):
+            # Not coalesced: a request generating for the same concept must
+            # not receive (and pool) this same text
+            text = generate_text(generation_prompt(concept.name), 'generated_question', coalesce=False)
+            if not text:
+                break
+            self._add(concept, text)
+            db.session.commit()
+
+
+problem_pool = ProblemPool()
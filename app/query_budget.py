@@ -0,0 +1,118 @@
+"""SQL query budgets for views.
+
+VIEW_QUERY_BUDGETS declares the maximum number of statements each hot view
+may issue. When QUERY_BUDGETS_ENFORCED is set (it is in TestingConfig),
+every request to a budgeted view that goes over raises QueryBudgetExceeded
+with the offending statements, so N+1 regressions fail the test that
+triggered them.
+
+For assertions inside tests, use the `query_counter` fixture from
+`app.testing` (add `pytest_plugins = ['app.testing']` to conftest.py) or
+decorate a test with `@query_budget(n)`.
+"""
+import functools
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .extensions import db
+
+# Maximum statements per request, keyed by endpoint. The logged-in user
+# comes from the user cache (primed at login), so it is not counted.
+VIEW_QUERY_BUDGETS = {
+    'main.discipline_page': 4,
+    'api.api_overview': 1,
+    'auth.profile': 1,
+    'api.api_question': 1,
+    'api.next_question': 2,
+    'api.submit_answer': 2,
+}
+
+
+def format_report(label, budget, statements):
+    lines = [f'{label} issued {len(statements)} SQL statements (budget {budget}):']
+    for i, statement in enumerate(statements, 1):
+        lines.append(f'  {i}. {" ".join(statement.split())}')
+    return '\n'.join(lines)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a view or test block issues more statements than allowed."""
+
+    def __init__(self, label, budget, statements):
+        self.label = label
+        self.budget = budget
+        self.statements = list(statements)
+        super().__init__(format_report(label, budget, self.statements))
+
+
+class QueryCounter:
+    """Records every statement executed on any engine while active."""
+
+    def __init__(self):
+        self.statements = []
+        # Keep a single bound method so the listener can be removed again
+        self._listener = self._record
+
+    def __enter__(self):
+        event.listen(Engine, 'before_cursor_execute', self._listener)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        event.remove(Engine, 'before_cursor_execute', self._listener)
+        return False
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def reset(self):
+        self.statements = []
+
+    def assert_at_most(self, budget, label='block'):
+        if len(self.statements) > budget:
+            raise QueryBudgetExceeded(label, budget, self.statements)
+
+
+def query_budget(budget):
+    """Decorator failing the wrapped function if it issues more than `budget` statements."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with QueryCounter() as counter:
+                result = fn(*args, **kwargs)
+            counter.assert_at_most(budget, fn.__name__)
+            return result
+        return wrapper
+    return decorator
+
+
+def _before_request():
+    g._query_budget_statements = []
+
+
+def _after_request(response):
+    statements = g.pop('_query_budget_statements', None)
+    budget = VIEW_QUERY_BUDGETS.get(request.endpoint)
+    if statements is not None and budget is not None and len(statements) > budget:
+        raise QueryBudgetExceeded(request.endpoint, budget, statements)
+    return response
+
+
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and '_query_budget_statements' in g:
+        g._query_budget_statements.append(statement)
+
+
+def init_query_budgets(app):
+    """Enforce VIEW_QUERY_BUDGETS on every request when QUERY_BUDGETS_ENFORCED is set."""
+    if not app.config.get('QUERY_BUDGETS_ENFORCED'):
+        return
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _record_statement)
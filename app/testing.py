@@ -0,0 +1,14 @@
+"""Pytest helpers. Load with `pytest_plugins = ['app.testing']`."""
+import pytest
+
+from .query_budget import QueryCounter, query_budget, QueryBudgetExceeded
+
+
+@pytest.fixture
+def query_counter():
+    """A QueryCounter active for the duration of the test."""
+    with QueryCounter() as counter:
+        yield counter
+
+
+__all__ = ['query_counter', 'query_budget', 'QueryBudgetExceeded']
@@ -0,0 +1,149 @@
+"""Opt-in capture of sanitized request traces.
+
+When TRAFFIC_CAPTURE_ENABLED is set, every request is written as one JSON
+line to a rotating file. Each process writes its own file, named from
+TRAFFIC_CAPTURE_PATH with its pid (requests.jsonl -> requests-<pid>.jsonl),
+so gunicorn workers never rotate each other's files. Traces keep the method,
+route, latency and status, but only content identifiers such as
+`discipline` or `question_id` keep their values. Every other argument and
+body field is reduced to its type. Users are recorded as a stable hashed
+bucket, never as an id. `python -m benchmarks.replay` re-issues a
+captured trace against a running instance.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+
+from flask import g, request, session
+
+# Argument and top-level JSON body fields whose values are kept verbatim.
+KEEP_FIELDS = frozenset({'discipline', 'concept', 'current_id', 'question_id'})
+
+# Endpoints whose bodies and paths may carry credentials or tokens.
+SENSITIVE_ENDPOINTS = frozenset({
+    'auth.login', 'auth.register', 'auth.change_password',
+    'auth.reset_password', 'auth.reset_password_request',
+})
+
+SKIP_ENDPOINTS = frozenset({'static', 'metrics'})
+
+
+def describe_shape(value, depth=0):
+    """Describe a JSON value by type, e.g. {'answer': 'list[3]'}, without its contents."""
+    if isinstance(value, dict):
+        if depth >= 2:
+            return 'dict'
+        return {key: describe_shape(item, depth + 1) for key, item in value.items()}
+    if isinstance(value, list):
+        return f'list[{len(value)}]'
+    if value is None:
+        return 'null'
+    return type(value).__name__
+
+
+class TrafficRecorder:
+    """Flask extension writing one sanitized JSON line per request."""
+
+    def __init__(self, app=None):
+        self.logger = None
+        self.buckets = 64
+        self.secret = b''
+        self._path = None
+        self._max_bytes = 0
+        self._backups = 0
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['traffic_recorder'] = self
+        if not app.config.get('TRAFFIC_CAPTURE_ENABLED'):
+            return
+
+        self._path = app.config['TRAFFIC_CAPTURE_PATH']
+        self._max_bytes = app.config.get('TRAFFIC_CAPTURE_MAX_BYTES', 50 * 1024 * 1024)
+        self._backups = app.config.get('TRAFFIC_CAPTURE_BACKUPS', 10)
+        self._pid = None
+        self.logger = logging.getLogger('mathyou.traffic')
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        self.buckets = app.config.get('TRAFFIC_USER_BUCKETS', 64)
+        self.secret = app.config['SECRET_KEY'].encode()
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def _ensure_handler(self):
+        # Opened lazily, and reopened after a fork, so each worker process
+        # (including those forked from a preloaded app) has its own file.
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            root, ext = os.path.splitext(self._path)
+            path = f'{root}-{pid}{ext}'
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            handler = RotatingFileHandler(path, maxBytes=self._max_bytes, backupCount=self._backups)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            for old_handler in list(self.logger.handlers):
+                self.logger.removeHandler(old_handler)
+                old_handler.close()
+            self.logger.addHandler(handler)
+            self._pid = pid
+
+    def user_bucket(self):
+        # Read the id from the session so recording never loads the user.
+        user_id = session.get('_user_id')
+        if user_id is None:
+            return None
+        digest = hashlib.sha256(self.secret + b':' + str(user_id).encode()).digest()
+        return int.from_bytes(digest[:8], 'big') % self.buckets
+
+    def _before_request(self):
+        g._traffic_start = time.perf_counter()
+
+    def _after_request(self, response):
+        start = g.pop('_traffic_start', None)
+        endpoint = request.endpoint
+        if start is None or endpoint in SKIP_ENDPOINTS:
+            return response
+
+        sensitive = endpoint in SENSITIVE_ENDPOINTS
+        record = {
+            'ts': time.time(),
+            'method': request.method,
+            'endpoint': endpoint,
+            'path': request.url_rule.rule if sensitive and request.url_rule else request.path,
+            'args': {
+                key: (value if key in KEEP_FIELDS else type(value).__name__)
+                for key, value in request.args.items()
+            },
+            'status': response.status_code,
+            'latency_ms': round((time.perf_counter() - start) * 1000, 3),
+            'user_bucket': self.user_bucket(),
+        }
+        if not sensitive and request.method in ('POST', 'PUT', 'PATCH'):
+            body = request.get_json(silent=True) if request.is_json else request.form.to_dict()
+            if isinstance(body, dict):
+                record['body_shape'] = describe_shape(body)
+                record['body_values'] = {k: v for k, v in body.items() if k in KEEP_FIELDS}
+            elif body is not None:
+                record['body_shape'] = describe_shape(body)
+            record['content_type'] = 'json' if request.is_json else 'form'
+
+        try:
+            self._ensure_handler()
+            self.logger.info(json.dumps(record, separators=(',', ':')))
+        except Exception as e:
+            logging.warning(f"Failed to record traffic trace: {e}")
+        return response
+
+
+traffic_recorder = TrafficRecorder()
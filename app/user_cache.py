@@ -0,0 +1,87 @@
+"""Short-lived per-process cache of logged-in users.
+
+Flask-Login calls the user loader on every request that touches
+`current_user`. Instead of a `User` row, the loader returns a detached
+UserSnapshot (id, email, created_at) kept for USER_CACHE_TTL seconds, so
+authenticated reads issue no user query while the entry is fresh.
+
+Snapshots are read-only. Code that needs to change the user, such as
+`change_password`, loads the real row with `db.session.get(User, ...)`.
+Entries are dropped on logout and on any password change in this
+process. Other workers notice within USER_CACHE_TTL. Setting
+USER_CACHE_TTL to 0 turns the cache off.
+"""
+import threading
+import time
+
+from flask_login import UserMixin
+
+from .extensions import db
+
+
+class UserSnapshot(UserMixin):
+    """Read-only stand-in for a User, safe to share across requests."""
+    __slots__ = ('id', 'email', 'created_at')
+
+    def __init__(self, id, email, created_at):
+        self.id = id
+        self.email = email
+        self.created_at = created_at
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.email, user.created_at)
+
+    def __repr__(self):
+        return f'<UserSnapshot {self.email}>'
+
+
+class UserCache:
+    """Flask extension providing the cached Flask-Login user loader."""
+
+    def __init__(self, app=None):
+        self.ttl = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config.get('USER_CACHE_TTL', 0)
+        app.extensions['user_cache'] = self
+        # A new app may point at a different database
+        self.clear()
+
+    def load(self, user_id):
+        """Return a snapshot for `user_id`, querying only on a miss or expiry."""
+        user_id = int(user_id)
+        if self.ttl > 0:
+            entry = self._entries.get(user_id)
+            if entry is not None and time.monotonic() < entry[0]:
+                return entry[1]
+
+        from .models import User
+        user = db.session.get(User, user_id)
+        if user is None:
+            self.invalidate(user_id)
+            return None
+        return self.put(user)
+
+    def put(self, user):
+        """Store a snapshot of `user` and return it."""
+        snapshot = UserSnapshot.from_user(user)
+        if self.ttl > 0:
+            with self._lock:
+                self._entries[snapshot.id] = (time.monotonic() + self.ttl, snapshot)
+        return snapshot
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(int(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache()
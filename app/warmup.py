@@ -0,0 +1,187 @@
+"""Per-worker warm-up and the /readyz readiness endpoint.
+
+A fresh worker would otherwise make its first users pay for template
+compilation, opening database connections, loading the content catalog
+(compiled answers, discipline page shells), starting the password hashing
+pool and importing and building the Gemini clients. `Warmup.run` does all
+of that up front, in this order:
+
+    templates  compile every template (stored in the bytecode cache)
+    database   open WARMUP_DB_CONNECTIONS pooled connections (default: pool size)
+    catalog    load subjects, concepts and questions; compile answers and
+               render discipline shells
+    passwords  start the hashing pool and learn the configured method
+    gemini     import the SDK and build the primary model (without creating
+               context caches), giving up after WARMUP_GEMINI_TIMEOUT
+
+The first three steps are required. If one fails, the worker stays unready
+and the next /readyz poll retries. Failures in the last two are only logged,
+since logins and AI calls still work cold.
+
+Under gunicorn, gunicorn.conf.py runs the warm-up in each worker before it
+accepts requests. Under other servers the warm-up starts on a background
+thread at the worker's first request, which is normally the load balancer's
+first /readyz poll. State is tracked per process, so workers forked from a
+preloaded app warm themselves. /readyz answers 503 until the warm-up in
+this process has finished and 200 afterwards. With WARMUP_ENABLED off it
+always answers 200.
+"""
+import logging
+import os
+import threading
+import time
+
+from flask import jsonify
+from sqlalchemy.orm import selectinload
+
+from .extensions import db
+
+
+def _compile_templates(app):
+    for name in app.jinja_env.list_templates(filter_func=lambda name: name.endswith('.html')):
+        app.jinja_env.get_template(name)
+
+
+def _open_connections(app):
+    count = app.config.get('WARMUP_DB_CONNECTIONS')
+    if not count:
+        size = getattr(db.engine.pool, 'size', 1)
+        count = size() if callable(size) else size
+    connections = []
+    try:
+        # Held together so the pool really opens `count` of them
+        for _ in range(count):
+            connection = db.engine.connect()
+            connection.exec_driver_sql('SELECT 1')
+            connections.append(connection)
+    finally:
+        for connection in connections:
+            connection.close()
+
+
+def _load_catalog(app):
+    from .blueprints.main import discipline_shell
+    from .grading import get_compiled_answer
+    from .models import Concept, Subject
+
+    subjects = Subject.query.options(
+        selectinload(Subject.concepts).selectinload(Concept.questions)
+    ).all()
+    for subject in subjects:
+        discipline_shell(subject)
+        for concept in subject.concepts:
+            for question in concept.questions:
+                get_compiled_answer(question)
+
+
+def _warm_passwords(app):
+    from .passwords import warm
+    warm()
+
+
+def _warm_gemini(app):
+    from .blueprints.api import MATHYOU_TEACHER_PERSONA
+    from .llm import warm
+    warm(system_instructions=(None, MATHYOU_TEACHER_PERSONA),
+         timeout=app.config.get('WARMUP_GEMINI_TIMEOUT', 10.0))
+
+
+# (name, step, required)
+WARMUP_STEPS = [
+    ('templates', _compile_templates, True),
+    ('database', _open_connections, True),
+    ('catalog', _load_catalog, True),
+    ('passwords', _warm_passwords, False),
+    ('gemini', _warm_gemini, False),
+]
+
+
+class Warmup:
+    """Flask extension that warms a worker and reports readiness."""
+
+    COLD, RUNNING, READY, FAILED = 'cold', 'warming_up', 'ready', 'failed'
+
+    def __init__(self, app=None):
+        self.app = None
+        self._pid = None
+        self._state = self.COLD
+        self._error = None
+        self.timings_ms = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self._pid = None
+        app.extensions['warmup'] = self
+        app.add_url_rule('/readyz', 'readyz', self._readyz_view)
+        if app.config.get('WARMUP_ENABLED', True):
+            app.before_request(self._before_request)
+
+    @property
+    def state(self):
+        # Another process's warm-up (e.g. before a fork) does not count here
+        return self._state if self._pid == os.getpid() else self.COLD
+
+    @property
+    def ready(self):
+        return not self.app.config.get('WARMUP_ENABLED', True) or self.state == self.READY
+
+    def run(self):
+        """Warm this process synchronously. Returns whether it is now ready."""
+        if self._claim():
+            self._warm()
+        return self.state == self.READY
+
+    def start(self):
+        """Warm this process on a background thread unless it is warming or warm."""
+        if self._claim():
+            threading.Thread(target=self._warm, name='warmup', daemon=True).start()
+
+    def _claim(self):
+        with self._lock:
+            if self.state in (self.RUNNING, self.READY):
+                return False
+            self._pid, self._state, self._error = os.getpid(), self.RUNNING, None
+            self.timings_ms = {}
+            return True
+
+    def _warm(self):
+        start = time.perf_counter()
+        with self.app.app_context():
+            for name, step, required in WARMUP_STEPS:
+                t0 = time.perf_counter()
+                try:
+                    step(self.app)
+                except Exception as e:
+                    db.session.rollback()
+                    if required:
+                        logging.error(f"Warm-up step '{name}' failed: {e}")
+                        self._error = f"{name}: {e}"
+                        self._state = self.FAILED
+                        db.session.remove()
+                        return
+                    logging.warning(f"Optional warm-up step '{name}' failed: {e}")
+                self.timings_ms[name] = round((time.perf_counter() - t0) * 1000, 1)
+            db.session.remove()
+
+        self._state = self.READY
+        logging.info(f"Worker {os.getpid()} warmed up in {(time.perf_counter() - start) * 1000:.0f}ms: {self.timings_ms}")
+
+    def _before_request(self):
+        # Cheap after the first request: the state is only COLD once per process
+        if self.state == self.COLD:
+            self.start()
+
+    def _readyz_view(self):
+        if self.ready:
+            return jsonify({'status': self.READY, 'warmup_ms': self.timings_ms})
+        if self.state == self.FAILED:
+            error = self._error
+            self.start()
+            return jsonify({'status': self.FAILED, 'error': error}), 503
+        return jsonify({'status': self.state}), 503
+
+
+warmup = Warmup()
@@ -0,0 +1,151 @@
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from .extensions import db
+
+
+class _PendingWrite:
+    """A single row waiting for the next group commit."""
+    __slots__ = ('row', 'done', 'error', 'state', 'lock')
+
+    QUEUED, WRITING, ABANDONED = 'queued', 'writing', 'abandoned'
+
+    def __init__(self, row):
+        self.row = row
+        self.done = threading.Event()
+        self.error = None
+        self.state = self.QUEUED
+        self.lock = threading.Lock()
+
+    def claim(self):
+        """Flusher side: take the row for writing unless its request gave up."""
+        with self.lock:
+            if self.state == self.ABANDONED:
+                return False
+            self.state = self.WRITING
+            return True
+
+    def abandon(self):
+        """Request side: give up on the row unless it is already being written."""
+        with self.lock:
+            if self.state == self.WRITING:
+                return False
+            self.state = self.ABANDONED
+            return True
+
+
+class ResponseWriteBuffer:
+    """Coalesces concurrent UserResponse inserts into a single transaction.
+
+    Request threads hand their row to `add()` and block until the flusher
+    thread has committed the batch containing it, so durability is still
+    acknowledged before the HTTP response is sent. The flusher waits at most
+    GROUP_COMMIT_INTERVAL_MS after the first pending row before writing.
+
+    A request that waits longer than GROUP_COMMIT_TIMEOUT abandons its row,
+    which the flusher then skips, so the TimeoutError means nothing was
+    written and the client can safely retry. A row the flusher has already
+    claimed gets GROUP_COMMIT_WRITE_MARGIN more; if the commit hangs past
+    that, the request gives up with the same TimeoutError rather than
+    blocking its thread forever. If a batch insert fails, its rows are
+    retried one by one so only the bad row reports an error.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['response_write_buffer'] = self
+
+    @property
+    def enabled(self):
+        return bool(self.app and self.app.config.get('GROUP_COMMIT_ENABLED'))
+
+    def add(self, user_id, question_id, response_data, is_correct):
+        """Queue a response row and wait until it has been committed."""
+        pending = _PendingWrite({
+            'user_id': user_id,
+            'question_id': question_id,
+            'response_data': response_data,
+            'is_correct': is_correct,
+            'timestamp': datetime.utcnow(),
+        })
+        self._ensure_started()
+        self._queue.put(pending)
+        timeout = self.app.config.get('GROUP_COMMIT_TIMEOUT', 5.0)
+        if not pending.done.wait(timeout):
+            if pending.abandon():
+                raise TimeoutError('Group commit did not complete in time')
+            # Already being written: its outcome should be moments away
+            margin = self.app.config.get('GROUP_COMMIT_WRITE_MARGIN', 5.0)
+            if not pending.done.wait(margin):
+                logging.error(f"Group commit still running after {timeout + margin:.1f}s, giving up on the request")
+                raise TimeoutError('Group commit did not finish in time')
+        if pending.error is not None:
+            raise pending.error
+
+    def _ensure_started(self):
+        # The flusher thread is started lazily, and restarted after a fork,
+        # so that each gunicorn worker gets its own.
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == pid and self._thread.is_alive():
+                return
+            if self._pid != pid:
+                self._queue = queue.Queue()
+            self._pid = pid
+            self._thread = threading.Thread(target=self._run, name='response-group-commit', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        interval = self.app.config.get('GROUP_COMMIT_INTERVAL_MS', 5) / 1000.0
+        max_batch = self.app.config.get('GROUP_COMMIT_MAX_BATCH', 500)
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + interval
+            while len(batch) < max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _flush(self, batch):
+        from .models import UserResponse
+        batch = [pending for pending in batch if pending.claim()]
+        if not batch:
+            return
+        insert = UserResponse.__table__.insert()
+        with self.app.app_context():
+            try:
+                with db.engine.begin() as conn:
+                    conn.execute(insert, [p.row for p in batch])
+            except Exception as e:
+                logging.error(f"Group commit of {len(batch)} responses failed, retrying one by one: {e}")
+                for pending in batch:
+                    try:
+                        with db.engine.begin() as conn:
+                            conn.execute(insert, [pending.row])
+                    except Exception as row_error:
+                        pending.error = row_error
+        for pending in batch:
+            pending.done.set()
+
+
+response_buffer = ResponseWriteBuffer()
@@ -0,0 +1,203 @@
+"""Concurrency per worker for the sync and async AI views.
+
+Starts one threaded WSGI server (a single "worker") per mode and drives
+`submit_answer` from --concurrency clients at once. Gemini is replaced by
+an in-process stand-in that answers after --latency seconds (time.sleep
+for the sync SDK call, asyncio.sleep for the async one), so the numbers
+reflect how each mode holds requests in flight, not network variance.
+
+Reported per mode: throughput, latency percentiles, responses that fell
+back to the static explanation, peak server threads and the peak number of
+upstream calls in flight at once.
+
+    python -m benchmarks.ai_concurrency --concurrency 50 --concurrency 200 \\
+        --latency 1.0 --requests-per-client 3 --output ai_concurrency.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import types
+
+import requests
+from werkzeug.serving import make_server
+
+from app import create_app, llm
+from app.config import Config
+from app.extensions import db
+from app.models import Subject, Concept, Question, User
+from benchmarks.stats import summarize
+
+PASSWORD = 'benchmark-password'
+
+
+class FakeGemini:
+    """Stand-in for google.generativeai with a fixed response latency."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+        fake = self
+
+        class GenerativeModel:
+            def __init__(self, model_name, **kwargs):
+                self.model_name = model_name
+
+            def generate_content(self, prompt, **kwargs):
+                with fake.track():
+                    time.sleep(fake.latency)
+                return types.SimpleNamespace(text=f'{self.model_name}: feedback', usage_metadata=None)
+
+            async def generate_content_async(self, prompt, **kwargs):
+                with fake.track():
+                    await asyncio.sleep(fake.latency)
+                return types.SimpleNamespace(text=f'{self.model_name}: feedback', usage_metadata=None)
+
+        self.module = types.SimpleNamespace(GenerativeModel=GenerativeModel, configure=lambda **kwargs: None)
+
+    def track(self):
+        fake = self
+
+        class _Tracker:
+            def __enter__(self):
+                with fake._lock:
+                    fake.in_flight += 1
+                    fake.peak_in_flight = max(fake.peak_in_flight, fake.in_flight)
+
+            def __exit__(self, *exc):
+                with fake._lock:
+                    fake.in_flight -= 1
+                return False
+
+        return _Tracker()
+
+
+def build_app(db_path, async_views, clients, llm_concurrency):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_path}'
+        ASYNC_AI_VIEWS = async_views
+        LLM_MAX_CONCURRENCY = llm_concurrency
+        LLM_MAX_QUEUED = llm_concurrency
+        # Prompts are identical across clients; measure raw concurrency
+        LLM_SINGLE_FLIGHT_ENABLED = False
+        PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        if Subject.query.first() is None:
+            subject = Subject(name='Bench', slug='bench')
+            concept = Concept(name='Bench Concept', slug='bench-concept', subject=subject)
+            db.session.add(Question(legacy_id='bench_q', concept=concept, problem_text='2 + 3?',
+                                    difficulty='Easy', explanation='Add them.',
+                                    data={'type': 'numerical', 'answer': '5'}))
+            for i in range(clients):
+                user = User(email=f'ai{i}@bench.local')
+                user.set_password(PASSWORD)
+                db.session.add(user)
+            db.session.commit()
+    return app
+
+
+def run_mode(db_path, async_views, clients, per_client, llm_concurrency, fake):
+    app = build_app(db_path, async_views, clients, llm_concurrency)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+
+    sessions = []
+    for i in range(clients):
+        session = requests.Session()
+        session.post(f'{base_url}/login', json={'email': f'ai{i}@bench.local', 'password': PASSWORD})
+        sessions.append(session)
+
+    latencies = []
+    errors = [0]
+    fallbacks = [0]
+    lock = threading.Lock()
+    peak_threads = [threading.active_count()]
+    done = threading.Event()
+    start_barrier = threading.Barrier(clients + 1)
+
+    def sample_threads():
+        while not done.is_set():
+            peak_threads[0] = max(peak_threads[0], threading.active_count())
+            time.sleep(0.01)
+
+    def client(session):
+        start_barrier.wait()
+        for _ in range(per_client):
+            t0 = time.perf_counter()
+            response = session.post(f'{base_url}/api/question/submit_answer',
+                                    json={'question_id': 'bench_q', 'answer': '5'})
+            elapsed = time.perf_counter() - t0
+            with lock:
+                latencies.append(elapsed)
+                if response.status_code != 200:
+                    errors[0] += 1
+                elif 'feedback' not in (response.json().get('explanation') or ''):
+                    # Shed or out of budget: served the static explanation
+                    fallbacks[0] += 1
+
+    fake.peak_in_flight = 0
+    threads = [threading.Thread(target=client, args=(s,)) for s in sessions]
+    for t in threads:
+        t.start()
+    sampler = threading.Thread(target=sample_threads, daemon=True)
+    sampler.start()
+    start_barrier.wait()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    wall_time = time.perf_counter() - start
+    done.set()
+    server.shutdown()
+
+    stats = summarize(latencies, errors[0], wall_time)
+    stats['fallbacks'] = fallbacks[0]
+    # Client threads live in this process too; report server-side threads only
+    stats['peak_server_threads'] = peak_threads[0] - clients - 1
+    stats['peak_upstream_in_flight'] = fake.peak_in_flight
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare in-flight AI requests per worker for sync and async views.')
+    parser.add_argument('--concurrency', type=int, action='append', help='Concurrent clients (repeatable, default 50)')
+    parser.add_argument('--requests-per-client', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=1.0, help='Simulated Gemini latency in seconds')
+    parser.add_argument('--llm-concurrency', type=int, default=1024, help='LLM_MAX_CONCURRENCY for the run')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    fake = FakeGemini(args.latency)
+    llm._genai = fake.module
+    llm.GEMINI_API_KEY = 'benchmark'
+
+    results = {'latency_s': args.latency, 'runs': {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        for clients in args.concurrency or [50]:
+            run = results['runs'][str(clients)] = {}
+            for mode, async_views in (('sync', False), ('async', True)):
+                stats = run_mode(os.path.join(tmp, f'{mode}-{clients}.db'), async_views, clients,
+                                 args.requests_per_client, args.llm_concurrency, fake)
+                run[mode] = stats
+                print(f'{clients:>4} clients {mode:<5} {stats["throughput_rps"]:8.1f} req/s  '
+                      f'p50 {stats["p50_ms"]}ms  p95 {stats["p95_ms"]}ms  '
+                      f'threads {stats["peak_server_threads"]}  upstream {stats["peak_upstream_in_flight"]}  '
+                      f'fallbacks {stats["fallbacks"]}  errors {stats["errors"]}')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
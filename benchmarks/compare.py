@@ -0,0 +1,43 @@
+"""Compare two benchmark result files.
+
+    python -m benchmarks.compare baseline.json candidate.json
+"""
+import argparse
+import json
+
+METRICS = ['p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps']
+
+
+def _change(old, new):
+    if old in (None, 0) or new is None:
+        return 'n/a'
+    return f'{(new - old) / old * 100:+.1f}%'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files.')
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    print(f"baseline:  {baseline['meta'].get('commit')}")
+    print(f"candidate: {candidate['meta'].get('commit')}")
+    print(f"{'scenario':<18}{'driver':<13}" + ''.join(f'{m:>32}' for m in METRICS))
+    for scenario, drivers in candidate['results'].items():
+        for driver, new in drivers.items():
+            old = baseline['results'].get(scenario, {}).get(driver)
+            if old is None:
+                continue
+            cells = ''.join(
+                f"{f'{old[m]} -> {new[m]} ({_change(old[m], new[m])})':>32}" for m in METRICS
+            )
+            print(f'{scenario:<18}{driver:<13}{cells}')
+
+
+if __name__ == '__main__':
+    main()
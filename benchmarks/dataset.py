@@ -0,0 +1,142 @@
+"""Builds a synthetic large-scale database for benchmarking.
+
+The `DISCIPLINES` content is replicated `concept_copies` times per subject,
+each concept gets an Easy/Medium/Hard question ladder built from the
+linear algebra practice problems, and `users` synthetic accounts share
+`responses` answer records with a skewed (power-law) distribution so a
+few heavy users have long histories.
+"""
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+
+from app.extensions import db
+from app.models import User, Subject, Concept, Question, UserResponse, question_payload
+from data.disciplines import DISCIPLINES
+from seed import slugify
+
+BENCH_PASSWORD = 'benchmark-password'
+DIFFICULTIES = ['Easy', 'Medium', 'Hard']
+INSERT_CHUNK = 10000
+
+
+def user_email(index):
+    return f'bench-user-{index}@example.com'
+
+
+def _question_templates():
+    templates = []
+    for problems in DISCIPLINES['linear-algebra']['problems'].values():
+        templates.extend(problems)
+    return templates
+
+
+def _insert(table, rows):
+    for start in range(0, len(rows), INSERT_CHUNK):
+        db.session.execute(table.insert(), rows[start:start + INSERT_CHUNK])
+
+
+def build_dataset(concept_copies=100, users=200, responses=100000, seed=42):
+    """Populate the current app's database. Must run inside an app context."""
+    rng = random.Random(seed)
+    db.drop_all()
+    db.create_all()
+
+    subject_rows = []
+    concept_rows = []
+    question_rows = []
+    templates = _question_templates()
+    concept_id = question_id = 0
+    for subject_id, (subject_slug, subject_data) in enumerate(DISCIPLINES.items(), 1):
+        subject_rows.append({'id': subject_id, 'name': subject_data['name'], 'slug': subject_slug})
+        for copy in range(concept_copies):
+            for concept_name, details in subject_data['concepts'].items():
+                concept_id += 1
+                name = concept_name if copy == 0 else f'{concept_name} {copy}'
+                concept_rows.append({
+                    'id': concept_id,
+                    'subject_id': subject_id,
+                    'name': name,
+                    'slug': slugify(name),
+                    'formula': details.get('formula'),
+                    'explanation': details.get('explanation'),
+                    'core_idea': details.get('core_idea'),
+                    'real_world_application': details.get('real_world_application'),
+                    'mathematical_demonstration': details.get('mathematical_demonstration'),
+                    'study_plan': details.get('study_plan'),
+                })
+                for difficulty in DIFFICULTIES:
+                    question_id += 1
+                    template = templates[question_id % len(templates)]
+                    row = {
+                        'id': question_id,
+                        'legacy_id': f'bench_{question_id}',
+                        'concept_id': concept_id,
+                        'problem_text': template['problem'],
+                        'difficulty': difficulty,
+                        'explanation': template.get('explanation'),
+                        'data': {k: v for k, v in template.items() if k not in ['id', 'problem', 'difficulty', 'explanation']},
+                        'version': 1,
+                    }
+                    # Core inserts skip the ORM event that stores the payload
+                    row['payload'] = question_payload(row['legacy_id'], row['problem_text'], row['difficulty'],
+                                                      row['explanation'], row['data'])
+                    question_rows.append(row)
+
+    _insert(Subject.__table__, subject_rows)
+    _insert(Concept.__table__, concept_rows)
+    _insert(Question.__table__, question_rows)
+
+    # Hash once; every synthetic user shares the same password.
+    password_hash = generate_password_hash(BENCH_PASSWORD)
+    now = datetime.utcnow()
+    _insert(User.__table__, [
+        {'id': i, 'email': user_email(i), 'password_hash': password_hash, 'created_at': now}
+        for i in range(1, users + 1)
+    ])
+
+    weights = [1.0 / rank for rank in range(1, users + 1)]
+    user_ids = rng.choices(range(1, users + 1), weights=weights, k=responses)
+    rows = []
+    for i, user_id in enumerate(user_ids):
+        question = question_rows[rng.randrange(len(question_rows))]
+        is_correct = rng.random() < 0.7
+        rows.append({
+            'user_id': user_id,
+            'question_id': question['id'],
+            'response_data': {'answer': question['data'].get('answer') if is_correct else 'wrong'},
+            'is_correct': is_correct,
+            'timestamp': now - timedelta(seconds=responses - i),
+        })
+        if len(rows) >= INSERT_CHUNK:
+            _insert(UserResponse.__table__, rows)
+            rows = []
+    _insert(UserResponse.__table__, rows)
+    db.session.commit()
+
+    return {
+        'subjects': len(subject_rows),
+        'concepts': len(concept_rows),
+        'questions': len(question_rows),
+        'users': users,
+        'responses': responses,
+    }
+
+
+def ensure_dataset(app, path, rebuild=False, **params):
+    """Build the dataset at `path` unless one with the same parameters exists."""
+    meta_path = path + '.json'
+    if not rebuild and os.path.exists(path) and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get('params') == params:
+            return meta
+    with app.app_context():
+        counts = build_dataset(**params)
+    meta = {'params': params, 'counts': counts}
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+    return meta
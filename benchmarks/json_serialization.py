@@ -0,0 +1,125 @@
+"""JSON serialization cost for API payloads and JSON columns.
+
+Times Flask's stdlib provider against the orjson provider
+(app/json_provider.py) on payloads built from the shipped content:
+
+- concept: the `/api/concept` body for each linear algebra concept
+- question: the `/api/question` body for each practice problem
+- response_data: a `UserResponse.response_data` column value
+
+For each payload kind it reports microseconds per operation for building a
+response (`app.json.response`), `dumps`, `loads`, and the engine's JSON
+column serializer/deserializer.
+
+    python -m benchmarks.json_serialization --repeat 2000 --output json_serialization.json
+"""
+import argparse
+import json
+import time
+
+from flask import Flask
+
+from app.json_provider import OrjsonProvider, column_dumps, column_loads, orjson
+from data.disciplines import DISCIPLINES
+from data.practice_problems import LINEAR_ALGEBRA_PROBLEMS
+
+
+def concept_payloads():
+    payloads = []
+    for name, details in DISCIPLINES['linear-algebra']['concepts'].items():
+        problems = LINEAR_ALGEBRA_PROBLEMS.get(name, [])
+        payloads.append({
+            'name': name,
+            'formula': details.get('formula'),
+            'explanation': details.get('explanation'),
+            'core_idea': details.get('core_idea'),
+            'real_world_application': details.get('real_world_application'),
+            'mathematical_demonstration': details.get('mathematical_demonstration'),
+            'study_plan': details.get('study_plan'),
+            'questions': [p['id'] for p in problems],
+        })
+    return payloads
+
+
+def question_payloads():
+    payloads = []
+    for problems in LINEAR_ALGEBRA_PROBLEMS.values():
+        for problem in problems:
+            payload = {'problem': problem['problem'], 'difficulty': problem.get('difficulty'),
+                       'explanation': problem.get('explanation')}
+            payload.update({k: v for k, v in problem.items() if k not in ('problem', 'difficulty', 'explanation')})
+            payloads.append(payload)
+    return payloads
+
+
+def response_payloads():
+    return [{'answer': '[130, 40]'}, {'answer': 1}, {'answer': '3/5'}]
+
+
+def per_op_us(fn, items, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            fn(item)
+    return round((time.perf_counter() - start) / (repeat * len(items)) * 1e6, 3)
+
+
+def measure(app, items, repeat):
+    provider = app.json
+    encoded = [provider.dumps(item) for item in items]
+    with app.app_context():
+        results = {
+            'response_us': per_op_us(provider.response, items, repeat),
+            'dumps_us': per_op_us(provider.dumps, items, repeat),
+            'loads_us': per_op_us(provider.loads, encoded, repeat),
+        }
+    return results
+
+
+def measure_columns(items, repeat, dumps, loads):
+    encoded = [dumps(item) for item in items]
+    return {
+        'column_dumps_us': per_op_us(dumps, items, repeat),
+        'column_loads_us': per_op_us(loads, encoded, repeat),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare JSON serialization cost of the stdlib and orjson providers.')
+    parser.add_argument('--repeat', type=int, default=1000, help='Passes over each payload set')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    if orjson is None:
+        parser.error('orjson is not installed')
+
+    stdlib_app = Flask(__name__)
+    orjson_app = Flask(__name__)
+    orjson_app.json = OrjsonProvider(orjson_app)
+
+    payload_sets = {
+        'concept': concept_payloads(),
+        'question': question_payloads(),
+        'response_data': response_payloads(),
+    }
+    results = {'repeat': args.repeat, 'payloads': {}}
+    for kind, items in payload_sets.items():
+        size = sum(len(json.dumps(item)) for item in items) // len(items)
+        run = results['payloads'][kind] = {'items': len(items), 'mean_bytes': size}
+        run['stdlib'] = measure(stdlib_app, items, args.repeat)
+        run['stdlib'].update(measure_columns(items, args.repeat, json.dumps, json.loads))
+        run['orjson'] = measure(orjson_app, items, args.repeat)
+        run['orjson'].update(measure_columns(items, args.repeat, column_dumps, column_loads))
+
+        print(f'{kind} ({len(items)} payloads, ~{size} bytes)')
+        for metric in run['stdlib']:
+            before, after = run['stdlib'][metric], run['orjson'][metric]
+            print(f'  {metric:<16} stdlib {before:9.2f}us  orjson {after:9.2f}us  {before / after:5.1f}x')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
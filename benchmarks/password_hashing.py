@@ -0,0 +1,116 @@
+"""Password hashing cost benchmark.
+
+For each hashing method, measures raw hashes per second and the login
+throughput of `/login` driven from --threads concurrent test clients
+against a throwaway SQLite database. Throughput is also reported per CPU
+core in use, so a cost setting can be picked for a given login rate.
+
+    python -m benchmarks.password_hashing --logins 200 --threads 4 \\
+        --method scrypt:32768:8:1 --method scrypt:16384:8:1 --method pbkdf2:sha256:600000
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+
+from werkzeug.security import generate_password_hash
+
+from app import create_app
+from app.config import Config
+from app.extensions import db
+from app.models import User
+from benchmarks.stats import summarize
+
+DEFAULT_METHODS = ['scrypt:32768:8:1', 'scrypt:16384:8:1', 'pbkdf2:sha256:600000', 'pbkdf2:sha256:1000000']
+
+PASSWORD = 'benchmark-password'
+
+
+def hashes_per_second(method, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        generate_password_hash(PASSWORD, method)
+    return count / (time.perf_counter() - start)
+
+
+def login_throughput(method, logins, threads, workers):
+    """Drive `logins` logins across `threads` clients with `method` configured."""
+    with tempfile.TemporaryDirectory() as tmp:
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f'sqlite:///{os.path.join(tmp, "bench.db")}'
+            PASSWORD_HASH_METHOD = method
+            PASSWORD_HASH_WORKERS = workers
+            WTF_CSRF_ENABLED = False
+
+        app = create_app(BenchConfig)
+        with app.app_context():
+            db.create_all()
+            for i in range(threads):
+                user = User(email=f'login{i}@bench.local')
+                user.set_password(PASSWORD)
+                db.session.add(user)
+            db.session.commit()
+
+        latencies = []
+        errors = [0]
+        lock = threading.Lock()
+
+        def worker(index, count):
+            client = app.test_client()
+            body = {'email': f'login{index}@bench.local', 'password': PASSWORD}
+            for _ in range(count):
+                t0 = time.perf_counter()
+                response = client.post('/login', json=body)
+                elapsed = time.perf_counter() - t0
+                client.get('/logout')
+                with lock:
+                    latencies.append(elapsed)
+                    if response.status_code != 200:
+                        errors[0] += 1
+
+        per_thread = [logins // threads + (1 if i < logins % threads else 0) for i in range(threads)]
+        pool = [threading.Thread(target=worker, args=(i, n)) for i, n in enumerate(per_thread)]
+        start = time.perf_counter()
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        wall_time = time.perf_counter() - start
+        with app.app_context():
+            db.engine.dispose()
+    return summarize(latencies, errors[0], wall_time)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure login throughput per core for each hashing cost.')
+    parser.add_argument('--method', action='append', dest='methods',
+                        help=f'Werkzeug hash method (repeatable, default: {", ".join(DEFAULT_METHODS)})')
+    parser.add_argument('--logins', type=int, default=100)
+    parser.add_argument('--threads', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--workers', type=int, default=None, help='PASSWORD_HASH_WORKERS (default: CPU count)')
+    parser.add_argument('--hashes', type=int, default=20, help='Raw hashes to time per method')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    # The hashing pool is sized once per process, so every method shares it.
+    cores = min(args.threads, args.workers or os.cpu_count() or 1)
+    results = {'threads': args.threads, 'cores': cores, 'methods': {}}
+    for method in args.methods or DEFAULT_METHODS:
+        raw = hashes_per_second(method, args.hashes)
+        stats = login_throughput(method, args.logins, args.threads, args.workers)
+        stats['hashes_per_second'] = round(raw, 2)
+        stats['logins_per_core_per_second'] = round(stats['throughput_rps'] / cores, 2)
+        results['methods'][method] = stats
+        print(f'{method:<24} {raw:8.1f} hash/s  {stats["throughput_rps"]:8.1f} login/s  '
+              f'{stats["logins_per_core_per_second"]:7.1f} login/s/core  p95 {stats["p95_ms"]}ms'
+              f'  errors {stats["errors"]}')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
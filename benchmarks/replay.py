@@ -0,0 +1,153 @@
+"""Replay a captured traffic trace against a running instance.
+
+Reads the JSONL files written by TRAFFIC_CAPTURE_ENABLED (one per worker
+process, rotated backups included, merged in timestamp order) and re-issues each request at its original
+offset, divided by --speed. Each recorded user bucket gets its own session,
+logged in as a synthetic replay user that is registered on first use.
+Bodies are rebuilt from the recorded shape, with the content identifiers
+that were kept in `body_values`.
+
+    python -m benchmarks.replay instance/traffic/requests-*.jsonl* \\
+        --base-url http://127.0.0.1:5000 --speed 4 --output replay.json
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.stats import summarize
+
+# Authentication is handled per bucket; captured auth requests are skipped.
+SKIP_ENDPOINTS = {'auth.login', 'auth.logout', 'auth.register', 'auth.change_password',
+                  'auth.reset_password', 'auth.reset_password_request'}
+
+_LIST_RE = re.compile(r'^list\[(\d+)\]$')
+_PLACEHOLDERS = {'str': '0', 'int': 0, 'float': 0.0, 'bool': False, 'null': None, 'dict': {}}
+
+
+def load_trace(paths):
+    entries = []
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    entries.append(json.loads(line))
+    entries.sort(key=lambda entry: entry['ts'])
+    return entries
+
+
+def synthesize(shape):
+    """Build a placeholder value matching a recorded shape."""
+    if isinstance(shape, dict):
+        return {key: synthesize(value) for key, value in shape.items()}
+    match = _LIST_RE.match(shape)
+    if match:
+        return ['0'] * int(match.group(1))
+    return _PLACEHOLDERS.get(shape, '0')
+
+
+class BucketSessions:
+    """One logged-in requests.Session per recorded user bucket."""
+
+    def __init__(self, base_url, password):
+        self.base_url = base_url
+        self.password = password
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def get(self, bucket):
+        with self.lock:
+            session = self.sessions.get(bucket)
+            if session is None:
+                session = self.sessions[bucket] = requests.Session()
+                if bucket is not None:
+                    self._login(session, f'replay-user-{bucket}@example.com')
+            return session
+
+    def _login(self, session, email):
+        credentials = {'email': email, 'password': self.password}
+        response = session.post(f'{self.base_url}/login', json=credentials)
+        if response.status_code != 200:
+            session.post(f'{self.base_url}/register', data=credentials)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay a captured traffic trace.')
+    parser.add_argument('trace', nargs='+', help='Captured JSONL files')
+    parser.add_argument('--base-url', default='http://127.0.0.1:5000')
+    parser.add_argument('--speed', type=float, default=1.0, help='Time compression factor (2 = twice as fast)')
+    parser.add_argument('--workers', type=int, default=64, help='Maximum concurrent requests')
+    parser.add_argument('--password', default='replay-password', help='Password for synthetic replay users')
+    parser.add_argument('--output', help='Write a JSON summary to this file')
+    args = parser.parse_args(argv)
+
+    entries = [e for e in load_trace(args.trace) if e.get('endpoint') not in SKIP_ENDPOINTS]
+    if not entries:
+        print('Trace is empty.')
+        return
+
+    base_url = args.base_url.rstrip('/')
+    sessions = BucketSessions(base_url, args.password)
+    results = []
+    lock = threading.Lock()
+
+    def issue(entry):
+        session = sessions.get(entry.get('user_bucket'))
+        body = None
+        if 'body_shape' in entry:
+            body = synthesize(entry['body_shape'])
+            if isinstance(body, dict):
+                body.update(entry.get('body_values') or {})
+        params = {k: v for k, v in entry.get('args', {}).items()}
+        kwargs = {'params': params}
+        if body is not None:
+            kwargs['json' if entry.get('content_type') == 'json' else 'data'] = body
+        t0 = time.perf_counter()
+        try:
+            response = session.request(entry['method'], base_url + entry['path'], **kwargs)
+            status = response.status_code
+        except requests.RequestException:
+            status = None
+        elapsed = time.perf_counter() - t0
+        with lock:
+            results.append((entry, status, elapsed))
+
+    first_ts = entries[0]['ts']
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        for entry in entries:
+            delay = (entry['ts'] - first_ts) / args.speed - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(issue, entry)
+    wall_time = time.perf_counter() - start
+
+    latencies = [elapsed for _, _, elapsed in results]
+    errors = sum(1 for _, status, _ in results if status is None or status >= 500)
+    summary = {'overall': summarize(latencies, errors, wall_time), 'endpoints': {}}
+    by_endpoint = {}
+    for entry, status, elapsed in results:
+        by_endpoint.setdefault(entry.get('endpoint') or 'unmatched', []).append((entry, status, elapsed))
+    for endpoint, rows in sorted(by_endpoint.items()):
+        stats = summarize([e for _, _, e in rows], sum(1 for _, s, _ in rows if s is None or s >= 500), wall_time)
+        recorded = sorted(entry['latency_ms'] for entry, _, _ in rows)
+        stats['recorded_p50_ms'] = recorded[len(recorded) // 2]
+        summary['endpoints'][endpoint] = stats
+        print(f"{endpoint:<28} n={stats['requests']:<6} p50={stats['p50_ms']}ms "
+              f"(recorded {stats['recorded_p50_ms']}ms) p99={stats['p99_ms']}ms errors={stats['errors']}")
+
+    overall = summary['overall']
+    print(f"Replayed {overall['requests']} requests in {wall_time:.1f}s at {args.speed}x: "
+          f"p50={overall['p50_ms']}ms p99={overall['p99_ms']}ms errors={overall['errors']}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+"""End-to-end benchmark runner.
+
+Builds (or reuses) a synthetic database, then drives the hot endpoints
+through the Flask test client and through a multi-threaded WSGI server,
+writing p50/p95/p99 latency and throughput to a JSON file that can be
+compared between commits with `python -m benchmarks.compare`.
+
+    python -m benchmarks.run --concept-copies 100 --responses 1000000 \\
+        --requests 500 --threads 8 --output bench_results.json
+
+Gemini is never called: GEMINI_API_KEY is removed from the environment so
+the AI endpoints take their static fallbacks.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+os.environ.pop('GEMINI_API_KEY', None)
+
+import requests
+from werkzeug.serving import make_server
+
+from app import create_app
+from app.config import Config, basedir
+from app.extensions import db
+from app.models import Subject, Concept, Question
+from benchmarks.dataset import BENCH_PASSWORD, ensure_dataset, user_email
+from benchmarks.stats import summarize
+
+SCENARIOS = ['discipline_page', 'api_overview', 'api_concept', 'next_question', 'submit_answer', 'profile']
+
+
+class BenchContext:
+    """Content identifiers the scenarios pick from."""
+
+    def __init__(self, app):
+        with app.app_context():
+            self.subjects = [s for (s,) in db.session.query(Subject.slug)]
+            self.concepts = db.session.query(Subject.slug, Concept.slug).join(Concept).all()
+            self.questions = [q for (q,) in db.session.query(Question.legacy_id)]
+
+    def request_for(self, scenario, rng):
+        """Return (method, path, json_body) for one request of a scenario."""
+        if scenario == 'discipline_page':
+            return 'GET', f'/{rng.choice(self.subjects)}', None
+        if scenario == 'api_overview':
+            return 'GET', f'/api/overview?discipline={rng.choice(self.subjects)}', None
+        if scenario == 'api_concept':
+            subject, concept = rng.choice(self.concepts)
+            return 'GET', f'/api/concept?discipline={subject}&concept={concept}', None
+        if scenario == 'next_question':
+            return 'GET', f'/api/question/next?current_id={rng.choice(self.questions)}', None
+        if scenario == 'submit_answer':
+            return 'POST', '/api/question/submit_answer', {'question_id': rng.choice(self.questions), 'answer': '5'}
+        if scenario == 'profile':
+            return 'GET', '/profile', None
+        raise ValueError(f'Unknown scenario: {scenario}')
+
+
+def run_test_client(app, ctx, scenario, count, seed):
+    """Issue `count` requests sequentially through the Flask test client."""
+    rng = random.Random(seed)
+    client = app.test_client()
+    client.post('/login', json={'email': user_email(1), 'password': BENCH_PASSWORD})
+    latencies = []
+    errors = 0
+    start = time.perf_counter()
+    for _ in range(count):
+        method, path, body = ctx.request_for(scenario, rng)
+        t0 = time.perf_counter()
+        response = client.open(path, method=method, json=body)
+        latencies.append(time.perf_counter() - t0)
+        if response.status_code >= 400:
+            errors += 1
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+def run_wsgi(base_url, ctx, scenario, count, threads, seed):
+    """Issue `count` requests spread over `threads` clients against a live server."""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def worker(index, share):
+        rng = random.Random(seed + index)
+        session = requests.Session()
+        session.post(f'{base_url}/login', json={'email': user_email(index + 1), 'password': BENCH_PASSWORD})
+        local = []
+        local_errors = 0
+        for _ in range(share):
+            method, path, body = ctx.request_for(scenario, rng)
+            t0 = time.perf_counter()
+            response = session.request(method, base_url + path, json=body)
+            local.append(time.perf_counter() - t0)
+            if response.status_code >= 400:
+                local_errors += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    shares = [count // threads + (1 if i < count % threads else 0) for i in range(threads)]
+    workers = [threading.Thread(target=worker, args=(i, share)) for i, share in enumerate(shares)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return summarize(latencies, errors[0], time.perf_counter() - start)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=basedir, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default=os.path.join(basedir, 'instance', 'bench.db'), help='SQLite file for the synthetic dataset')
+    parser.add_argument('--rebuild', action='store_true', help='Rebuild the dataset even if it exists')
+    parser.add_argument('--concept-copies', type=int, default=100)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--responses', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--requests', type=int, default=200, help='Requests per scenario and driver')
+    parser.add_argument('--threads', type=int, default=8, help='Client threads for the WSGI driver')
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS, help='Run only these scenarios')
+    parser.add_argument('--driver', action='append', choices=['test_client', 'wsgi'], help='Run only these drivers')
+    parser.add_argument('--output', default='bench_results.json')
+    args = parser.parse_args(argv)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.db)), exist_ok=True)
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{os.path.abspath(args.db)}'
+
+    app = create_app(BenchConfig)
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    dataset = ensure_dataset(app, os.path.abspath(args.db), rebuild=args.rebuild,
+                             concept_copies=args.concept_copies, users=args.users,
+                             responses=args.responses, seed=args.seed)
+    ctx = BenchContext(app)
+    scenarios = args.scenario or SCENARIOS
+    drivers = args.driver or ['test_client', 'wsgi']
+
+    server = None
+    if 'wsgi' in drivers:
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{server.server_port}'
+
+    results = {}
+    try:
+        for scenario in scenarios:
+            results[scenario] = {}
+            if 'test_client' in drivers:
+                results[scenario]['test_client'] = run_test_client(app, ctx, scenario, args.requests, args.seed)
+            if 'wsgi' in drivers:
+                results[scenario]['wsgi'] = run_wsgi(base_url, ctx, scenario, args.requests, args.threads, args.seed)
+            print(f'{scenario}: ' + ', '.join(
+                f"{driver} p50={r['p50_ms']}ms p95={r['p95_ms']}ms p99={r['p99_ms']}ms {r['throughput_rps']} req/s"
+                for driver, r in results[scenario].items()
+            ))
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.utcnow().isoformat() + 'Z',
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'requests': args.requests,
+            'threads': args.threads,
+            'dataset': dataset,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Wrote {args.output}')
+
+
+if __name__ == '__main__':
+    main()
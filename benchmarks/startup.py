@@ -0,0 +1,115 @@
+"""Startup cost measurements.
+
+Each sample runs in a fresh interpreter so nothing is already imported:
+
+  * `import app` and `create_app()` times (median of --runs), and which
+    heavy modules ended up loaded.
+  * With --gunicorn (gunicorn is not in requirements.txt, so install it
+    first), the time from spawning `gunicorn mathyou_mcconaughyay:app`
+    until the first successful response.
+
+The import-time budget itself is enforced by tests/test_startup.py.
+
+    python -m benchmarks.startup --runs 5 --gunicorn
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from app.config import basedir
+
+HEAVY_MODULES = ['google.generativeai', 'grpc', 'numpy']
+
+_SAMPLE = """
+import json, sys, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+app.create_app()
+t2 = time.perf_counter()
+print(json.dumps({
+    'import_ms': (t1 - t0) * 1000,
+    'create_app_ms': (t2 - t1) * 1000,
+    'loaded': [m for m in %r if m in sys.modules],
+}))
+""" % (HEAVY_MODULES,)
+
+
+def sample_startup():
+    env = dict(os.environ, GEMINI_API_KEY=os.environ.get('GEMINI_API_KEY', 'startup-check'))
+    output = subprocess.check_output([sys.executable, '-c', _SAMPLE], cwd=basedir, env=env,
+                                     stderr=subprocess.DEVNULL, text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def gunicorn_cold_start(timeout=60.0):
+    """Seconds from spawning gunicorn until `/` answers, or None if unavailable."""
+    executable = shutil.which('gunicorn')
+    if executable is None:
+        return None
+    port = _free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [executable, '--workers', '1', '--bind', f'127.0.0.1:{port}', 'mathyou_mcconaughyay:app'],
+        cwd=basedir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError, OSError):
+                time.sleep(0.02)
+        return None
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure import time and cold starts.')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--gunicorn', action='store_true', help='Also measure gunicorn time to first response')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    samples = [sample_startup() for _ in range(args.runs)]
+    import_ms = statistics.median(s['import_ms'] for s in samples)
+    create_ms = statistics.median(s['create_app_ms'] for s in samples)
+    loaded = sorted({m for s in samples for m in s['loaded']})
+    results = {'import_ms': round(import_ms, 1), 'create_app_ms': round(create_ms, 1),
+               'heavy_modules_loaded': loaded}
+    print(f'import app: {import_ms:.1f}ms, create_app: {create_ms:.1f}ms')
+    if loaded:
+        print(f'heavy modules loaded at startup: {", ".join(loaded)}')
+
+    if args.gunicorn:
+        cold_start = gunicorn_cold_start()
+        results['gunicorn_first_response_ms'] = round(cold_start * 1000, 1) if cold_start else None
+        if cold_start is None:
+            print('gunicorn: not installed or did not become ready')
+        else:
+            print(f'gunicorn: first response after {cold_start * 1000:.1f}ms')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,19 @@
+"""Latency statistics shared by the benchmark tools."""
+
+
+def summarize(latencies, errors, wall_time):
+    latencies = sorted(latencies)
+    def percentile(p):
+        if not latencies:
+            return None
+        index = max(0, min(len(latencies) - 1, int(round(p / 100.0 * len(latencies))) - 1))
+        return round(latencies[index] * 1000, 3)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'p50_ms': percentile(50),
+        'p95_ms': percentile(95),
+        'p99_ms': percentile(99),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3) if latencies else None,
+        'throughput_rps': round(len(latencies) / wall_time, 2) if wall_time > 0 else None,
+    }
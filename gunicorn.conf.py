@@ -0,0 +1,12 @@
+"""Gunicorn settings, loaded automatically from the working directory.
+
+Each worker is warmed (see app/warmup.py) before it accepts requests, so
+the first requests after a deploy or worker restart are not slow and
+/readyz is ready as soon as the worker serves.
+"""
+
+
+def post_worker_init(worker):
+    warmup = worker.wsgi.extensions.get('warmup')
+    if warmup is not None and worker.wsgi.config.get('WARMUP_ENABLED', True):
+        warmup.run()
@@ -0,0 +1,26 @@
+"""Add question content version
+
+Revision ID: 3f6a2c9d1e47
+Revises: 1b8e0fbe0e1c
+Create Date: 2026-10-19 09:12:44.218305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f6a2c9d1e47'
+down_revision = '1b8e0fbe0e1c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('questions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('questions', schema=None) as batch_op:
+        batch_op.drop_column('version')
@@ -0,0 +1,48 @@
+"""Add generated problem pool
+
+Revision ID: 7c2e9b4a5d13
+Revises: 3f6a2c9d1e47
+Create Date: 2026-10-19 15:02:17.506120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2e9b4a5d13'
+down_revision = '3f6a2c9d1e47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('generated_problems',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('concept_id', sa.Integer(), nullable=False),
+    sa.Column('problem_text', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['concept_id'], ['concepts.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('generated_problems', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_generated_problems_concept_id'), ['concept_id'], unique=False)
+
+    op.create_table('generated_problem_views',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('problem_id', sa.Integer(), nullable=False),
+    sa.Column('viewed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['problem_id'], ['generated_problems.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'problem_id', name='_user_generated_problem_uc')
+    )
+
+
+def downgrade():
+    op.drop_table('generated_problem_views')
+    with op.batch_alter_table('generated_problems', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_generated_problems_concept_id'))
+
+    op.drop_table('generated_problems')
@@ -0,0 +1,46 @@
+"""Add item difficulty calibration
+
+Revision ID: 9d4f1a6b2c58
+Revises: 7c2e9b4a5d13
+Create Date: 2026-10-19 17:41:05.332871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d4f1a6b2c58'
+down_revision = '7c2e9b4a5d13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('job_watermarks',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('last_id', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+    with op.batch_alter_table('questions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('calibrated_difficulty', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('calibration_weight', sa.Float(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('calibration_responses', sa.Integer(), server_default='0', nullable=False))
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('ability', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('ability_weight', sa.Float(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('ability_weight')
+        batch_op.drop_column('ability')
+
+    with op.batch_alter_table('questions', schema=None) as batch_op:
+        batch_op.drop_column('calibration_responses')
+        batch_op.drop_column('calibration_weight')
+        batch_op.drop_column('calibrated_difficulty')
+
+    op.drop_table('job_watermarks')
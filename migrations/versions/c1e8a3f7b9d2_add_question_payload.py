@@ -0,0 +1,55 @@
+"""Add pre-serialized question payload
+
+Revision ID: c1e8a3f7b9d2
+Revises: 9d4f1a6b2c58
+Create Date: 2026-10-19 18:26:51.904417
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c1e8a3f7b9d2'
+down_revision = '9d4f1a6b2c58'
+branch_labels = None
+depends_on = None
+
+
+def _question_payload(legacy_id, problem_text, difficulty, explanation, data):
+    # Copy of app.models.question_payload as of this revision, so the
+    # migration does not change when the application's serializer does
+    payload = {
+        'id': legacy_id,
+        'problem': problem_text,
+        'difficulty': difficulty,
+        'explanation': explanation,
+    }
+    payload.update(data or {})
+    return (json.dumps(payload, separators=(',', ':'), sort_keys=True) + '\n').encode('utf-8')
+
+
+def upgrade():
+    with op.batch_alter_table('questions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('payload', sa.LargeBinary(), nullable=True))
+
+    questions = sa.table('questions',
+        sa.column('id', sa.Integer), sa.column('legacy_id', sa.String), sa.column('problem_text', sa.Text),
+        sa.column('difficulty', sa.String), sa.column('explanation', sa.Text), sa.column('data', sa.JSON),
+        sa.column('payload', sa.LargeBinary))
+    connection = op.get_bind()
+    rows = connection.execute(sa.select(questions.c.id, questions.c.legacy_id, questions.c.problem_text,
+                                        questions.c.difficulty, questions.c.explanation, questions.c.data)).all()
+    if rows:
+        connection.execute(
+            questions.update().where(questions.c.id == sa.bindparam('b_id')).values(payload=sa.bindparam('b_payload')),
+            [{'b_id': row.id, 'b_payload': _question_payload(row.legacy_id, row.problem_text, row.difficulty,
+                                                              row.explanation, row.data)} for row in rows],
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('questions', schema=None) as batch_op:
+        batch_op.drop_column('payload')
@@ -24,6 +24,19 @@ class PracticeProblem extends HTMLElement {
         });
     }
 
+    getVectorPlaceholders() {
+        // Render one input per component of the expected answer, e.g. "[130, 40]"
+        const labels = ['x', 'y', 'z', 'w'];
+        const answer = this.problemData.answer;
+        let size = 3;
+        if (Array.isArray(answer)) {
+            size = answer.length;
+        } else if (typeof answer === 'string' && answer.trim()) {
+            size = answer.replace(/[\[\]()]/g, '').split(',').length;
+        }
+        return Array.from({ length: size }, (_, i) => labels[i] || `x${i + 1}`);
+    }
+
     getInputTemplate() {
         switch(this.problemData.type) {
             case 'multiple_choice':
@@ -42,9 +55,9 @@ class PracticeProblem extends HTMLElement {
                 return `
                     <div class="input-container vector">
                         <div class="vector-inputs">
-                            [<input type="text" class="vector-component" placeholder="x">
-                            <input type="text" class="vector-component" placeholder="y">
-                            <input type="text" class="vector-component" placeholder="z">]
+                            [${this.getVectorPlaceholders().map(label => `
+                                <input type="text" class="vector-component" placeholder="${label}">
+                            `).join('')}]
                         </div>
                         <button id="submit-btn">Submit Answer</button>
                     </div>
@@ -0,0 +1,58 @@
+import pytest
+
+from app import create_app, llm
+from app.config import TestingConfig
+from app.extensions import db
+from app.models import Concept, Question, Subject, User, UserResponse
+
+pytest_plugins = ['app.testing']
+
+PASSWORD = 'test-password'
+
+
+@pytest.fixture(autouse=True)
+def no_gemini(monkeypatch):
+    """Keep tests offline: AI call sites serve their static fallbacks."""
+    monkeypatch.setattr(llm, 'GEMINI_API_KEY', None)
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestingConfig)
+    with app.app_context():
+        db.create_all()
+        seed()
+    # Requests push their own app context, and with it a fresh session
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+def seed():
+    """Two concepts with an Easy/Medium/Hard ladder each and a short history."""
+    subject = Subject(name='Linear Algebra', slug='linear-algebra')
+    user = User(email='student@example.com')
+    user.set_password(PASSWORD)
+    db.session.add_all([subject, user])
+    for c, name in enumerate(['Vector', 'Matrix']):
+        concept = Concept(name=name, slug=name.lower(), subject=subject)
+        for q, difficulty in enumerate(['Easy', 'Medium', 'Hard']):
+            question = Question(legacy_id=f'q{c}_{q}', concept=concept, problem_text=f'{q} + {c}?',
+                                difficulty=difficulty, explanation='Add them.',
+                                data={'type': 'numerical', 'answer': str(q + c)})
+            db.session.add(question)
+            db.session.add(UserResponse(user=user, question=question, response_data={'answer': str(q + c)},
+                                        is_correct=q < 2))
+    db.session.commit()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def logged_in_client(client):
+    response = client.post('/login', json={'email': 'student@example.com', 'password': PASSWORD})
+    assert response.status_code == 200
+    return client
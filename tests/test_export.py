@@ -0,0 +1,101 @@
+import csv
+import io
+import json
+
+import pytest
+
+from app.export import EXPORT_COLUMNS, encode
+from app.extensions import db
+from app.models import Question, User, UserResponse
+
+
+@pytest.fixture
+def other_user(app):
+    """A second user whose answers look like spreadsheet formulas and vectors."""
+    with app.app_context():
+        user = User(email='other@example.com')
+        user.set_password('other-password')
+        question = db.session.scalar(db.select(Question).filter_by(legacy_id='q1_0'))
+        db.session.add_all([
+            user,
+            UserResponse(user=user, question=question, response_data={'answer': '=1+1'}, is_correct=False),
+            UserResponse(user=user, question=question, response_data={'answer': [1, 2]}, is_correct=False),
+        ])
+        db.session.commit()
+        return user.id
+
+
+def export(client, **params):
+    return client.get('/api/export/responses', query_string=params)
+
+
+def read_csv(response):
+    return list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+
+
+def read_ndjson(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_export_requires_login(client):
+    assert export(client).status_code == 302
+
+
+def test_users_export_only_their_own_history(logged_in_client, other_user):
+    response = export(logged_in_client)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    rows = read_csv(response)
+    assert len(rows) == 6
+    assert {row['user_email'] for row in rows} == {'student@example.com'}
+
+    response = export(logged_in_client, user_id=other_user)
+    assert response.status_code == 403
+
+
+def test_admins_export_any_user_subject_or_everything(app, logged_in_client, other_user):
+    app.config['EXPORT_ADMIN_EMAILS'] = ['student@example.com']
+    assert len(read_csv(export(logged_in_client))) == 8
+    rows = read_csv(export(logged_in_client, user_id=other_user))
+    assert [row['user_email'] for row in rows] == ['other@example.com'] * 2
+    assert read_csv(export(logged_in_client, discipline='no-such-subject')) == []
+
+
+def test_unknown_format_is_rejected(logged_in_client):
+    assert export(logged_in_client, format='xlsx').status_code == 400
+
+
+def test_export_is_streamed_in_order(logged_in_client):
+    response = export(logged_in_client, format='ndjson')
+    assert response.is_streamed
+    assert response.mimetype == 'application/x-ndjson'
+    rows = read_ndjson(response)
+    assert [row['response_id'] for row in rows] == sorted(row['response_id'] for row in rows)
+    assert set(rows[0]) == set(EXPORT_COLUMNS)
+
+
+def test_formulas_are_escaped_in_csv_only(app, logged_in_client, other_user):
+    app.config['EXPORT_ADMIN_EMAILS'] = ['student@example.com']
+    rows = read_csv(export(logged_in_client, user_id=other_user))
+    assert [row['answer'] for row in rows] == ["'=1+1", '[1, 2]']
+    rows = read_ndjson(export(logged_in_client, user_id=other_user, format='ndjson'))
+    assert [row['answer'] for row in rows] == ['=1+1', [1, 2]]
+
+
+def test_encode_groups_rows_into_chunks():
+    rows = [dict.fromkeys(EXPORT_COLUMNS, 'x') for _ in range(10)]
+    assert len(list(encode(iter(rows), 'ndjson', chunk_size=1))) == 10
+    assert len(list(encode(iter(rows), 'ndjson'))) == 1
+
+
+def test_cli_exports_one_user(app, other_user):
+    result = app.test_cli_runner().invoke(args=['export-responses', '--user', 'other@example.com',
+                                                '--format', 'ndjson', '--batch-size', '1'])
+    assert result.exit_code == 0
+    assert [json.loads(line)['answer'] for line in result.output.splitlines()] == ['=1+1', [1, 2]]
+
+
+def test_cli_rejects_an_unknown_user(app):
+    result = app.test_cli_runner().invoke(args=['export-responses', '--user', 'nobody@example.com'])
+    assert result.exit_code != 0
+    assert 'No user with email nobody@example.com' in result.output
@@ -0,0 +1,99 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.grading import DEFAULT_TOLERANCE, compile_answer, grade, grade_batch, parse_array, parse_number
+from data.practice_problems import QuestionType
+
+
+def question(**data):
+    # No id, so the answer is compiled on every call instead of cached
+    return SimpleNamespace(id=None, version=1, data=data)
+
+
+@pytest.mark.parametrize('answer', ['0.6', '0.60', '.6', '3/5', '6/10', ' 0.6 ', '$0.6$', 0.6])
+def test_equivalent_numbers_are_correct(answer):
+    assert grade(question(answer='0.6'), answer)
+
+
+@pytest.mark.parametrize('answer', ['0.61', '6', '3/4', '', 'zero point six', None])
+def test_other_numbers_are_wrong(answer):
+    assert not grade(question(answer='0.6'), answer)
+
+
+def test_tolerance_is_applied():
+    q = question(answer=1, tolerance=0.1)
+    assert grade(q, '1.09')
+    assert not grade(q, '1.2')
+
+
+@pytest.mark.parametrize('answer', [[3, 4], ['3', '4'], '[3, 4]', '(3, 4)', '3, 4', '3 4', '[3.0, 8/2]'])
+def test_vectors_accept_lists_and_strings(answer):
+    assert grade(question(answer=[3, 4], type=QuestionType.VECTOR), answer)
+
+
+@pytest.mark.parametrize('answer', ['[4, 3]', '[3]', '[3, 4, 5]', '[[3, 4]]', 'three four'])
+def test_vectors_compare_every_component(answer):
+    assert not grade(question(answer=[3, 4], type=QuestionType.VECTOR), answer)
+
+
+def test_matrices_are_graded_row_by_row():
+    q = question(answer='[[1, 2], [3, 4]]', type=QuestionType.VECTOR)
+    assert grade(q, [[1, 2], [3, 4]])
+    assert not grade(q, '[[1, 2], [4, 3]]')
+
+
+@pytest.mark.parametrize('answer, correct', [
+    (1, True), ('1', True), ('The determinant multiplies by 4', True),
+    ('  the determinant multiplies by 4 ', False), (0, False), ('The determinant doubles', False),
+])
+def test_choice_by_index_or_text(answer, correct):
+    q = question(answer=1, type=QuestionType.MULTIPLE_CHOICE,
+                 choices=['The determinant doubles', 'The determinant multiplies by 4'])
+    assert grade(q, answer) is correct
+
+
+@pytest.mark.parametrize('text', ['1e5000000', '1e-5000000', '1' * 1000, '1/0', 'nan', 'inf'])
+def test_parse_number_rejects_huge_or_invalid_input(text):
+    assert parse_number(text) is None
+
+
+def test_numbers_too_large_for_a_float_are_wrong_not_errors():
+    assert not grade(question(answer='1e400'), '2e400')
+    assert not grade(question(answer=1), '1e400')
+
+
+@pytest.mark.parametrize('text', ['[' * 100000, '[' * 5000 + ']' * 5000, ', '.join(['1'] * 20000)])
+def test_parse_array_rejects_deep_or_long_input(text):
+    assert parse_array(text) is None
+
+
+@pytest.mark.parametrize('tolerance, expected', [
+    ('0.1', 0.1), (0.1, 0.1), ('abc', DEFAULT_TOLERANCE), (-1, DEFAULT_TOLERANCE),
+    (float('nan'), DEFAULT_TOLERANCE), (True, DEFAULT_TOLERANCE), (None, DEFAULT_TOLERANCE),
+])
+def test_tolerance_is_coerced_to_a_float(tolerance, expected):
+    assert compile_answer({'answer': 1, 'tolerance': tolerance}).tolerance == expected
+
+
+@pytest.mark.parametrize('data, answers', [
+    ({'answer': 1, 'tolerance': 0.1},
+     ['1', '1.05', '1.1', '1.105', '1.15', '0.9', '0.85', '-1', 'abc', '1e400', '1e5000000', None]),
+    ({'answer': '0.6'}, ['0.60', '.6', '3/5', '0.6000000001', '0.61', '6/10', '[0.6]']),
+    ({'answer': '1e400'}, ['1e400', '1e399', '10e399']),
+    ({'answer': [130, 40], 'type': QuestionType.VECTOR, 'tolerance': 0.01},
+     [[130, 40], '[130, 40]', '(130, 40)', '130 40', '[131, 40]', '[130.5, 40.2]', '[130]', '[1e400, 40]',
+      '[' * 5000]),
+    ({'answer': '[[1, 2], [3, 4]]', 'type': QuestionType.VECTOR},
+     ['[[1, 2], [3, 4]]', [['1', '2'], ['3', '4']], '[[1, 2], [3, 5]]', '[1, 2, 3, 4]']),
+])
+def test_grade_batch_agrees_with_grade(data, answers):
+    q = question(**data)
+    assert grade_batch(q, answers).tolist() == [grade(q, answer) for answer in answers]
+
+
+def test_grade_batch_uses_a_symmetric_tolerance():
+    # np.isclose alone would accept this: |1.15 - 1| <= 0.1 + 0.1 * 1
+    q = question(answer=1, tolerance=0.1)
+    assert not grade(q, '1.15')
+    assert grade_batch(q, ['1.15']).tolist() == [False]
@@ -0,0 +1,237 @@
+import threading
+import time
+
+import pytest
+
+from app import llm
+
+
+class FakeModels:
+    """Stands in for `llm._call_model`, recording every model attempt."""
+
+    def __init__(self, text='generated', release=None):
+        self.text = text
+        self.release = release
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, model_name, prompt, call, system_instruction=None, timeout=None):
+        with self._lock:
+            self.calls.append((model_name, prompt, timeout))
+        if self.release is not None:
+            self.release.wait(5)
+        return f'{self.text}: {prompt}'
+
+
+@pytest.fixture
+def fake_models(app, monkeypatch):
+    models = FakeModels()
+    monkeypatch.setattr(llm, 'GEMINI_API_KEY', 'test-key')
+    monkeypatch.setattr(llm, '_call_model', models)
+    monkeypatch.setattr(llm, 'single_flight', llm.SingleFlight())
+    monkeypatch.setattr(llm, 'limiter', llm.ConcurrencyLimiter())
+    return models
+
+
+def in_threads(app, fn, count):
+    """Run `fn` in `count` threads, each with an app context; returns their results."""
+    results = [None] * count
+
+    def run(i):
+        with app.app_context():
+            results[i] = fn()
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+# --- Single-flight ---
+
+def test_single_flight_runs_one_call_per_key():
+    flight = llm.SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'result'
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do('key', fn)))
+    leader.start()
+    assert started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do('key', fn))) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert sorted(results) == [('result', False)] + [('result', True)] * 3
+
+
+def test_single_flight_shares_the_leaders_error():
+    flight = llm.SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def fn():
+        started.set()
+        release.wait(5)
+        raise RuntimeError('upstream failed')
+
+    errors = []
+
+    def do():
+        try:
+            flight.do('key', fn)
+        except RuntimeError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=do)
+    leader.start()
+    assert started.wait(5)
+    follower = threading.Thread(target=do)
+    follower.start()
+    time.sleep(0.05)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert len(errors) == 2 and errors[0] is errors[1]
+
+
+def test_single_flight_follower_gives_up_after_its_timeout():
+    flight = llm.SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    leader = threading.Thread(target=flight.do, args=('key', lambda: started.set() or release.wait(5)))
+    leader.start()
+    assert started.wait(5)
+    try:
+        assert flight.do('key', lambda: 'not called', timeout=0.05) == (None, True)
+    finally:
+        release.set()
+        leader.join(5)
+
+
+def test_identical_concurrent_calls_share_one_request(app, fake_models):
+    fake_models.release = threading.Event()
+    threading.Timer(0.2, fake_models.release.set).start()
+    results = in_threads(app, lambda: llm.generate_text('same prompt', 'test'), 4)
+    assert results == ['generated: same prompt'] * 4
+    assert len(fake_models.calls) == 1
+
+
+def test_uncoalesced_calls_each_make_a_request(app, fake_models):
+    results = in_threads(app, lambda: llm.generate_text('same prompt', 'test', coalesce=False), 3)
+    assert results == ['generated: same prompt'] * 3
+    assert len(fake_models.calls) == 3
+
+
+# --- Concurrency limiter ---
+
+def test_limiter_sheds_when_the_queue_is_full():
+    limiter = llm.ConcurrencyLimiter()
+    assert limiter.acquire(1, 0, 1.0, 'test')
+    start = time.monotonic()
+    assert not limiter.acquire(1, 0, 1.0, 'test')
+    # Shed at once rather than after the queue timeout
+    assert time.monotonic() - start < 0.5
+
+
+def test_limiter_sheds_after_the_queue_timeout():
+    limiter = llm.ConcurrencyLimiter()
+    assert limiter.acquire(1, 1, 1.0, 'test')
+    start = time.monotonic()
+    assert not limiter.acquire(1, 1, 0.1, 'test')
+    assert time.monotonic() - start >= 0.1
+
+
+def test_limiter_hands_a_released_slot_to_a_waiter():
+    limiter = llm.ConcurrencyLimiter()
+    assert limiter.acquire(1, 1, 1.0, 'test')
+    threading.Timer(0.05, limiter.release).start()
+    assert limiter.acquire(1, 1, 2.0, 'test')
+    # The slot went to the waiter
+    assert not limiter.try_acquire(1)
+
+
+def test_shed_call_falls_back_to_none(app, fake_models):
+    app.config.update(LLM_MAX_CONCURRENCY=1, LLM_MAX_QUEUED=0)
+    fake_models.release = threading.Event()
+    busy = threading.Thread(target=in_threads, args=(app, lambda: llm.generate_text('first', 'test'), 1))
+    busy.start()
+    try:
+        time.sleep(0.05)
+        with app.app_context():
+            assert llm.generate_text('second', 'test') is None
+    finally:
+        fake_models.release.set()
+        busy.join(5)
+    assert [prompt for _, prompt, _ in fake_models.calls] == ['first']
+
+
+def test_timed_out_attempt_keeps_its_slot_until_it_returns(app, fake_models):
+    app.config.update(LLM_MAX_CONCURRENCY=1)
+    fake_models.release = threading.Event()
+    try:
+        with app.app_context():
+            assert llm.generate_text('slow', 'test', budget=0.5) is None
+        # The abandoned SDK call is still running, so it still holds the slot
+        assert not llm.limiter.try_acquire(1)
+    finally:
+        fake_models.release.set()
+    deadline = time.monotonic() + 5
+    while not llm.limiter.try_acquire(1):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+# --- Call budgets ---
+
+def test_call_returns_none_when_its_budget_runs_out(app, fake_models):
+    fake_models.release = threading.Event()
+    try:
+        with app.app_context():
+            start = time.monotonic()
+            assert llm.generate_text('slow', 'test', budget=0.5) is None
+            assert time.monotonic() - start < 1.0
+    finally:
+        fake_models.release.set()
+
+
+def test_first_attempt_leaves_time_for_a_fallback(app, fake_models):
+    app.config.update(LLM_ATTEMPT_SHARE=0.6)
+    fake_models.release = threading.Event()
+    try:
+        with app.app_context():
+            assert llm.generate_text('slow', 'test', budget=2.0) is None
+    finally:
+        fake_models.release.set()
+    (primary, _, first), (fallback, _, second) = fake_models.calls
+    assert (primary, fallback) == tuple(llm.CANDIDATE_MODELS)
+    assert first == pytest.approx(1.2, abs=0.05)
+    # The fallback gets whatever the primary left
+    assert second == pytest.approx(0.8, abs=0.05)
+
+
+def test_attempts_shorter_than_the_minimum_are_skipped(app, fake_models):
+    app.config.update(LLM_MIN_ATTEMPT_SECONDS=0.25)
+    with app.app_context():
+        assert llm.generate_text('prompt', 'test', budget=0.2) is None
+    assert fake_models.calls == []
+
+
+def test_configured_budget_applies_per_call_site(app, fake_models):
+    app.config['LLM_CALL_BUDGETS'] = {'test': 3.0}
+    with app.app_context():
+        assert llm.generate_text('prompt', 'test') == 'generated: prompt'
+        assert llm.remaining_budget() is None
+    [(_, _, timeout)] = fake_models.calls
+    assert timeout == pytest.approx(3.0 * app.config['LLM_ATTEMPT_SHARE'], abs=0.05)
@@ -0,0 +1,62 @@
+import pytest
+from werkzeug.security import generate_password_hash
+
+from app.extensions import db
+from app.models import User
+from app.passwords import hash_password, needs_rehash
+
+# The seeded student's password (see conftest.seed)
+PASSWORD = 'test-password'
+LEGACY_METHOD = 'pbkdf2:sha256:1000'
+
+
+def stored_hash(app):
+    with app.app_context():
+        return db.session.scalar(db.select(User.password_hash).filter_by(email='student@example.com'))
+
+
+def set_stored_hash(app, password_hash):
+    with app.app_context():
+        user = db.session.scalar(db.select(User).filter_by(email='student@example.com'))
+        user.password_hash = password_hash
+        db.session.commit()
+
+
+def login(client, password=PASSWORD):
+    return client.post('/login', json={'email': 'student@example.com', 'password': password})
+
+
+def test_hash_with_current_settings_needs_no_rehash(app):
+    with app.app_context():
+        assert not needs_rehash(hash_password(PASSWORD))
+
+
+@pytest.mark.parametrize('method, salt_length', [(LEGACY_METHOD, 16), ('scrypt:32768:8:1', 8)])
+def test_other_method_or_salt_length_needs_rehash(app, method, salt_length):
+    with app.app_context():
+        assert needs_rehash(generate_password_hash(PASSWORD, method, salt_length))
+
+
+def test_login_upgrades_an_outdated_hash(app, client):
+    set_stored_hash(app, generate_password_hash(PASSWORD, LEGACY_METHOD, 16))
+    assert login(client).status_code == 200
+    upgraded = stored_hash(app)
+    assert not upgraded.startswith('pbkdf2')
+    with app.app_context():
+        assert not needs_rehash(upgraded)
+    # The upgraded hash still verifies
+    client.get('/logout')
+    assert login(client).status_code == 200
+
+
+def test_login_keeps_a_current_hash(app, client):
+    before = stored_hash(app)
+    assert login(client).status_code == 200
+    assert stored_hash(app) == before
+
+
+def test_failed_login_does_not_rehash(app, client):
+    legacy = generate_password_hash(PASSWORD, LEGACY_METHOD, 16)
+    set_stored_hash(app, legacy)
+    assert login(client, 'wrong-password').status_code == 401
+    assert stored_hash(app) == legacy
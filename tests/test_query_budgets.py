@@ -0,0 +1,48 @@
+import pytest
+
+from app.query_budget import VIEW_QUERY_BUDGETS, QueryBudgetExceeded
+
+# endpoint -> (method, url, json body)
+BUDGETED_REQUESTS = {
+    'main.discipline_page': ('GET', '/linear-algebra', None),
+    'api.api_overview': ('GET', '/api/overview?discipline=linear-algebra', None),
+    'auth.profile': ('GET', '/profile', None),
+    'api.api_question': ('GET', '/api/question/q0_1', None),
+    'api.next_question': ('GET', '/api/question/next?current_id=q0_1', None),
+    'api.submit_answer': ('POST', '/api/question/submit_answer', {'question_id': 'q1_2', 'answer': '3'}),
+}
+
+
+def test_every_budgeted_view_is_exercised():
+    assert set(BUDGETED_REQUESTS) == set(VIEW_QUERY_BUDGETS)
+
+
+@pytest.mark.parametrize('endpoint', sorted(BUDGETED_REQUESTS))
+def test_view_stays_within_budget(logged_in_client, query_counter, endpoint):
+    method, url, body = BUDGETED_REQUESTS[endpoint]
+    query_counter.reset()
+    response = logged_in_client.open(url, method=method, json=body)
+    assert response.status_code == 200
+    query_counter.assert_at_most(VIEW_QUERY_BUDGETS[endpoint], endpoint)
+
+
+def test_anonymous_views_stay_within_budget(client, query_counter):
+    for endpoint in ('main.discipline_page', 'api.api_overview', 'api.api_question'):
+        method, url, body = BUDGETED_REQUESTS[endpoint]
+        query_counter.reset()
+        assert client.open(url, method=method, json=body).status_code == 200
+        query_counter.assert_at_most(VIEW_QUERY_BUDGETS[endpoint], endpoint)
+
+
+def test_exceeding_a_budget_fails_the_request(logged_in_client, monkeypatch):
+    monkeypatch.setitem(VIEW_QUERY_BUDGETS, 'auth.profile', 0)
+    with pytest.raises(QueryBudgetExceeded):
+        logged_in_client.get('/profile')
+
+
+def test_budgets_hold_across_one_session(logged_in_client, query_counter):
+    # Earlier requests (e.g. a submission) must not make later views pay extra
+    for endpoint, (method, url, body) in BUDGETED_REQUESTS.items():
+        query_counter.reset()
+        assert logged_in_client.open(url, method=method, json=body).status_code == 200
+        query_counter.assert_at_most(VIEW_QUERY_BUDGETS[endpoint], endpoint)
@@ -0,0 +1,40 @@
+"""Import-time budget: `import app` stays fast and leaves the Gemini SDK unloaded."""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from app.config import basedir
+
+IMPORT_BUDGET_MS = 1000
+RUNS = 3
+
+# Only imported on the first AI call (see app/llm.py)
+LAZY_MODULES = ['google.generativeai', 'grpc', 'numpy']
+
+_SAMPLE = """
+import json, sys, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+print(json.dumps({'import_ms': (t1 - t0) * 1000, 'loaded': [m for m in %r if m in sys.modules]}))
+""" % (LAZY_MODULES,)
+
+
+def sample_import():
+    # A key is set so the SDK would be configured if it were imported eagerly
+    env = dict(os.environ, GEMINI_API_KEY='startup-check')
+    output = subprocess.check_output([sys.executable, '-c', _SAMPLE], cwd=basedir, env=env, text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def test_import_app_within_budget_and_without_gemini():
+    samples = [sample_import() for _ in range(RUNS)]
+
+    loaded = sorted({m for s in samples for m in s['loaded']})
+    assert 'google.generativeai' not in loaded
+    assert loaded == []
+
+    import_ms = statistics.median(s['import_ms'] for s in samples)
+    assert import_ms < IMPORT_BUDGET_MS, f'import app took {import_ms:.1f}ms (budget {IMPORT_BUDGET_MS}ms)'
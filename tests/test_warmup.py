@@ -0,0 +1,49 @@
+import types
+
+import pytest
+
+from app import llm
+
+
+def test_readyz_is_unavailable_until_warmed_up(app, client):
+    app.config['WARMUP_ENABLED'] = True
+    warmup = app.extensions['warmup']
+
+    response = client.get('/readyz')
+    assert response.status_code == 503
+    assert response.get_json()['status'] == warmup.COLD
+
+    assert warmup.run()
+    response = client.get('/readyz')
+    assert response.status_code == 200
+    assert response.get_json()['status'] == warmup.READY
+
+
+class FakeGenai:
+    def __init__(self):
+        self.cache_creates = 0
+        self.caching = types.SimpleNamespace(CachedContent=types.SimpleNamespace(create=self._create_cache))
+
+    def _create_cache(self, **kwargs):
+        self.cache_creates += 1
+        raise AssertionError('warm-up must not create context caches')
+
+    def GenerativeModel(self, model_name, **kwargs):
+        return (model_name, kwargs.get('system_instruction'))
+
+
+@pytest.mark.parametrize('caching', [False, True])
+def test_warm_builds_only_the_primary_model(app, monkeypatch, caching):
+    genai = FakeGenai()
+    monkeypatch.setattr(llm, 'GEMINI_API_KEY', 'test-key')
+    monkeypatch.setattr(llm, '_genai', genai)
+    monkeypatch.setattr(llm, 'model_cache', llm.ModelCache())
+    app.config['LLM_CONTEXT_CACHE_ENABLED'] = caching
+
+    with app.app_context():
+        llm.warm(system_instructions=(None, 'persona'), timeout=5)
+
+    primary = llm.CANDIDATE_MODELS[0]
+    expected = {(primary, None)} if caching else {(primary, None), (primary, 'persona')}
+    assert set(llm.model_cache._models) == expected
+    assert genai.cache_creates == 0
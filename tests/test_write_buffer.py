@@ -0,0 +1,96 @@
+import threading
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app.extensions import db
+from app.models import UserResponse
+from app.write_buffer import ResponseWriteBuffer, response_buffer
+
+
+def count_responses(app):
+    with app.app_context():
+        return db.session.scalar(db.select(db.func.count(UserResponse.id)))
+
+
+@pytest.fixture
+def group_commit(app):
+    app.config.update(GROUP_COMMIT_ENABLED=True, GROUP_COMMIT_TIMEOUT=0.1, GROUP_COMMIT_WRITE_MARGIN=0.1)
+    return app
+
+
+def submit(client):
+    return client.post('/api/question/submit_answer', json={'question_id': 'q0_0', 'answer': '0'})
+
+
+def test_submission_is_acknowledged_after_its_commit(group_commit, logged_in_client):
+    before = count_responses(group_commit)
+    response = submit(logged_in_client)
+    assert response.status_code == 200
+    assert response.get_json()['correct'] is True
+    assert count_responses(group_commit) == before + 1
+
+
+def test_timed_out_submission_is_not_written(group_commit, logged_in_client, monkeypatch):
+    release, flushed = threading.Event(), threading.Event()
+    flush = response_buffer._flush
+
+    def stalled_flush(batch):
+        # The flusher is stuck before it claims the batch
+        release.wait(5)
+        flush(batch)
+        flushed.set()
+
+    monkeypatch.setattr(response_buffer, '_flush', stalled_flush)
+    before = count_responses(group_commit)
+    response = submit(logged_in_client)
+    assert response.status_code == 503
+    release.set()
+    assert flushed.wait(5)
+    # The abandoned row was skipped, so a retry cannot duplicate it
+    assert count_responses(group_commit) == before
+
+
+def test_hung_write_gives_up_after_the_margin(group_commit):
+    release = threading.Event()
+    buffer = ResponseWriteBuffer(group_commit)
+
+    def hung_flush(batch):
+        # The batch is claimed, then the commit hangs
+        for pending in batch:
+            pending.claim()
+        release.wait(2)
+        for pending in batch:
+            pending.done.set()
+
+    buffer._flush = hung_flush
+    try:
+        with pytest.raises(TimeoutError):
+            buffer.add(1, 1, {'answer': '0'}, True)
+    finally:
+        release.set()
+
+
+def test_a_bad_row_fails_alone(group_commit):
+    # A long interval puts every row in the same batch
+    group_commit.config.update(GROUP_COMMIT_INTERVAL_MS=200, GROUP_COMMIT_TIMEOUT=5.0)
+    buffer = ResponseWriteBuffer(group_commit)
+    before = count_responses(group_commit)
+    results = {}
+
+    def add(name, question_id):
+        try:
+            buffer.add(1, question_id, {'answer': name}, True)
+            results[name] = None
+        except Exception as e:
+            results[name] = e
+
+    threads = [threading.Thread(target=add, args=args) for args in [('a', 1), ('bad', None), ('b', 2)]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert results['a'] is None and results['b'] is None
+    assert isinstance(results['bad'], IntegrityError)
+    assert count_responses(group_commit) == before + 2